@@ -1,4 +1,11 @@
 from autodiff.scalar import Scalar
+from autodiff.dense import DenseScalar, VariableRegistry
+from autodiff.reverse import ReverseScalar, Tape
+from autodiff.dualarray import DualArray
+from autodiff.trace import compile, CompiledFunction
+from autodiff.hessian import HyperDual, get_hessian, hvp, hvp_operator
+from autodiff.sparse import sparsity_pattern, color_columns, get_sparse_jacobian
+from autodiff.parallel import get_parallel_jacobian
 from autodiff.functions import *
 from autodiff.vector import *
 import autodiff.optimize
@@ -0,0 +1,301 @@
+import numpy as np
+from autodiff.scalar import Scalar
+
+
+class VariableRegistry():
+
+    """
+    Maps variable names to positions in the derivative vectors of DenseScalar objects.
+    A variable is registered once and keeps its index for the lifetime of the registry.
+    """
+
+    def __init__(self):
+        self._index = {}
+        self._names = []
+        self._vectors = {} #(vector name, length) -> indices of the vector's variables
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, variable):
+        return variable in self._index
+
+    def register(self, variable):
+        """Returns the index of 'variable', registering it first if it has not been seen before.
+
+        EXAMPLES
+        =========
+        >>> r = VariableRegistry()
+        >>> r.register('x')
+        0
+        >>> r.register('y')
+        1
+        >>> r.register('x')
+        0
+        """
+        index = self._index.get(variable)
+        if index is None:
+            index = len(self._names)
+            self._index[variable] = index
+            self._names.append(variable)
+        return index
+
+    def register_vector(self, vector_name, length):
+        """Registers the variables of a vector created by ad.create_vector ('name1', ..., 'name<length>') and returns their indices as a numpy array.
+        The indices are cached, so registering the same vector again does not look up every name.
+
+        EXAMPLES
+        =========
+        >>> r = VariableRegistry()
+        >>> r.register('w2')
+        0
+        >>> r.register_vector('w', 3)
+        array([1, 0, 2])
+        """
+        key = (vector_name, length)
+        if key not in self._vectors:
+            self._vectors[key] = np.array([self.register("%s%i" % (vector_name, i)) for i in range(1, length + 1)], dtype=int)
+        return self._vectors[key]
+
+    def indices(self, variables):
+        """Returns a numpy array with the index of each variable in 'variables', or -1 for variables that were never registered.
+
+        EXAMPLES
+        =========
+        >>> r = VariableRegistry()
+        >>> r.register('x')
+        0
+        >>> r.indices(['x', 'y'])
+        array([ 0, -1])
+        """
+        return np.array([self._index.get(variable, -1) for variable in variables], dtype=int)
+
+    def names(self):
+        """Returns a copy of the registered names, ordered by index."""
+        return list(self._names)
+
+
+#registry shared by all DenseScalar objects unless another one is passed in explicitly
+default_registry = VariableRegistry()
+
+
+def _aligned(a, b):
+    """Returns the derivative vectors 'a' and 'b' zero-padded to a common length."""
+    if len(a) < len(b):
+        a = np.concatenate((a, np.zeros(len(b) - len(a))))
+    elif len(b) < len(a):
+        b = np.concatenate((b, np.zeros(len(a) - len(b))))
+    return a, b
+
+
+class DenseScalar(Scalar):
+
+    """
+    Scalar variable whose derivatives are stored in a contiguous float64 numpy array
+    instead of a dictionary. Position i of the array holds the derivative with respect to the
+    variable registered at index i of the VariableRegistry, so every operation is a single
+    vectorized array operation regardless of how many variables are involved.
+    """
+
+    def __init__(self, variable, val, deriv = 1, registry = None):
+        """
+        INPUTS
+        =======
+        variable: String
+        The name of the DenseScalar object. It is registered in 'registry' if needed.
+
+        val: int or float
+        The value of the DenseScalar
+
+        deriv: int or float
+        The seed derivative with respect to 'variable'
+
+        registry: VariableRegistry
+        The registry used to index the derivatives. Defaults to default_registry.
+
+        EXAMPLES
+        =========
+        >>> x = DenseScalar('x', 2)
+        >>> x.getValue()
+        2.0
+        >>> x.getGradient(['x'])
+        array([1.])
+        """
+        self._registry = default_registry if registry is None else registry
+        self._val = float(val)
+        index = self._registry.register(variable)
+        self._deriv = np.zeros(index + 1)
+        self._deriv[index] = float(deriv)
+
+    @classmethod
+    def _new(cls, val, deriv, registry):
+        """Creates a DenseScalar directly from a value and a derivative vector without registering any variable."""
+        new = cls.__new__(cls)
+        new._val = float(val)
+        new._deriv = deriv
+        new._registry = registry
+        return new
+
+    def _check_registry(self, b):
+        if b._registry is not self._registry:
+            raise Exception("Cannot combine DenseScalars indexed by different registries.")
+
+    def __str__(self):
+        return "Value: {0}, Derivatives: {1}".format(self._val, self.getDeriv());
+
+    def __repr__(self):
+        return "DenseScalar({0})".format(self._val);
+
+    def __add__(self, b):
+        """Returns a DenseScalar representing self + b, where b is a DenseScalar or a numeric value.
+
+        EXAMPLES
+        =========
+        >>> x = DenseScalar('x', 2)
+        >>> y = DenseScalar('y', 1)
+        >>> z = x + y
+        >>> z._val
+        3.0
+        >>> z.getGradient(['x', 'y'])
+        array([1., 1.])
+        """
+        if isinstance(b, DenseScalar):
+            self._check_registry(b)
+            a_deriv, b_deriv = _aligned(self._deriv, b._deriv)
+            return self._new(self._val + b._val, a_deriv + b_deriv, self._registry)
+        return self._new(self._val + b, self._deriv, self._registry)
+
+    def __mul__(self, b):
+        """Returns a DenseScalar representing self * b, where b is a DenseScalar or a numeric value.
+
+        EXAMPLES
+        =========
+        >>> x = DenseScalar('x', 2)
+        >>> y = DenseScalar('y', 3)
+        >>> z = x * y
+        >>> z._val
+        6.0
+        >>> z.getGradient(['x', 'y'])
+        array([3., 2.])
+        """
+        if isinstance(b, DenseScalar):
+            self._check_registry(b)
+            a_deriv, b_deriv = _aligned(self._deriv, b._deriv)
+            return self._new(self._val * b._val, self._val * b_deriv + b._val * a_deriv, self._registry)
+        return self._new(self._val * b, b * self._deriv, self._registry)
+
+    def __neg__(self):
+        """Negates both the value and the derivatives of the current DenseScalar object."""
+        return self._new(-self._val, -self._deriv, self._registry)
+
+    def __pow__(self, b):
+        """Returns a DenseScalar representing self ** b, where b is a DenseScalar or a numeric value.
+        The derivative is b * x ** (b - 1) * dx + x ** b * ln(x) * db, where each term is only
+        evaluated when the corresponding derivative vector is not identically zero.
+
+        EXAMPLES
+        =========
+        >>> x = DenseScalar('x', 2)
+        >>> y = x ** 3
+        >>> y._val
+        8.0
+        >>> y.getGradient(['x'])
+        array([12.])
+        """
+        if isinstance(b, DenseScalar):
+            self._check_registry(b)
+            new_val = self._val ** b._val;
+            #check that a negative number is not being raised to a decimal. Python returns a complex number if this occurs.
+            if np.iscomplex(new_val):
+                raise ValueError("Cannot raise a negative number ({0}) to a decimal {1}".format(self._val, b._val) );
+            a_deriv, b_deriv = _aligned(self._deriv, b._deriv)
+            deriv = np.zeros(len(a_deriv))
+            #derivative for all variables is just 0 if both self and b are zero
+            if self._val == 0 and b._val == 0:
+                return self._new(new_val, deriv, self._registry)
+            if a_deriv.any(): #power rule
+                deriv = deriv + b._val * (self._val ** (b._val - 1)) * a_deriv
+            if b_deriv.any(): #exponential rule
+                deriv = deriv + new_val * np.log(self._val) * b_deriv
+            return self._new(new_val, deriv, self._registry)
+
+        new_val = self._val ** b;
+        #check that a negative number is not being raised to a decimal. Python returns a complex number if this occurs.
+        if np.iscomplex(new_val):
+            raise ValueError("Cannot raise a negative number ({0}) to a decimal {1}".format(self._val, b) );
+        if self._val == 0 and b == 0:
+            return self._new(new_val, np.zeros(len(self._deriv)), self._registry)
+        return self._new(new_val, b * (self._val ** (b - 1)) * self._deriv, self._registry)
+
+    def __rpow__(self, b):
+        """Returns a DenseScalar representing b ** self, where b is a numeric value.
+
+        EXAMPLES
+        =========
+        >>> x = DenseScalar('x', 2)
+        >>> y = 2 ** x
+        >>> y._val
+        4.0
+        >>> bool(np.isclose(y.getGradient(['x'])[0], 4 * np.log(2)))
+        True
+        """
+        if b == 0:
+            if self._val < 1:
+                raise ZeroDivisionError;
+            return self._new(b ** self._val, np.zeros(len(self._deriv)), self._registry)
+        new_val = b ** self._val
+        return self._new(new_val, new_val * np.log(b) * self._deriv, self._registry)
+
+    def __eq__(self, b):
+        """Check if two DenseScalar objects are equal"""
+        if not isinstance(b, DenseScalar):
+            return False
+        a_deriv, b_deriv = _aligned(self._deriv, b._deriv)
+        return self._val == b._val and self._registry is b._registry and np.array_equal(a_deriv, b_deriv)
+
+    def _chain(self, val, deriv):
+        """Returns a new DenseScalar with value 'val' and derivatives self._deriv * 'deriv' (chain rule)."""
+        return self._new(val, deriv * self._deriv, self._registry)
+
+    def getDeriv(self):
+        """Returns a dictionary mapping the name of every variable with a nonzero derivative to that derivative.
+
+        EXAMPLES
+        =========
+        >>> x = DenseScalar('x', 2)
+        >>> x.getDeriv()
+        {'x': 1.0}
+        """
+        names = self._registry._names
+        return {names[i]: self._deriv[i] for i in np.flatnonzero(self._deriv)}
+
+    def getGradient(self, variables):
+        """Returns the derivatives with respect to 'variables' as a numpy array by slicing the derivative vector.
+        Variables that were never registered, or that self does not depend on, have a derivative of 0.
+
+        INPUTS
+        =======
+        variables: list
+        A list of strings corresponding to the variable names
+
+        RETURNS
+        ========
+        derivs: numpy array
+        The numpy array of partial derivatives
+        """
+        return _dense_jacobian([self], variables, self._registry)[0]
+
+    __radd__ = __add__
+    __rmul__ = __mul__
+
+
+def _dense_jacobian(vector, variables, registry):
+    """Returns the jacobian of a sequence of DenseScalars w.r.t. 'variables' as a numpy array.
+    The derivative vectors are stacked into one matrix with an extra column of zeros that unknown variables index into."""
+    width = max(len(sclr._deriv) for sclr in vector)
+    derivs = np.zeros((len(vector), width + 1))
+    for row, sclr in enumerate(vector):
+        derivs[row, :len(sclr._deriv)] = sclr._deriv
+    columns = registry.indices(variables)
+    columns[(columns < 0) | (columns >= width)] = width
+    return derivs[:, columns]
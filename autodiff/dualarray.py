@@ -0,0 +1,364 @@
+import numpy as np
+import scipy.sparse as sp
+from autodiff.dense import VariableRegistry
+
+
+#derivative matrices of vectors created with more entries than this are stored as scipy.sparse CSR matrices
+SPARSE_THRESHOLD = 10 ** 6
+
+
+def _expand(deriv, positions, width):
+    """Returns 'deriv' with its columns moved to 'positions' of a derivative matrix with 'width' columns."""
+    if sp.issparse(deriv):
+        return sp.csr_matrix((deriv.data, positions[deriv.indices], deriv.indptr), shape=(deriv.shape[0], width))
+    expanded = np.zeros(deriv.shape[:-1] + (width,))
+    expanded[..., positions] = deriv
+    return expanded
+
+
+def _broadcast(deriv, shape):
+    """Returns 'deriv' broadcast to the derivative matrix of a value of shape 'shape'."""
+    if deriv.shape[:-1] == shape:
+        return deriv
+    if sp.issparse(deriv):
+        deriv = deriv.toarray()
+    return np.broadcast_to(deriv, shape + deriv.shape[-1:])
+
+
+def _scale(deriv, factor, shape):
+    """Returns the rows of 'deriv' multiplied by 'factor', i.e. the derivatives of f(x) given those of x and f'(x)."""
+    factor = np.asarray(factor)
+    if sp.issparse(deriv) and shape == (deriv.shape[0],):
+        return (sp.diags(np.broadcast_to(factor, shape)) @ deriv).tocsr()
+    return factor[..., None] * _broadcast(deriv, shape)
+
+
+def _combine(a_deriv, a_factor, b_deriv, b_factor, shape):
+    """Returns a_factor * a_deriv + b_factor * b_deriv, the derivatives of a binary operation producing a value of shape 'shape'.
+    The result stays sparse when both operands are sparse vectors or scalars broadcast against a sparse vector."""
+    dense_matrix = lambda deriv: not sp.issparse(deriv) and deriv.ndim == 2
+    if not (sp.issparse(a_deriv) or sp.issparse(b_deriv)) or len(shape) != 1 or dense_matrix(a_deriv) or dense_matrix(b_deriv):
+        a_deriv = a_deriv.toarray() if sp.issparse(a_deriv) else a_deriv
+        b_deriv = b_deriv.toarray() if sp.issparse(b_deriv) else b_deriv
+        return _scale(a_deriv, a_factor, shape) + _scale(b_deriv, b_factor, shape)
+    #one operand may be a single dense row (a scalar) that is broadcast against every row of the sparse one
+    rows = sp.csr_matrix(np.ones((shape[0], 1)))
+    a_deriv = a_deriv if sp.issparse(a_deriv) else rows @ sp.csr_matrix(a_deriv)
+    b_deriv = b_deriv if sp.issparse(b_deriv) else rows @ sp.csr_matrix(b_deriv)
+    return _scale(a_deriv, a_factor, shape) + _scale(b_deriv, b_factor, shape)
+
+
+class DualArray():
+
+    """
+    Vectorized dual number. Holds a float64 array of values of any shape and the matching derivative matrix,
+    whose last axis holds the derivatives with respect to the variables in '_columns' (sorted indices into a VariableRegistry),
+    so that arithmetic and every function in autodiff.functions are evaluated as whole-array numpy operations
+    instead of one Scalar object per element.
+    The derivatives of one-dimensional arrays with many variables are stored as a scipy.sparse CSR matrix.
+    """
+
+    def __init__(self, val, deriv, registry = None, columns = None):
+        """
+        INPUTS
+        =======
+        val: array-like
+        The values of the DualArray
+
+        deriv: numpy array or scipy.sparse matrix
+        The derivatives of the values. Its shape is val.shape + (len(columns),), where column i is the derivative with
+        respect to the variable registered at index columns[i] of 'registry'. Sparse matrices are only allowed for one-dimensional values.
+
+        registry: VariableRegistry
+        The registry naming the columns of 'deriv'. Defaults to a new registry, whose columns are unnamed.
+
+        columns: numpy array
+        The sorted registry indices of the columns of 'deriv'. Defaults to 0, 1, ..., number of columns - 1.
+
+        EXAMPLES
+        =========
+        >>> x = DualArray([1., 2.], np.identity(2))
+        >>> x.getValue()
+        array([1., 2.])
+        """
+        self._val = np.asarray(val, dtype=float)
+        self._deriv = deriv if sp.issparse(deriv) else np.asarray(deriv, dtype=float)
+        self._registry = VariableRegistry() if registry is None else registry
+        self._columns = np.arange(self._deriv.shape[-1]) if columns is None else columns
+        if self._deriv.shape != self._val.shape + (len(self._columns),):
+            raise Exception("Derivative shape {0} does not match value shape {1}.".format(self._deriv.shape, self._val.shape))
+
+    def _new(self, val, deriv, columns = None):
+        """Creates a DualArray sharing the registry (and by default the columns) of self."""
+        return DualArray(val, deriv, self._registry, self._columns if columns is None else columns)
+
+    def _align(self, b):
+        """Returns the derivative matrices of self and b expressed over the union of their columns, and that union."""
+        if b._registry is not self._registry:
+            raise Exception("Cannot combine DualArrays indexed by different registries.")
+        if b._columns is self._columns or np.array_equal(b._columns, self._columns):
+            return self._deriv, b._deriv, self._columns
+        columns = np.union1d(self._columns, b._columns)
+        return (_expand(self._deriv, np.searchsorted(columns, self._columns), len(columns)),
+                _expand(b._deriv, np.searchsorted(columns, b._columns), len(columns)), columns)
+
+    @property
+    def shape(self):
+        return self._val.shape
+
+    def __len__(self):
+        return len(self._val)
+
+    def __getitem__(self, key):
+        """Returns the DualArray made of the selected values, e.g. the first element of a vector with x[0]."""
+        if sp.issparse(self._deriv):
+            if isinstance(key, (int, np.integer)):
+                return self._new(self._val[key], self._deriv[key].toarray()[0])
+            if isinstance(key, (slice, list, np.ndarray)):
+                return self._new(self._val[key], self._deriv[key])
+            return self._new(self._val, self._deriv.toarray())[key]
+        index = key if isinstance(key, tuple) else (key,)
+        return self._new(self._val[key], self._deriv[index + (slice(None),)])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __str__(self):
+        """String representation of the DualArray. Tells both the values and the derivatives."""
+        return "Value: {0}, Derivatives: {1}".format(self._val, self.getDeriv());
+
+    def __repr__(self):
+        return "DualArray({0})".format(self._val);
+
+    #numpy defers to the reflected operators of DualArray instead of treating it as an object array
+    __array_ufunc__ = None
+
+    def __add__(self, b):
+        """Returns a DualArray representing self + b, where b is a DualArray, a numeric value or a numpy array.
+
+        EXAMPLES
+        =========
+        >>> x = DualArray([1., 2.], np.identity(2))
+        >>> z = x + x[0]
+        >>> z.getValue()
+        array([2., 3.])
+        >>> z._deriv
+        array([[2., 0.],
+               [1., 1.]])
+        """
+        if isinstance(b, DualArray):
+            a_deriv, b_deriv, columns = self._align(b)
+            val = self._val + b._val
+            return self._new(val, _combine(a_deriv, 1.0, b_deriv, 1.0, val.shape), columns)
+        val = self._val + b
+        return self._new(val, _broadcast(self._deriv, np.shape(val)))
+
+    def __mul__(self, b):
+        """Returns a DualArray representing self * b, where b is a DualArray, a numeric value or a numpy array.
+
+        EXAMPLES
+        =========
+        >>> x = DualArray([1., 2.], np.identity(2))
+        >>> z = x * x
+        >>> z.getValue()
+        array([1., 4.])
+        >>> z._deriv
+        array([[2., 0.],
+               [0., 4.]])
+        """
+        if isinstance(b, DualArray):
+            a_deriv, b_deriv, columns = self._align(b)
+            val = self._val * b._val
+            return self._new(val, _combine(a_deriv, b._val, b_deriv, self._val, val.shape), columns)
+        val = self._val * b
+        return self._new(val, _scale(self._deriv, b, np.shape(val)))
+
+    def __neg__(self):
+        """Negates both the values and the derivatives of the current DualArray."""
+        return self * -1.0
+
+    def __sub__(self, b):
+        """Returns a DualArray representing self - b. This is just adding the current DualArray with the negation of b."""
+        return self + -b
+
+    def __rsub__(self, b):
+        """Returns a DualArray representing b - self. This is just adding the negation of the current DualArray with b."""
+        return -self + b
+
+    def __pow__(self, b):
+        """Returns a DualArray representing self ** b, where b is a DualArray, a numeric value or a numpy array.
+        The derivative is b * x ** (b - 1) * dx + x ** b * ln(x) * db, and 0 wherever both x and b are 0.
+
+        EXAMPLES
+        =========
+        >>> x = DualArray([1., 2.], np.identity(2))
+        >>> z = x ** 2
+        >>> z.getValue()
+        array([1., 4.])
+        >>> z._deriv
+        array([[2., 0.],
+               [0., 4.]])
+        """
+        exponent = b._val if isinstance(b, DualArray) else np.asarray(b, dtype=float)
+        #check that negative numbers are not being raised to decimals and that 0 is not raised to a negative power
+        if np.any((self._val < 0) & (exponent % 1 != 0)):
+            raise ValueError("Cannot raise a negative number to a decimal");
+        zero_base = self._val == 0
+        if np.any(zero_base & (exponent < 0)):
+            raise ZeroDivisionError;
+        val = self._val ** exponent
+        if zero_base.any():
+            #derivative for all variables is just 0 where both the base and the exponent are zero
+            with np.errstate(divide='ignore', invalid='ignore'):
+                power_rule = np.where(zero_base & (exponent == 0), 0.0, exponent * self._val ** (exponent - 1))
+        else:
+            power_rule = exponent * self._val ** (exponent - 1)
+        if isinstance(b, DualArray):
+            a_deriv, b_deriv, columns = self._align(b)
+            if np.all(self._val > 0):
+                exponential_rule = val * np.log(self._val)
+            else:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    exponential_rule = np.where(zero_base, 0.0, val * np.log(self._val))
+            return self._new(val, _combine(a_deriv, power_rule, b_deriv, exponential_rule, val.shape), columns)
+        return self._new(val, _scale(self._deriv, power_rule, val.shape))
+
+    def __rpow__(self, b):
+        """Returns a DualArray representing b ** self, where b is a numeric value or a numpy array."""
+        base = np.asarray(b, dtype=float)
+        if np.any((base == 0) & (self._val < 1)):
+            raise ZeroDivisionError;
+        val = base ** self._val
+        with np.errstate(divide='ignore', invalid='ignore'):
+            factor = np.where(base == 0, 0.0, val * np.log(base))
+        return self._new(val, _scale(self._deriv, factor, val.shape))
+
+    def __truediv__(self, b):
+        """Returns a DualArray representing self / b. This is self multiplied by (b ** -1)."""
+        if isinstance(b, DualArray):
+            return self * (b ** -1)
+        return self * (1 / np.asarray(b, dtype=float))
+
+    def __rtruediv__(self, b):
+        """Returns a DualArray representing b / self. This is b multiplied by (self ** -1)."""
+        return (self ** -1) * b
+
+    def _chain(self, val, deriv):
+        """Returns a DualArray with values 'val' whose derivatives are the derivatives of self multiplied elementwise by 'deriv' (chain rule)."""
+        val = np.asarray(val, dtype=float)
+        return self._new(val, _scale(self._deriv, deriv, val.shape))
+
+    def sum(self, axis = None, dtype = None, out = None):
+        """Returns the DualArray holding the sum of the values along 'axis' (all of them by default).
+
+        EXAMPLES
+        =========
+        >>> x = DualArray([1., 2.], np.identity(2))
+        >>> total = (x * x).sum()
+        >>> total.getValue()
+        5.0
+        >>> total._deriv
+        array([2., 4.])
+        """
+        if sp.issparse(self._deriv):
+            if axis not in (None, 0, -1):
+                raise ValueError("Invalid axis {0} for a one-dimensional DualArray".format(axis))
+            return self._new(self._val.sum(), np.asarray(self._deriv.sum(axis=0)).ravel())
+        if axis is None:
+            return self._new(self._val.sum(), self._deriv.reshape(-1, self._deriv.shape[-1]).sum(axis=0))
+        axis = axis % self._val.ndim
+        return self._new(self._val.sum(axis=axis), self._deriv.sum(axis=axis))
+
+    def getValue(self):
+        """Returns a copy of the values, or a float for a DualArray holding a single value."""
+        return self._val.copy()[()];
+
+    def getDeriv(self):
+        """Returns a dictionary mapping the name of every variable with nonzero derivatives to the array of those derivatives.
+
+        EXAMPLES
+        =========
+        >>> from autodiff.dense import VariableRegistry
+        >>> x = create_dual_array('x', [1, 2], registry=VariableRegistry())
+        >>> (3 * x[1]).getDeriv()
+        {'x2': 3.0}
+        """
+        deriv = self._deriv.toarray() if sp.issparse(self._deriv) else self._deriv
+        names = self._registry._names
+        nonzero = np.flatnonzero(np.any(deriv.reshape(-1, deriv.shape[-1]) != 0, axis=0))
+        return {names[self._columns[column]]: deriv[..., column][()] for column in nonzero}
+
+    def getGradient(self, variables):
+        """Returns the derivatives with respect to 'variables' by slicing the columns of the derivative matrix.
+        The result has shape self.shape + (len(variables),).
+
+        INPUTS
+        =======
+        variables: list
+        A list of strings corresponding to the variable names
+
+        RETURNS
+        ========
+        derivs: numpy array
+        The numpy array of partial derivatives
+        """
+        indices = self._registry.indices(variables)
+        positions = np.minimum(np.searchsorted(self._columns, indices), max(len(self._columns) - 1, 0))
+        valid = (indices >= 0) & (self._columns[positions] == indices) if len(self._columns) else indices < -1
+        derivs = np.zeros(self._val.shape + (len(indices),))
+        if sp.issparse(self._deriv):
+            derivs[..., valid] = self._deriv[:, positions[valid]].toarray()
+        else:
+            derivs[..., valid] = self._deriv[..., positions[valid]]
+        return derivs
+
+    __radd__ = __add__
+    __rmul__ = __mul__
+
+
+def create_dual_array(vector_name, values, seed_vector = None, registry = None):
+    """
+    Returns a DualArray holding the variables vector_name1, ..., vector_name<len(values)>.
+    The derivative matrix is a scipy.sparse CSR matrix if it would have more than SPARSE_THRESHOLD entries.
+
+    INPUTS
+    =======
+    vector_name: string
+    The prefix of the variable names
+
+    values: list
+    The values of the variables
+
+    seed_vector: list
+    The seed derivatives of the variables. Defaults to 1 for every variable.
+
+    registry: VariableRegistry
+    The registry indexing the derivatives. Defaults to a new registry for every DualArray. Pass the same registry to
+    DualArrays that are combined with each other.
+
+    EXAMPLES
+    =========
+    >>> x = create_dual_array('da', [1, 2, 3])
+    >>> (x * x).getGradient(['da1', 'da2', 'da3'])
+    array([[2., 0., 0.],
+           [0., 4., 0.],
+           [0., 0., 6.]])
+    """
+    registry = VariableRegistry() if registry is None else registry
+    values = np.asarray(values, dtype=float)
+    seeds = np.ones(len(values)) if seed_vector is None else np.asarray(seed_vector, dtype=float)
+    if len(values) != len(seeds):
+        raise Exception("Values not the same length as seed vector!")
+    columns = registry.register_vector(vector_name, len(values))
+    if np.all(columns[1:] > columns[:-1]):
+        positions = np.arange(len(columns))
+    else:
+        columns, positions = np.unique(columns, return_inverse=True)
+    rows = np.arange(len(values))
+    if len(values) * len(columns) > SPARSE_THRESHOLD:
+        deriv = sp.csr_matrix((seeds, (rows, positions)), shape=(len(values), len(columns)))
+    else:
+        deriv = np.zeros((len(values), len(columns)))
+        deriv[rows, positions] = seeds
+    return DualArray(values, deriv, registry, columns)
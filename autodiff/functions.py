@@ -4,16 +4,115 @@
 import numpy as np
 from autodiff.scalar import Scalar
 
+class _ScalarBatch():
+
+    """
+    Stands in for a whole array of Scalar-like objects inside the functions of this module.
+    The values of the elements are gathered into one float array, so that a function calls its numpy ufunc
+    once for the whole array, and _chain scatters the resulting values and derivative scalings back to the elements.
+    """
+
+    def __init__(self, elements):
+        self._elements = elements
+        flat = elements.ravel()
+        values = [sclr._val for sclr in flat]
+        #values that merely convert to floats (traced nodes, dual numbers) have to go through the elements' own arithmetic
+        if not all(isinstance(value, (int, float)) for value in values):
+            raise TypeError("Cannot batch values of type {0}".format(type(values[0]).__name__))
+        self._val = np.array(values, dtype=float).reshape(elements.shape)
+
+    def _map(self, foo):
+        """Returns an object array with the same shape as the batch holding foo(element) for every element."""
+        flat = self._elements.ravel()
+        result = np.empty(len(flat), dtype=object)
+        for i, sclr in enumerate(flat):
+            result[i] = foo(sclr)
+        return result.reshape(self._elements.shape)
+
+    def _chain(self, val, deriv):
+        """Applies the chain rule to every element with its own entry of 'val' and 'deriv'."""
+        flat = self._elements.ravel()
+        val = np.broadcast_to(val, self._elements.shape).ravel().tolist()
+        deriv = np.broadcast_to(deriv, self._elements.shape).ravel().tolist()
+        result = np.empty(len(flat), dtype=object)
+        for i, sclr in enumerate(flat):
+            result[i] = sclr._chain(val[i], deriv[i])
+        return result.reshape(self._elements.shape)
+
+    def getValue(self):
+        return self._val
+
+    def getDeriv(self):
+        return self._map(lambda sclr: sclr.getDeriv())
+
+    #arithmetic used by composite functions falls back to elementwise operations on the array, and numpy arrays defer to it
+    __array_ufunc__ = None
+
+    def __neg__(self):
+        return -self._elements
+
+    def __add__(self, b):
+        return self._elements + b
+
+    def __radd__(self, b):
+        return b + self._elements
+
+    def __sub__(self, b):
+        return self._elements - b
+
+    def __rsub__(self, b):
+        return b - self._elements
+
+    def __mul__(self, b):
+        return self._elements * b
+
+    def __rmul__(self, b):
+        return b * self._elements
+
+    def __truediv__(self, b):
+        return self._elements / b
+
+    def __rtruediv__(self, b):
+        return b / self._elements
+
+    def __pow__(self, b):
+        return self._elements ** b
+
+    def __rpow__(self, b):
+        return b ** self._elements
+
+
 def vectorize(foo):
     """
     Decorator to handle vectors as inputs of our functions.
     Vectors are arrays of scalars.
+    Float arrays are passed straight to the function, which applies its numpy ufunc to them.
+    When the first argument is an array of Scalar-like objects and no other argument is an array,
+    the function is evaluated once on a _ScalarBatch of the whole array instead of once per element.
+    Any other combination of array arguments is evaluated elementwise with np.vectorize.
+
+    NOTES
+    =====
+    The result is still an array of Scalar-like objects, so the batch computes the values and derivative scalings with
+    one numpy ufunc call but then creates one object per element in a Python loop: the cost stays proportional to the
+    number of elements, a few microseconds each (ad.sin of 1e5 Scalars takes about 0.3 s). For large arrays, create the
+    vector with mode='array' instead: its DualArray evaluates every function with whole-array numpy operations and no
+    per-element objects (about 10 ms for the same ad.sin).
     """
     def inner(*args, **kwargs):
-        for arg in list(args) + list(kwargs.values()):
-            if isinstance(arg, np.ndarray):
-                return np.vectorize(foo)(*args, **kwargs)
-        return foo(*args, **kwargs)
+        if not args or not isinstance(args[0], np.ndarray):
+            if not any(isinstance(arg, np.ndarray) for arg in args[1:] + tuple(kwargs.values())):
+                return foo(*args, **kwargs)
+        elif not any(isinstance(arg, np.ndarray) for arg in args[1:] + tuple(kwargs.values())):
+            if args[0].dtype != object:
+                return foo(*args, **kwargs)
+            try:
+                batch = _ScalarBatch(args[0])
+            except (AttributeError, TypeError): #the array holds plain numbers, or values that are not floats
+                batch = None
+            if batch is not None:
+                return foo(batch, *args[1:], **kwargs)
+        return np.vectorize(foo)(*args, **kwargs)
     return inner
 
 
@@ -21,7 +120,7 @@ def vectorize(foo):
 def get_value(sclr):
     """
     Refer to getValue's docstring in Scalar class.
-    Returns an array of values if called on a vector.
+    Returns an array of values if called on a vector or a DualArray.
     """
     return sclr.getValue()
 
@@ -30,7 +129,7 @@ def get_value(sclr):
 def get_deriv(sclr):
     """
     Refer to getDeriv's docstring in Scalar class.
-    Returns an array of dictionaries if called on a vector.
+    Returns an array of dictionaries if called on a vector, and a dictionary of derivative arrays if called on a DualArray.
     """
     return sclr.getDeriv()
 
@@ -68,13 +167,8 @@ def sin(sclr):
     True
     """
     try:
-        result = Scalar(None, np.sin(sclr._val) ); #create new Scalar object with updated value
-        result._deriv = sclr._deriv.copy(); #result's derivative map is a copy of the passed in Scalar
-        #update derivatives for all of the variables in result by applying cos(deriv)
-        for key in result._deriv.keys():
-            d = result._deriv[key];
-            result._deriv[key] = np.cos(sclr._val) * d;
-        return result;
+        #derivatives of the result are the derivatives of 'sclr' scaled by cos(val)
+        return sclr._chain(np.sin(sclr._val), np.cos(sclr._val));
     except AttributeError: #dealing with an int/float
         return np.sin(sclr);
         
@@ -112,13 +206,8 @@ def cos(sclr):
     True
     """
     try:
-        result = Scalar(None, np.cos(sclr._val) ); #create new Scalar object with updated value
-        result._deriv = sclr._deriv.copy(); #result's derivative map is a copy of the passed in Scalar
-        #update derivatives for all of the variables in result by applying -sin(deriv)
-        for key in result._deriv.keys():
-            d = result._deriv[key];
-            result._deriv[key] = -1 * np.sin(sclr._val) * d;
-        return result;
+        #derivatives of the result are the derivatives of 'sclr' scaled by -sin(val)
+        return sclr._chain(np.cos(sclr._val), -1 * np.sin(sclr._val));
     except AttributeError: #dealing with an int/float
         return np.cos(sclr);
 
@@ -155,7 +244,11 @@ def tan(sclr):
     >>> np.isclose(tan(y), -2.185039863261519)
     True
     """
-    return sin(sclr) / cos(sclr);
+    try:
+        #derivatives of the result are the derivatives of 'sclr' scaled by 1/cos(val)^2
+        return sclr._chain(np.tan(sclr._val), 1 / np.cos(sclr._val) ** 2);
+    except AttributeError: #dealing with an int/float
+        return np.tan(sclr);
 
 
 @vectorize
@@ -202,9 +295,11 @@ def power(x, y):
     >>> power(3,4)
     81.0
     """
-    if isinstance(x, Scalar) or isinstance(y, Scalar): #check if one of the inputs is a Scalar object
+    if hasattr(x, '_chain') or hasattr(y, '_chain'): #check if one of the inputs is a Scalar-like object
         return x**y;
     else:
+        if isinstance(x, np.ndarray) or isinstance(y, np.ndarray): #float arrays are passed straight to the ufunc
+            return np.power(x, y, dtype=float);
         return float(x**y); #dealing with an ints/floats
 
 @vectorize
@@ -239,13 +334,9 @@ def exp(sclr):
     True
     """
     try:
-        result = Scalar(None, np.exp(sclr._val) ); #create new Scalar object with value = e^val
-        result._deriv = sclr._deriv.copy(); #result's derivative map is a copy of the passed in Scalar
-        #update derivatives for all of the variables in result by applying e^(deriv)
-        for key in result._deriv.keys():
-            d = result._deriv[key];
-            result._deriv[key] = result._val * d;
-        return result;
+        val = np.exp(sclr._val); #value = e^val
+        #derivatives of the result are the derivatives of 'sclr' scaled by e^val
+        return sclr._chain(val, val);
     except AttributeError: #dealing with an int/float
         return np.exp(sclr);
 
@@ -305,13 +396,8 @@ def arcsin(sclr):
         - returns a float or Scalar object, resulting from applying the arcsine function to  'sclr'.
     """
     try:
-        result = Scalar(None, np.arcsin(sclr._val));  # create new Scalar object with updated value
-        result._deriv = sclr._deriv.copy();  # result's derivative map is a copy of the passed in Scalar
-        # update derivatives for all of the variables in result by applying deriv * 1/(1-x**2)**0.5
-        for key in result._deriv.keys():
-            d = result._deriv[key];
-            result._deriv[key] = 1 / np.sqrt(1 - sclr._val**2) * d;
-        return result;
+        # derivatives of the result are the derivatives of 'sclr' scaled by 1/(1-x**2)**0.5
+        return sclr._chain(np.arcsin(sclr._val), 1 / np.sqrt(1 - sclr._val**2));
     except AttributeError:  # dealing with an int/float
         return np.arcsin(sclr);
     
@@ -337,13 +423,8 @@ def arccos(sclr):
         - returns a float or Scalar object, resulting from applying the arccosine function to  'sclr'.
     """
     try:
-        result = Scalar(None, np.arccos(sclr._val));  # create new Scalar object with updated value
-        result._deriv = sclr._deriv.copy();  # result's derivative map is a copy of the passed in Scalar
-        # update derivatives for all of the variables in result by applying deriv * 1/(1-x**2)**0.5
-        for key in result._deriv.keys():
-            d = result._deriv[key];
-            result._deriv[key] = -1 / np.sqrt(1 - sclr._val**2) * d;
-        return result;
+        # derivatives of the result are the derivatives of 'sclr' scaled by -1/(1-x**2)**0.5
+        return sclr._chain(np.arccos(sclr._val), -1 / np.sqrt(1 - sclr._val**2));
     except AttributeError:  # dealing with an int/float
         return np.arccos(sclr);    
 
@@ -369,13 +450,8 @@ def arctan(sclr):
         - returns a float or Scalar object, resulting from applying the arctangent function to  'sclr'.
     """
     try:
-        result = Scalar(None, np.arctan(sclr._val));  # create new Scalar object with updated value
-        result._deriv = sclr._deriv.copy();  # result's derivative map is a copy of the passed in Scalar
-        # update derivatives for all of the variables in result by applying deriv * 1/(1+x**2)
-        for key in result._deriv.keys():
-            d = result._deriv[key];
-            result._deriv[key] = 1 / (1 + sclr._val**2) * d;
-        return result;
+        # derivatives of the result are the derivatives of 'sclr' scaled by 1/(1+x**2)
+        return sclr._chain(np.arctan(sclr._val), 1 / (1 + sclr._val**2));
     except AttributeError:  # dealing with an int/float
         return np.arctan(sclr);    
 
@@ -401,13 +477,8 @@ def sinh(sclr):
         - returns a float or Scalar object, resulting from applying the hyperbolic sine function to  'sclr'.
     """
     try:
-        result = Scalar(None, np.sinh(sclr._val));  # create new Scalar object with updated value
-        result._deriv = sclr._deriv.copy();  # result's derivative map is a copy of the passed in Scalar
-        # update derivatives for all of the variables in result by applying cosh(deriv)
-        for key in result._deriv.keys():
-            d = result._deriv[key];
-            result._deriv[key] = np.cosh(sclr._val) * d;
-        return result;
+        # derivatives of the result are the derivatives of 'sclr' scaled by cosh(val)
+        return sclr._chain(np.sinh(sclr._val), np.cosh(sclr._val));
     except AttributeError:  # dealing with an int/float
         return np.sinh(sclr);
 
@@ -434,13 +505,8 @@ def cosh(sclr):
         - returns a float or Scalar object, resulting from applying the hyperbolic cosine function to  'sclr'.
     """
     try:
-        result = Scalar(None, np.cosh(sclr._val));  # create new Scalar object with updated value
-        result._deriv = sclr._deriv.copy();  # result's derivative map is a copy of the passed in Scalar
-        # update derivatives for all of the variables in result by applying -sin(deriv)
-        for key in result._deriv.keys():
-            d = result._deriv[key];
-            result._deriv[key] = np.sinh(sclr._val) * d;
-        return result;
+        # derivatives of the result are the derivatives of 'sclr' scaled by sinh(val)
+        return sclr._chain(np.cosh(sclr._val), np.sinh(sclr._val));
     except AttributeError:  # dealing with an int/float
         return np.cosh(sclr);
 
@@ -465,7 +531,12 @@ def tanh(sclr):
         - 'sclr' is not changed by the function
         - returns a float or Scalar object, resulting from applying the hyperbolic tangent function to  'sclr'.
     """
-    return sinh(sclr) / cosh(sclr);
+    try:
+        #derivatives of the result are the derivatives of 'sclr' scaled by 1 - tanh(val)^2
+        val = np.tanh(sclr._val);
+        return sclr._chain(val, 1 - val ** 2);
+    except AttributeError: #dealing with an int/float
+        return np.tanh(sclr);
 
 
 @vectorize
@@ -489,7 +560,12 @@ def logistic(sclr):
         - returns a float or Scalar object, resulting from applying the logistic function to 'sclr'.
     """
 
-    return 1 / (1 + exp(-sclr))
+    try:
+        #derivatives of the result are the derivatives of 'sclr' scaled by logistic(val) * (1 - logistic(val))
+        val = 1 / (1 + np.exp(-sclr._val));
+        return sclr._chain(val, val * (1 - val));
+    except AttributeError: #dealing with an int/float
+        return 1 / (1 + np.exp(-sclr));
 
 
 @vectorize
@@ -515,13 +591,8 @@ def log(sclr, base):
     """
 
     try:
-        result = Scalar(None, np.log(sclr._val) / np.log(base));  # create new Scalar object with updated value
-        result._deriv = sclr._deriv.copy();  # result's derivative map is a copy of the passed in Scalar
-        # update derivatives for all of the variables in result by applying -sin(deriv)
-        for key in result._deriv.keys():
-            d = result._deriv[key];
-            result._deriv[key] = d / (np.log(base) * sclr._val);
-        return result;
+        # derivatives of the result are the derivatives of 'sclr' scaled by 1/(ln(base) * x)
+        return sclr._chain(np.log(sclr._val) / np.log(base), 1 / (np.log(base) * sclr._val));
     except AttributeError:  # dealing with an int/float
         return np.log(sclr) / np.log(base);
 
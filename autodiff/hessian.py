@@ -0,0 +1,384 @@
+import operator
+import numpy as np
+from scipy.sparse.linalg import LinearOperator
+import autodiff.functions as functions
+from autodiff.reverse import ReverseScalar, Tape
+
+
+class _Dual():
+
+    """
+    Univariate dual number real + dual * e with e ** 2 = 0, i.e. a value and its derivative along a single direction.
+    HyperDual hands one to the functions in autodiff.functions as its value. Since numpy ufuncs applied to it are
+    evaluated with the same functions, the derivative a function passes to HyperDual._chain comes back as a _Dual
+    that also holds the second derivative of the function. hvp records a Tape with _Dual values for the same reason.
+    """
+
+    __slots__ = ('real', 'dual')
+
+    #numpy ufuncs used by autodiff.functions and the autodiff functions or operators evaluating them
+    _ufuncs = {'sin': functions.sin, 'cos': functions.cos, 'tan': functions.tan, 'exp': functions.exp,
+               'sqrt': functions.sqrt, 'arcsin': functions.arcsin, 'arccos': functions.arccos,
+               'arctan': functions.arctan, 'sinh': functions.sinh, 'cosh': functions.cosh,
+               'tanh': functions.tanh, 'log': functions.ln, 'add': operator.add, 'subtract': operator.sub,
+               'multiply': operator.mul, 'true_divide': operator.truediv, 'power': operator.pow,
+               'negative': operator.neg}
+    _reflected = {'add': '__radd__', 'subtract': '__rsub__', 'multiply': '__rmul__', 'true_divide': '__rtruediv__',
+                  'power': '__rpow__'}
+
+    def __init__(self, real, dual = 1.0):
+        self.real = real
+        self.dual = dual
+
+    @property
+    def _val(self):
+        return self.real
+
+    def __repr__(self):
+        return "_Dual({0}, {1})".format(self.real, self.dual)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != '__call__' or kwargs or ufunc.__name__ not in self._ufuncs:
+            return NotImplemented
+        if ufunc.__name__ in self._reflected and not isinstance(inputs[0], _Dual): #e.g. np.float64 * _Dual
+            return getattr(inputs[1], self._reflected[ufunc.__name__])(inputs[0])
+        return self._ufuncs[ufunc.__name__](*inputs)
+
+    def _chain(self, val, deriv):
+        return _Dual(val, deriv * self.dual)
+
+    def __add__(self, b):
+        if isinstance(b, _Dual):
+            return _Dual(self.real + b.real, self.dual + b.dual)
+        return _Dual(self.real + b, self.dual)
+
+    def __sub__(self, b):
+        if isinstance(b, _Dual):
+            return _Dual(self.real - b.real, self.dual - b.dual)
+        return _Dual(self.real - b, self.dual)
+
+    def __rsub__(self, b):
+        return _Dual(b - self.real, -self.dual)
+
+    def __mul__(self, b):
+        if isinstance(b, _Dual):
+            return _Dual(self.real * b.real, self.dual * b.real + self.real * b.dual)
+        return _Dual(self.real * b, self.dual * b)
+
+    def __truediv__(self, b):
+        if isinstance(b, _Dual):
+            return _Dual(self.real / b.real, (self.dual * b.real - self.real * b.dual) / b.real ** 2)
+        return _Dual(self.real / b, self.dual / b)
+
+    def __rtruediv__(self, b):
+        return _Dual(b / self.real, -b * self.dual / self.real ** 2)
+
+    def __pow__(self, b):
+        if isinstance(b, _Dual):
+            val = self.real ** b.real
+            return _Dual(val, val * (b.dual * np.log(self.real) + b.real * self.dual / self.real))
+        if b == 0:
+            return _Dual(1.0, 0.0)
+        return _Dual(self.real ** b, b * self.real ** (b - 1) * self.dual)
+
+    def __rpow__(self, b):
+        val = b ** self.real
+        return _Dual(val, val * np.log(b) * self.dual)
+
+    def __neg__(self):
+        return _Dual(-self.real, -self.dual)
+
+    def __mod__(self, b):
+        return self.real % b
+
+    #the comparison only looks at the value, as the checks in ReverseScalar.__pow__ expect.
+    #__eq__ is left to identity so that Tape._backward never skips an adjoint whose value is zero but whose derivative is not.
+    def __lt__(self, b):
+        return self.real < b
+
+    __radd__ = __add__
+    __rmul__ = __mul__
+
+
+class HyperDual():
+
+    """
+    Second-order number. Carries a value, its gradient and its Hessian with respect to the variables of a vector,
+    so that evaluating a function on HyperDuals gives its exact second derivatives in one pass.
+    The Hessian is stored as a dense symmetric matrix, or as its packed upper triangle (n(n+1)/2 entries).
+    """
+
+    def __init__(self, val, gradient, hessian = None, triangular = False):
+        """
+        INPUTS
+        =======
+        val: int or float
+        The value of the HyperDual
+
+        gradient: list or array
+        The derivatives of the value with respect to each variable
+
+        hessian: numpy array
+        The second derivatives, an (n, n) matrix or the packed upper triangle if 'triangular' is True. Defaults to zeros.
+
+        triangular: bool
+        Whether to store only the upper triangle of the Hessian
+
+        EXAMPLES
+        =========
+        >>> x = HyperDual(3, [1, 0])
+        >>> y = HyperDual(2, [0, 1])
+        >>> z = x * x * y
+        >>> z.getValue()
+        18.0
+        >>> z.getGradient()
+        array([12.,  9.])
+        >>> z.getHessian()
+        array([[4., 6.],
+               [6., 0.]])
+        """
+        self._value = float(val)
+        self._gradient = np.asarray(gradient, dtype=float)
+        n = len(self._gradient)
+        self._pairs = np.triu_indices(n) if triangular else None
+        if hessian is None:
+            hessian = np.zeros(len(self._pairs[0])) if triangular else np.zeros((n, n))
+        self._hessian = np.asarray(hessian, dtype=float)
+
+    def _new(self, val, gradient, hessian):
+        """Creates a HyperDual with the same Hessian storage as self."""
+        new = HyperDual.__new__(HyperDual)
+        new._value = float(val)
+        new._gradient = gradient
+        new._pairs = self._pairs
+        new._hessian = hessian
+        return new
+
+    def _outer(self, a, b):
+        """Returns a b^T + b a^T in the Hessian storage of self."""
+        if self._pairs is None:
+            outer = np.outer(a, b)
+            return outer + outer.T
+        rows, columns = self._pairs
+        return a[rows] * b[columns] + b[rows] * a[columns]
+
+    @property
+    def _val(self):
+        """The value as a _Dual, so that the derivative computed by a function in autodiff.functions carries its second derivative."""
+        return _Dual(self._value)
+
+    def __str__(self):
+        """String representation of the HyperDual. Tells the value, the gradient and the Hessian."""
+        return "Value: {0}, Gradient: {1}, Hessian: {2}".format(self._value, self._gradient, self.getHessian().tolist());
+
+    def __repr__(self):
+        return "HyperDual({0})".format(self._value);
+
+    def __add__(self, b):
+        """Returns a HyperDual representing self + b, where b is a HyperDual or a numeric value."""
+        if isinstance(b, HyperDual):
+            return self._new(self._value + b._value, self._gradient + b._gradient, self._hessian + b._hessian)
+        return self._new(self._value + b, self._gradient, self._hessian)
+
+    def __mul__(self, b):
+        """Returns a HyperDual representing self * b, where b is a HyperDual or a numeric value.
+        The Hessian of a product is b * H_a + a * H_b + g_a g_b^T + g_b g_a^T."""
+        if isinstance(b, HyperDual):
+            return self._new(self._value * b._value, b._value * self._gradient + self._value * b._gradient,
+                             b._value * self._hessian + self._value * b._hessian + self._outer(self._gradient, b._gradient))
+        return self._new(self._value * b, self._gradient * b, self._hessian * b)
+
+    def __neg__(self):
+        """Negates the value, the gradient and the Hessian."""
+        return self * -1
+
+    def __sub__(self, b):
+        """Returns a HyperDual representing self - b. This is just adding the current HyperDual with the negation of b."""
+        return self + -b
+
+    def __rsub__(self, b):
+        """Returns a HyperDual representing b - self. This is just adding the negation of the current HyperDual with b."""
+        return -self + b
+
+    def __pow__(self, b):
+        """Returns a HyperDual representing self ** b, where b is a HyperDual or a numeric value.
+        For a numeric exponent, the first and second derivatives are b * x ** (b - 1) and b * (b - 1) * x ** (b - 2).
+        For a HyperDual exponent, the base must be positive and the result is exp(b * ln(self))."""
+        if isinstance(b, HyperDual):
+            if self._value <= 0:
+                raise ValueError("Cannot raise a non-positive number ({0}) to a HyperDual power".format(self._value));
+            return functions.exp(b * functions.ln(self))
+        #check that a negative number is not being raised to a decimal.
+        if self._value < 0 and b % 1 != 0:
+            raise ValueError("Cannot raise a negative number ({0}) to a decimal {1}".format(self._value, b) );
+        if b == 0:
+            return self._new(1.0, np.zeros_like(self._gradient), np.zeros_like(self._hessian))
+        first = b * self._value ** (b - 1)
+        second = b * (b - 1) * self._value ** (b - 2) if b != 1 else 0.0
+        return self._new(self._value ** b, first * self._gradient,
+                         first * self._hessian + second * self._outer(self._gradient, self._gradient) / 2)
+
+    def __rpow__(self, b):
+        """Returns a HyperDual representing b ** self, where b is a numeric value. This is exp(self * ln(b))."""
+        if b == 0:
+            if self._value < 1:
+                raise ZeroDivisionError;
+            return self._new(0.0, np.zeros_like(self._gradient), np.zeros_like(self._hessian))
+        return functions.exp(self * np.log(b))
+
+    def __truediv__(self, b):
+        """Returns a HyperDual representing self / b. This is just self multiplied by (b ** -1)."""
+        return self * (b ** -1);
+
+    def __rtruediv__(self, b):
+        """Returns a HyperDual representing b / self. This is just b multiplied by (self ** -1)."""
+        return (self ** -1) * b;
+
+    def _chain(self, val, deriv):
+        """Returns a HyperDual with value 'val' given the first derivative f' and, when 'deriv' is a _Dual, the second
+        derivative f'' of the function applied to self: gradient f' g and Hessian f' H + f'' g g^T."""
+        first = deriv.real if isinstance(deriv, _Dual) else deriv
+        second = deriv.dual if isinstance(deriv, _Dual) else 0.0
+        value = val.real if isinstance(val, _Dual) else val
+        return self._new(value, first * self._gradient,
+                         first * self._hessian + second * self._outer(self._gradient, self._gradient) / 2)
+
+    def getValue(self):
+        """Returns the value of the HyperDual."""
+        return self._value;
+
+    def getGradient(self):
+        """Returns the gradient of the HyperDual."""
+        return self._gradient.copy();
+
+    def getHessian(self):
+        """Returns the Hessian of the HyperDual as a dense symmetric matrix."""
+        if self._pairs is None:
+            return self._hessian.copy()
+        n = len(self._gradient)
+        hessian = np.zeros((n, n))
+        hessian[self._pairs] = self._hessian
+        hessian[self._pairs[::-1]] = self._hessian
+        return hessian
+
+    __radd__ = __add__
+    __rmul__ = __mul__
+
+
+def get_hessian(f, x, triangular = False):
+    """
+    Returns the Hessian of 'f' at 'x', computed exactly by evaluating 'f' once on HyperDuals.
+
+    INPUTS
+    =======
+    f: function
+    A function that takes in a single list/array with the same length as 'x' and returns a scalar
+
+    x: List or array of ints/floats
+    The point the Hessian is computed at
+
+    triangular: bool
+    Whether the HyperDuals only store the upper triangle of the Hessian, which halves the memory and the work per operation
+
+    RETURNS
+    ========
+    numpy array
+    The (len(x), len(x)) Hessian matrix
+
+    EXAMPLES
+    =========
+    >>> get_hessian(lambda x: x[0] ** 2 * x[1] + functions.exp(x[1]), [1, 0])
+    array([[0., 2.],
+           [2., 1.]])
+    """
+    return _evaluate(f, x, triangular).getHessian()
+
+
+def _evaluate(f, x, triangular = False):
+    """Evaluates 'f' on a vector of HyperDuals seeded at 'x' and returns the resulting HyperDual."""
+    identity = np.identity(len(x))
+    return f(np.array([HyperDual(value, identity[i], triangular=triangular) for i, value in enumerate(x)]))
+
+
+def _real(value):
+    """Splits an adjoint computed with _Dual values into its value and derivative."""
+    if isinstance(value, _Dual):
+        return value.real, value.dual
+    return float(value), 0.0 #the output does not depend on this input
+
+
+def hvp(f, x, v):
+    """
+    Returns the gradient of 'f' at 'x' and the Hessian-vector product H(x) * v without forming the Hessian (forward-over-reverse).
+    'f' is recorded on a Tape whose values are dual numbers carrying the directional derivative along 'v', and one backward
+    sweep over that tape yields the gradient together with its derivative along 'v', which is H(x) * v.
+    The cost is that of a reverse mode gradient with every value replaced by a dual number, independent of len(x).
+
+    INPUTS
+    =======
+    f: function
+    A function that takes in a single list/array with the same length as 'x' and returns a scalar.
+    It can also be a CompiledFunction returned by ad.compile.
+
+    x: List or array of ints/floats
+    The point the Hessian is evaluated at
+
+    v: List or array of ints/floats
+    The vector the Hessian is multiplied with
+
+    RETURNS
+    ========
+    Tuple
+    A tuple with the gradient of 'f' at 'x' as first entry and H(x) * v as second entry
+
+    EXAMPLES
+    =========
+    >>> gradient, product = hvp(lambda x: x[0] ** 2 * x[1] + functions.exp(x[1]), [1, 0], [1, 2])
+    >>> gradient
+    array([0., 2.])
+    >>> product
+    array([4., 4.])
+    """
+    f = getattr(f, '_function', f) #a CompiledFunction keeps the function it traced
+    tape = Tape()
+    leaves = []
+    for i, (value, tangent) in enumerate(zip(x, v)):
+        leaf = ReverseScalar.__new__(ReverseScalar)
+        leaf._tape = tape
+        leaf._val = _Dual(float(value), float(tangent))
+        leaf._index = tape._leaf('x{}'.format(i + 1), 1.0)
+        leaf._gradient = None
+        leaves.append(leaf)
+    output = f(np.array(leaves))
+    adjoints = tape._backward(output._index)
+    gradient, product = zip(*[_real(adjoints[leaf._index]) for leaf in leaves])
+    return np.array(gradient), np.array(product)
+
+
+def hvp_operator(f, x):
+    """
+    Returns H(x), the Hessian of 'f' at 'x', as a scipy LinearOperator whose matvec computes hvp(f, x, v)[1],
+    so that Krylov solvers such as gmres or cg can use it without the (len(x), len(x)) matrix ever being stored.
+
+    INPUTS
+    =======
+    f: function
+    A function that takes in a single list/array with the same length as 'x' and returns a scalar
+
+    x: List or array of ints/floats
+    The point the Hessian is evaluated at
+
+    RETURNS
+    ========
+    LinearOperator
+    The symmetric (len(x), len(x)) Hessian operator
+
+    EXAMPLES
+    =========
+    >>> H = hvp_operator(lambda x: x[0] ** 2 * x[1] + functions.exp(x[1]), [1, 0])
+    >>> H @ np.array([0, 1])
+    array([2., 1.])
+    """
+    x = np.array(x, dtype=float)
+    matvec = lambda v: hvp(f, x, np.ravel(v))[1]
+    return LinearOperator(shape=(len(x), len(x)), matvec=matvec, rmatvec=matvec, dtype=float)
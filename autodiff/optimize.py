@@ -1,9 +1,151 @@
 import autodiff as ad
+import asyncio
 import numpy as np
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from scipy.linalg import cho_factor, cho_solve, lu_factor, lu_solve, solve_triangular
+from scipy.linalg.blas import dgemv, dger, dsymv, dsyr2
 from scipy.sparse.linalg import gmres
 from scipy.sparse.linalg import LinearOperator
+from scipy.sparse.linalg import splu, spilu
+import scipy.sparse as sp
 
-def gradient_descent(f, intial_guess, step_size = 0.01, max_iter = 10000, tol = 1e-12):
+
+def _value_and_gradient(f, x, mode = 'dict'):
+    """Returns the value and the gradient of 'f' at 'x'. A CompiledFunction replays its kernel, an EvaluationCache looks
+    'x' up first, any other function is evaluated on ad.create_vector('x', x, mode = mode)."""
+    if isinstance(f, EvaluationCache):
+        return f.value_and_gradient(x)
+    if isinstance(f, ad.CompiledFunction):
+        return f.evaluate(x)
+    fn_at_x = f(ad.create_vector('x', x, mode = mode))
+    return ad.get_value(fn_at_x), fn_at_x.getGradient(['x{}'.format(i) for i in range(1, len(x) + 1)])
+
+
+def _value(f, x, mode = 'dict'):
+    """
+    Returns the value of 'f' at 'x', without derivatives. 'f' is evaluated on a plain float array, on which the functions
+    of autodiff apply their numpy ufuncs directly, so the evaluation costs as much as 'f' on numbers. Values outside the
+    domain of a function come back as nan or inf instead of raising. Functions that only accept Scalars are evaluated on
+    ad.create_vector('x', x, mode = mode).
+    """
+    if isinstance(f, EvaluationCache):
+        return f.value(x)
+    if isinstance(f, ad.CompiledFunction):
+        return f(x)
+    try:
+        with np.errstate(all = 'ignore'):
+            value = f(np.array(x, dtype=float))
+    except (AttributeError, TypeError): #'f' calls methods of Scalars
+        return ad.get_value(f(ad.create_vector('x', x, mode = mode)))
+    try:
+        return value.getValue()
+    except AttributeError: #a float
+        return value
+
+
+class EvaluationCache():
+
+    """
+    Wraps a function to be minimized and remembers its values and gradients at the last 'maxsize' points, keyed by the
+    bytes of the point, evicting the least recently used point first. The optimizers below evaluate 'f' at the same point
+    several times per iteration (at the current point, in the line search, and again at the accepted point), and only the
+    first of these evaluations is computed.
+
+    An EvaluationCache can be passed to gradient_descent, line_search and quasi_newtons_method in place of 'f', e.g. to share
+    the evaluations between consecutive calls. The counters 'hits', 'misses' and 'evaluations' count the lookups answered
+    from the cache, the lookups that were not, and the evaluations of 'f' they caused.
+
+    EXAMPLES
+    =========
+    >>> cache = EvaluationCache(lambda x: x[0] ** 2 + x[1])
+    >>> cache.value_and_gradient([3, 1])
+    (10.0, array([6., 1.]))
+    >>> cache.value([3, 1])
+    10.0
+    >>> cache.hits, cache.misses, cache.evaluations
+    (1, 1, 1)
+    """
+
+    def __init__(self, f, mode = 'dict', maxsize = 8):
+        self.f = f
+        self.mode = mode
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evaluations = 0
+        self._entries = OrderedDict() #point bytes -> [value, gradient or None]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, x, gradient):
+        """Returns the entry for 'x' if it holds a value (and a gradient, if 'gradient'), counting a hit or a miss."""
+        key = np.asarray(x, dtype=float).tobytes()
+        entry = self._entries.get(key)
+        if entry is not None and (entry[1] is not None or not gradient):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return key, entry
+        self.misses += 1
+        return key, None
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last = False)
+
+    def value_and_gradient(self, x):
+        """Returns the value and the gradient of 'f' at 'x'."""
+        key, entry = self._lookup(x, True)
+        if entry is None:
+            self.evaluations += 1
+            entry = list(_value_and_gradient(self.f, x, self.mode))
+            self._store(key, entry)
+        return entry[0], entry[1]
+
+    def value(self, x):
+        """Returns the value of 'f' at 'x'."""
+        key, entry = self._lookup(x, False)
+        if entry is None:
+            self.evaluations += 1
+            entry = [_value(self.f, x, self.mode), None]
+            self._store(key, entry)
+        return entry[0]
+
+    def _report(self, stats):
+        """Copies the counters into 'stats', if it is a dictionary."""
+        if stats is not None:
+            stats['cache_hits'] = self.hits
+            stats['cache_misses'] = self.misses
+            stats['evaluations'] = self.evaluations
+
+
+def _newton_direction(f, x):
+    """
+    Returns the gradient of 'f' at 'x' and the Newton direction -H^-1 * gradient, where the exact Hessian H comes from
+    evaluating 'f' on HyperDuals. Falls back to the steepest descent direction where H does not give a descent direction.
+    """
+    hyperdual = ad.hessian._evaluate(f._function if isinstance(f, ad.CompiledFunction) else f, x)
+    gradient = hyperdual.getGradient()
+    try:
+        p = -np.linalg.solve(hyperdual.getHessian(), gradient)
+    except np.linalg.LinAlgError: #singular Hessian
+        p = -gradient
+    if gradient @ p >= 0:
+        p = -gradient
+    return gradient, p
+
+
+def _cached(f, mode, cache_size):
+    """Returns 'f' wrapped in an EvaluationCache, or 'f' itself if it already is one."""
+    return f if isinstance(f, EvaluationCache) else EvaluationCache(f, mode, cache_size)
+
+
+def gradient_descent(f, intial_guess, step_size = 0.01, max_iter = 10000, tol = 1e-12, mode = 'dict', cache_size = 8, stats = None,
+                     search = None):
     """
     Implements gradient descent
 
@@ -11,18 +153,33 @@ def gradient_descent(f, intial_guess, step_size = 0.01, max_iter = 10000, tol =
     ======= 
     f: function 
     The function that we are trying to find the minimum of. The function must take in single list/array that has the same dimension as len(initial_guess).
+    It can also be a CompiledFunction returned by ad.compile, in which case 'mode' is ignored, or an EvaluationCache.
     
     initial_guess: List or array of ints/floats
     The initial position to begin the search for the minimum of the function 'f'.
 
     step_size: float
-    The step size. In this case the step size will be constant
+    The step size. In this case the step size will be constant, unless a line search is selected with 'search'
     
     max_iter: int
     The max number of iterations
     
     tol: float
     The tolerance. If the norm of the gradient is less than the tolerance, the algorithm will stop
+
+    mode: String
+    The differentiation mode passed to ad.create_vector ('dict', 'dense' or 'reverse').
+    'reverse' computes the gradient with one backward sweep, independent of len(initial_guess).
+
+    cache_size: int
+    The number of points whose values and gradients are kept in the EvaluationCache 'f' is wrapped in
+
+    stats: dict
+    If a dictionary is passed in, 'cache_hits', 'cache_misses' and 'evaluations' are set to the counters of the cache.
+
+    search: String
+    None takes steps of 'step_size'. 'backtracking' (line_search) or 'wolfe' (wolfe_line_search, with c2 = 0.4) searches
+    along the negative gradient for each step, starting from 'step_size'.
     
     RETURNS
     ========
@@ -30,17 +187,26 @@ def gradient_descent(f, intial_guess, step_size = 0.01, max_iter = 10000, tol =
     A tuple with first entry which maps to the position of the minimum and second entry which maps to the number of iterations it took for the algorithm to stop
     """
 
+    if search not in [None, 'backtracking', 'wolfe']:
+        raise Exception("Not a valid line search.")
+    cache = _cached(f, mode, cache_size)
     x = np.array(intial_guess)
     for i in range(max_iter):
-        x_vector = ad.create_vector('x', x)
-        fn_at_x = f(x_vector)
-        gradient = fn_at_x.getGradient(['x{}'.format(i) for i in range(1, len(x) + 1)])
+        _, gradient = _value_and_gradient(cache, x)
         if np.sqrt(np.abs(gradient).sum()) < tol:
             break
-        x = x - step_size * gradient
+        if search is None:
+            x = x - step_size * gradient
+        else:
+            p = -gradient
+            step = _search(cache, x, p, search, step_size, c2 = 0.4) * p
+            if not (x + step != x).any(): #the line search cannot improve on x in floating point
+                break
+            x = x + step
+    cache._report(stats)
     return (x, i + 1)
 
-def line_search(f, x, p, tau = 0.1, c = 0.1, alpha = 1):
+def line_search(f, x, p, tau = 0.1, c = 0.1, alpha = 1, mode = 'dict'):
     """
     Implements Backtracking Line Search.  https://en.wikipedia.org/wiki/Backtracking_line_search
 
@@ -48,6 +214,8 @@ def line_search(f, x, p, tau = 0.1, c = 0.1, alpha = 1):
     ======= 
     fn: Function 
     The function that we are trying to find the minimum of. The function must take in the same number of arguments as len(x)
+    It can also be a CompiledFunction returned by ad.compile, or an EvaluationCache, which then answers the evaluation at 'x'
+    if the caller has already evaluated the gradient there.
     
     x: List or array of ints/floats
     The initial position 
@@ -63,6 +231,9 @@ def line_search(f, x, p, tau = 0.1, c = 0.1, alpha = 1):
 
 	alpha: float
 	Starting alpha
+
+    mode: String
+    The differentiation mode passed to ad.create_vector ('dict', 'dense' or 'reverse').
     
     RETURNS
     ========
@@ -70,19 +241,190 @@ def line_search(f, x, p, tau = 0.1, c = 0.1, alpha = 1):
     The alpha we found through backtracking line search
     """
 
-    x = ad.create_vector('x', x)
-    fn_val1 = f(x)
-    fn_val2 = f(x + alpha * p)
-    gradient = fn_val1.getGradient(['x{}'.format(i) for i in range(1, len(x) + 1)])
+    fn_val1, gradient = _value_and_gradient(f, x, mode)
+    fn_val2 = _value(f, x + alpha * p, mode)
     m = (p * gradient).sum()
     t = -c * m
-    while ad.get_value(fn_val1 - fn_val2) < alpha * t:
+    while alpha > 0 and not fn_val1 - fn_val2 >= alpha * t: #a nan value outside the domain of 'f' is no decrease
         alpha = tau * alpha 
-        fn_val2 = f(x + alpha * p)
+        fn_val2 = _value(f, x + alpha * p, mode)
     return alpha
+
+
+def _interpolate(a_lo, phi_lo, dphi_lo, a_hi, phi_hi, dphi_hi):
+    """
+    Returns a trial step between 'a_lo' and 'a_hi' for the zoom phase of wolfe_line_search: the minimizer of the cubic
+    matching the values and slopes of phi at both ends, else the minimizer of the quadratic matching phi(a_lo), phi'(a_lo)
+    and phi(a_hi), else the midpoint. A step within a tenth of the interval of either end is rejected, so that the
+    interval keeps shrinking.
+    """
+    width = a_hi - a_lo
+    low, high = min(a_lo, a_hi) + 0.1 * abs(width), max(a_lo, a_hi) - 0.1 * abs(width)
+    with np.errstate(all = 'ignore'):
+        d1 = dphi_lo + dphi_hi - 3 * (phi_lo - phi_hi) / (a_lo - a_hi)
+        d2 = np.sign(width) * np.sqrt(d1 * d1 - dphi_lo * dphi_hi)
+        cubic = a_hi - width * (dphi_hi + d2 - d1) / (dphi_hi - dphi_lo + 2 * d2)
+        quadratic = a_lo - dphi_lo * width * width / (2 * (phi_hi - phi_lo - dphi_lo * width))
+    for a in [cubic, quadratic]:
+        if low <= a <= high: #False for nan
+            return a
+    return a_lo + width / 2
+
+
+def wolfe_line_search(f, x, p, c1 = 1e-4, c2 = 0.9, alpha = 1, max_iter = 20, mode = 'dict'):
+    """
+    Implements a line search for a step satisfying the strong Wolfe conditions
+        f(x + alpha * p) <= f(x) + c1 * alpha * gradient(x)^T p    (sufficient decrease)
+        |gradient(x + alpha * p)^T p| <= c2 * |gradient(x)^T p|     (curvature)
+    Steps are doubled until they bracket such a step, and the bracket is then zoomed in on with cubic or quadratic
+    interpolation of the values and slopes at its ends (Nocedal and Wright, Numerical Optimization, algorithms 3.5 and 3.6).
+    The curvature condition makes y^T s positive for the BFGS and DFP updates.
+
+    INPUTS
+    =======
+    f: Function
+    The function that we are trying to find the minimum of. The function must take in the same number of arguments as len(x)
+    It can also be a CompiledFunction returned by ad.compile, or an EvaluationCache. Every trial point is evaluated with its
+    gradient, so with an EvaluationCache the gradient at the accepted point is not computed again by the caller.
+
+    x: List or array of ints/floats
+    The initial position
+
+    p: numpy array
+    Descent direction
+
+    c1: float
+    Parameter of the sufficient decrease condition
+
+    c2: float
+    Parameter of the curvature condition, with c1 < c2 < 1. 0.9 suits quasi-Newton directions, 0.1 to 0.4 steepest descent.
+
+    alpha: float
+    Starting alpha
+
+    max_iter: int
+    The max number of trial steps in each of the bracketing and zoom phases
+
+    mode: String
+    The differentiation mode passed to ad.create_vector ('dict', 'dense' or 'reverse').
+
+    RETURNS
+    ========
+    float
+    The alpha we found. If no step satisfying the conditions is found in 'max_iter' trials, the last step found that
+    decreases 'f' sufficiently, which is 0 if 'p' is not a descent direction.
+
+    EXAMPLES
+    =========
+    >>> wolfe_line_search(lambda x: (x[0] - 3) ** 2, [0], np.array([1.0]))
+    1
+    >>> wolfe_line_search(lambda x: (x[0] - 3) ** 2, [0], np.array([1.0]), c2 = 0.1)
+    3.0
+    """
+    phi0, gradient = _value_and_gradient(f, x, mode)
+    dphi0 = gradient @ p
+    if not dphi0 < 0:
+        return 0
+    previous, phi_previous, dphi_previous = 0, phi0, dphi0
+    for i in range(max_iter):
+        phi, gradient = _value_and_gradient(f, x + alpha * p, mode)
+        dphi = gradient @ p
+        if not phi <= phi0 + c1 * alpha * dphi0 or (i > 0 and phi >= phi_previous):
+            return _zoom(f, x, p, phi0, dphi0, previous, phi_previous, dphi_previous, alpha, phi, dphi, c1, c2, max_iter, mode)
+        if abs(dphi) <= -c2 * dphi0:
+            return alpha
+        if dphi >= 0:
+            return _zoom(f, x, p, phi0, dphi0, alpha, phi, dphi, previous, phi_previous, dphi_previous, c1, c2, max_iter, mode)
+        previous, phi_previous, dphi_previous = alpha, phi, dphi
+        alpha = 2 * alpha
+    return previous
+
+
+def _zoom(f, x, p, phi0, dphi0, a_lo, phi_lo, dphi_lo, a_hi, phi_hi, dphi_hi, c1, c2, max_iter, mode):
+    """Zoom phase of wolfe_line_search. 'a_lo' is the step of the bracket with the lowest value that decreases 'f'
+    sufficiently, and phi'(a_lo) * (a_hi - a_lo) < 0, so the bracket contains a step satisfying the strong Wolfe conditions."""
+    for _ in range(max_iter):
+        alpha = _interpolate(a_lo, phi_lo, dphi_lo, a_hi, phi_hi, dphi_hi)
+        phi, gradient = _value_and_gradient(f, x + alpha * p, mode)
+        dphi = gradient @ p
+        if not phi <= phi0 + c1 * alpha * dphi0 or phi >= phi_lo:
+            a_hi, phi_hi, dphi_hi = alpha, phi, dphi
+        else:
+            if abs(dphi) <= -c2 * dphi0:
+                return alpha
+            if dphi * (a_hi - a_lo) >= 0:
+                a_hi, phi_hi, dphi_hi = a_lo, phi_lo, dphi_lo
+            a_lo, phi_lo, dphi_lo = alpha, phi, dphi
+    return a_lo
+
+
+def _search(cache, x, p, search, alpha = 1, c2 = 0.9):
+    """Returns the step along 'p' found by the line search 'search', 'backtracking' or 'wolfe', starting at 'alpha'."""
+    if search == 'wolfe':
+        return wolfe_line_search(cache, x, p, alpha = alpha, c2 = c2)
+    return line_search(cache, x, p, alpha = alpha)
         
 
-def quasi_newtons_method(f, initial_guess, max_iter = 10000, method = 'BFGS', tol = 1e-12):
+def _two_loop(gradient, pairs):
+    """
+    Returns the product of the L-BFGS estimate of the inverse Hessian with 'gradient', computed with the two-loop recursion
+    from the stored (s, y, 1 / y^T s) pairs, oldest first, in O(mn) operations without forming any n x n matrix.
+    The initial estimate is the identity scaled by s^T y / y^T y of the newest pair.
+    """
+    q = np.array(gradient, dtype=float)
+    alphas = []
+    for s, y, rho in reversed(pairs):
+        alpha = rho * (s @ q)
+        q -= alpha * y
+        alphas.append(alpha)
+    if pairs:
+        s, y, rho = pairs[-1]
+        q *= 1 / (rho * (y @ y))
+    for (s, y, rho), alpha in zip(pairs, reversed(alphas)):
+        beta = rho * (y @ q)
+        q += (alpha - beta) * s
+    return q
+
+
+def _inverse_hessian_product(H, v, method, transpose = False):
+    """Returns H @ v for the inverse Hessian estimate of 'method' (H.T @ v if 'transpose'). The BFGS and DFP estimates are
+    symmetric and only their upper triangle is kept up to date."""
+    if method == 'Broyden':
+        return dgemv(1.0, H, v, trans = int(transpose))
+    return dsymv(1.0, H, v)
+
+
+def _update_inverse_hessian(H, s, y, method):
+    """
+    Applies the 'method' update of the inverse Hessian estimate 'H' for the step 's' and gradient change 'y' in place,
+    as one rank-two (rank-one for Broyden) BLAS update costing O(n^2) and no n x n temporaries. 'H' must be a
+    Fortran-ordered float array. Steps without positive curvature y^T s (or with s^T H y = 0 for Broyden) would make the
+    estimate indefinite or divide by zero, so 'H' is left as it is and False returned.
+    """
+    Hy = _inverse_hessian_product(H, y, method)
+    if method == 'Broyden':
+        denominator = s @ Hy
+        if denominator == 0:
+            return False
+        dger(1 / denominator, s - Hy, _inverse_hessian_product(H, s, method, transpose = True), a = H, overwrite_a = 1)
+        return True
+    curvature = y @ s
+    if curvature <= 0:
+        return False
+    rho = 1 / curvature
+    if method == 'BFGS':
+        #(I - rho s y^T) H (I - rho y s^T) + rho s s^T = H + s w^T + w s^T
+        w = (rho * rho * (y @ Hy) + rho) / 2 * s - rho * Hy
+        dsyr2(1.0, s, w, a = H, overwrite_a = 1)
+    else:
+        #H + s s^T / y^T s - Hy Hy^T / y^T H y = H + (u v^T + v u^T) / 2 with u, v = s / sqrt(y^T s) -/+ Hy / sqrt(y^T H y)
+        s, Hy = np.sqrt(rho) * s, Hy / np.sqrt(y @ Hy)
+        dsyr2(0.5, s - Hy, s + Hy, a = H, overwrite_a = 1)
+    return True
+
+
+def quasi_newtons_method(f, initial_guess, max_iter = 10000, method = 'BFGS', tol = 1e-12, mode = 'dict', history = 10,
+                         cache_size = 8, stats = None, search = 'backtracking'):
     """
     Implements Quasi-Newton methods with different methods to estimate the inverse of the Hessian.
     Utilizes backtracking line search to determine step size.     
@@ -92,6 +434,7 @@ def quasi_newtons_method(f, initial_guess, max_iter = 10000, method = 'BFGS', to
     ======= 
     f: function 
     The function that we are trying to find the minimum of. The function must take in single list/array that has the same dimension as len(initial_guess).
+    It can also be a CompiledFunction returned by ad.compile, in which case 'mode' is ignored, or an EvaluationCache.
     
     initial_guess: List or array of ints/floats
     The initial position to begin the search for the minimum of the function 'f'.
@@ -102,9 +445,31 @@ def quasi_newtons_method(f, initial_guess, max_iter = 10000, method = 'BFGS', to
     method: String
     The update method to update the estimate of the inverse of the Hessian.
     Currently, BFGS, DFP, and Broyden are implemented.
+    'L-BFGS' is the limited-memory BFGS method: instead of the n x n estimate it keeps the last 'history' steps and gradient
+    changes, and applies the estimate with the two-loop recursion, so memory and work per iteration are O(history * n).
+    'Newton' uses the exact Hessian computed with HyperDuals instead of an estimate. 'f' is then evaluated on
+    HyperDuals (for a CompiledFunction, the function it was compiled from) and 'mode' only applies to the line search.
     
     tol: float
     The tolerance. If the norm of the gradient is less than the tolerance, the algorithm will stop
+
+    mode: String
+    The differentiation mode passed to ad.create_vector ('dict', 'dense' or 'reverse').
+    'reverse' computes the gradient with one backward sweep, independent of len(initial_guess).
+
+    history: int
+    The number of pairs of steps and gradient changes L-BFGS keeps
+
+    cache_size: int
+    The number of points whose values and gradients are kept in the EvaluationCache 'f' is wrapped in. The gradient at the
+    current point is then computed once per iteration, although it is used by the direction, the line search and the update.
+
+    stats: dict
+    If a dictionary is passed in, 'cache_hits', 'cache_misses' and 'evaluations' are set to the counters of the cache.
+
+    search: String
+    The line search determining the step size along each direction. 'backtracking' uses line_search, 'wolfe' uses
+    wolfe_line_search, whose steps also satisfy the curvature condition, so that no BFGS or DFP update is skipped.
     
     RETURNS
     ========
@@ -112,39 +477,202 @@ def quasi_newtons_method(f, initial_guess, max_iter = 10000, method = 'BFGS', to
     A tuple with first entry which maps to the position of the minimum and second entry which maps to the number of iterations it took for the algorithm to stop
     """
     
-    if method not in ['BFGS', 'DFP', 'Broyden']:
+    if method not in ['BFGS', 'DFP', 'Broyden', 'Newton', 'L-BFGS']:
             raise Exception("Not a valid method.")
+    if search not in ['backtracking', 'wolfe']:
+        raise Exception("Not a valid line search.")
+    cache = _cached(f, mode, cache_size)
     x = initial_guess
-    H = np.identity(len(x))
+    H = np.asfortranarray(np.identity(len(x))) if method in ['BFGS', 'DFP', 'Broyden'] else None
+    pairs = deque(maxlen = history)
     for i in range(max_iter):
-        x_vector = ad.create_vector('x', x)
-        fn_at_x = f(x_vector)
-        gradient = fn_at_x.getGradient(['x{}'.format(i) for i in range(1, len(x) + 1)])
-
-        p = -H @ gradient
+        if method == 'Newton':
+            gradient, p = _newton_direction(cache.f, x)
+        elif method == 'L-BFGS':
+            _, gradient = _value_and_gradient(cache, x)
+            p = -_two_loop(gradient, pairs)
+        else:
+            _, gradient = _value_and_gradient(cache, x)
+            p = -_inverse_hessian_product(H, np.asarray(gradient, dtype=float), method)
         
-        alpha = line_search(f, x, p)
+        alpha = _search(cache, x, p, search)
         delta_x = alpha * p
+        if not (x + delta_x != x).any(): #the line search cannot improve on x in floating point
+            break
 
         x = x + delta_x
-        x_vector2 = ad.create_vector('x', x)
-        fn_at_x2 = f(x_vector2)
-        gradient2 = fn_at_x2.getGradient(['x{}'.format(i) for i in range(1, len(x) + 1)])
+        _, gradient2 = _value_and_gradient(cache, x)
         if np.sqrt(np.abs(gradient2).sum()) < tol:
             break
-        y = (gradient2 - gradient).reshape(-1, 1)
-        delta_x = delta_x.reshape(-1, 1)
-        if method == 'BFGS':
-            H = (np.identity(len(H)) - (delta_x @ y.T) / (y.T @ delta_x)) @ H \
-                @ (np.identity(len(H)) - (y @ delta_x.T) / (y.T @ delta_x)) + (delta_x @ delta_x.T) / (y.T @ delta_x)
-        elif method == 'DFP':
-            H = H + (delta_x @ delta_x.T) / (delta_x.T @ y) - (H @ y @ y.T @ H) / (y.T @ H @ y)
-        elif method == 'Broyden':
-            H = H + ((delta_x - H @ y) @ delta_x.T @ H) / (delta_x.T @ H @ y)
+        y = np.asarray(gradient2 - gradient, dtype=float)
+        delta_x = np.asarray(delta_x, dtype=float)
+        if method in ['BFGS', 'DFP', 'Broyden']:
+            _update_inverse_hessian(H, delta_x, y, method)
+        elif method == 'L-BFGS':
+            curvature = y @ delta_x
+            if curvature > 0: #pairs without positive curvature would make the estimate indefinite
+                pairs.append((delta_x, y, 1 / curvature))
 
+    cache._report(stats)
     return (x, i + 1)
 
-def _newtons_method_gmres_action(f, initial_guess, max_iter=50, tol=1e-12):
+
+def _to_boundary(z, d, radius):
+    """Returns the tau >= 0 for which ||z + tau * d|| = radius, given ||z|| <= radius."""
+    a, b, c = d @ d, 2 * (z @ d), z @ z - radius * radius
+    return (-b + np.sqrt(max(b * b - 4 * a * c, 0))) / (2 * a)
+
+
+def _steihaug(hessian_product, gradient, radius, tol):
+    """
+    Returns an approximate minimizer p of the model g^T p + p^T B p / 2 subject to ||p|| <= 'radius' and the product B p,
+    computed with conjugate gradients on B p = -g (Steihaug-CG). 'hessian_product' computes B d. The iteration stops when
+    the residual is below 'tol', and goes to the boundary of the trust region along the current direction when that
+    direction has negative curvature or leaves the region.
+    """
+    z, Bz = np.zeros(len(gradient)), np.zeros(len(gradient))
+    r = np.array(gradient, dtype=float)
+    d = -r
+    for _ in range(len(gradient)):
+        Bd = hessian_product(d)
+        curvature = d @ Bd
+        if curvature <= 0:
+            tau = _to_boundary(z, d, radius)
+            return z + tau * d, Bz + tau * Bd
+        alpha = (r @ r) / curvature
+        if np.linalg.norm(z + alpha * d) >= radius:
+            tau = _to_boundary(z, d, radius)
+            return z + tau * d, Bz + tau * Bd
+        z, Bz = z + alpha * d, Bz + alpha * Bd
+        r_next = r + alpha * Bd
+        if np.linalg.norm(r_next) < tol:
+            break
+        d = -r_next + (r_next @ r_next) / (r @ r) * d
+        r = r_next
+    return z, Bz
+
+
+def trust_region_newton_cg(f, initial_guess, max_iter = 1000, tol = 1e-12, radius = 1.0, max_radius = 1e3, eta = 0.15,
+                           mode = 'dict', cache_size = 8, stats = None):
+    """
+    Implements the trust-region Newton-CG method. Each iteration approximately minimizes the quadratic model of 'f' given
+    by its gradient and Hessian within a ball of radius 'radius' around the current point, with the Steihaug conjugate
+    gradient method. The Hessian is never formed: conjugate gradients only needs Hessian-vector products, which ad.hvp
+    computes with one forward-over-reverse sweep each. The radius grows when the model predicts the decrease of 'f' well
+    and shrinks when it does not, so directions of negative curvature and badly scaled problems are handled without a
+    line search. https://en.wikipedia.org/wiki/Trust_region
+
+    INPUTS
+    =======
+    f: function
+    The function that we are trying to find the minimum of. The function must take in single list/array that has the same dimension as len(initial_guess).
+    It can also be a CompiledFunction returned by ad.compile, or an EvaluationCache.
+
+    initial_guess: List or array of ints/floats
+    The initial position to begin the search for the minimum of the function 'f'.
+
+    max_iter: int
+    The max number of iterations
+
+    tol: float
+    The tolerance. If the norm of the gradient is less than the tolerance, the algorithm will stop
+
+    radius: float
+    The initial radius of the trust region
+
+    max_radius: float
+    The largest radius the trust region can grow to
+
+    eta: float
+    Steps are accepted when the actual decrease of 'f' is more than 'eta' times the decrease predicted by the model
+
+    mode: String
+    The differentiation mode passed to ad.create_vector ('dict', 'dense' or 'reverse') for the gradients.
+
+    cache_size: int
+    The number of points whose values and gradients are kept in the EvaluationCache 'f' is wrapped in
+
+    stats: dict
+    If a dictionary is passed in, 'cache_hits', 'cache_misses' and 'evaluations' are set to the counters of the cache
+    and 'hessian_products' to the number of Hessian-vector products.
+
+    RETURNS
+    ========
+    Tuple
+    A tuple with first entry which maps to the position of the minimum and second entry which maps to the number of iterations it took for the algorithm to stop
+
+    EXAMPLES
+    =========
+    >>> x, iterations = trust_region_newton_cg(lambda x: (2 - x[0]) ** 2 + 3 * (x[1] - x[0] ** 2) ** 2, [1, 1])
+    >>> np.allclose(x, [2, 4])
+    True
+    """
+    cache = _cached(f, mode, cache_size)
+    x = np.array(initial_guess, dtype=float)
+    products = [0]
+    def hessian_product(v):
+        products[0] += 1
+        return ad.hvp(cache.f, x, v)[1]
+    for i in range(max_iter):
+        value, gradient = _value_and_gradient(cache, x)
+        gradient_norm = np.linalg.norm(gradient)
+        if np.sqrt(np.abs(gradient).sum()) < tol:
+            break
+        #loose solves far from the minimum and superlinear convergence near it
+        p, Bp = _steihaug(hessian_product, gradient, radius, min(0.5, np.sqrt(gradient_norm)) * gradient_norm)
+        if not (x + p != x).any(): #the step cannot change x in floating point
+            break
+        predicted = -(gradient @ p + p @ Bp / 2)
+        actual = value - _value(cache, x + p)
+        rho = actual / predicted if predicted > 0 else -1
+        if not rho >= 0.25: #also for a nan value outside the domain of 'f'
+            radius = radius / 4
+        elif rho > 0.75 and np.isclose(np.linalg.norm(p), radius):
+            radius = min(2 * radius, max_radius)
+        if rho > eta:
+            x = x + p
+    cache._report(stats)
+    if stats is not None:
+        stats['hessian_products'] = products[0]
+    return (x, i + 1)
+
+def _jacobian_action(f, x0, output_dim):
+    """
+    Returns the Jacobian of 'f' at 'x0' as a LinearOperator. Its action J_f(x0)*X seeds the variables in x0 with the
+    columns of 'X', so a matvec, or a matmat on a whole block of directions, costs one evaluation of 'f'.
+    """
+    if isinstance(f, ad.CompiledFunction): #the compiled kernel gives the whole Jacobian at once
+        jacobian = f.evaluate(x0)[1]
+        return LinearOperator(shape=jacobian.shape, matvec=lambda x: jacobian @ x)
+
+    def L_fun(X):
+        return ad.get_tangents(f(ad.create_vector('x0', x0, seed_vector=X)))
+
+    return LinearOperator(shape=(output_dim, len(x0)), matvec=lambda x: L_fun(np.reshape(x, (-1, 1)))[:, 0], matmat=L_fun)
+
+
+def _jacobian_diagonal(f, x0):
+    """Returns the diagonal of the Jacobian of 'f' at 'x0', read from the derivative dictionaries of one evaluation on Scalars.
+    Outputs that do not depend on 'x0' have zero rows."""
+    if isinstance(f, ad.CompiledFunction):
+        return np.diag(f.evaluate(x0)[1]).copy()
+    return ad.sparse._assemble(f(ad.create_vector('x0', x0)), 'x0', len(x0))[1].diagonal()
+
+
+def _preconditioner(f, x0, preconditioner):
+    """Returns the preconditioner M, an approximation of the inverse of the Jacobian of 'f' at 'x0', passed to gmres."""
+    if preconditioner == 'jacobi':
+        diagonal = _jacobian_diagonal(f, x0)
+        diagonal[diagonal == 0] = 1.0
+        return LinearOperator(shape=(len(x0), len(x0)), matvec=lambda r: np.ravel(r) / diagonal)
+    if preconditioner == 'ilu':
+        jacob = _residual_and_jacobian(f, x0, 'sparse')[1]
+        ilu = spilu(sp.csc_matrix(jacob))
+        return LinearOperator(shape=(len(x0), len(x0)), matvec=ilu.solve)
+    return preconditioner(f, x0)
+
+
+def _newtons_method_gmres_action(f, initial_guess, max_iter=50, tol=1e-12, forcing=None, preconditioner=None, stats=None):
     """
     Helper function to solve for the step size using a Linear Operator that is passed to scipy.sparse.linalg.gmres for Newton's method.
     
@@ -162,6 +690,19 @@ def _newtons_method_gmres_action(f, initial_guess, max_iter=50, tol=1e-12):
     
     tol: float
     The tolerance. If the abs value of the steps for one iteration are less than the tol, then the algorithm stops
+
+    forcing: String
+    None solves every linear system to the relative tolerance 'tol'. 'eisenstat_walker' makes the iteration an inexact
+    Newton method: the relative tolerance of each gmres solve (the forcing term) is chosen from the reduction of the residual
+    in the previous iteration, so that the first solves are loose and the last ones tight.
+
+    preconditioner: String or function
+    'jacobi' preconditions gmres with the inverse of the diagonal of the Jacobian, read from the derivatives of the Scalars.
+    'ilu' uses an incomplete LU factorization (scipy.sparse.linalg.spilu) of the Jacobian assembled as a sparse matrix.
+    A function taking 'f' and the current point and returning a LinearOperator can also be passed in. Defaults to None.
+
+    stats: dict
+    If a dictionary is passed in, 'gmres_iterations' is set to the total number of gmres iterations.
     
     RETURNS
     ========
@@ -177,43 +718,98 @@ def _newtons_method_gmres_action(f, initial_guess, max_iter=50, tol=1e-12):
 
     output_dim = len(f(initial_guess))
     
-    @np.vectorize
-    def sum_values(dictionary):
-        return sum(dictionary.values())
-    
-    def create_action(x0):
-        
-        def L_fun(x):
-            """
-            Action
-            Returns J_f(x0)*x by setting the values of 'x' as the initial derivatives for the variables in x0.
-            """
-        
-            f_x0 = f(ad.create_vector('x0', x0, seed_vector=x));
-            f_x0 = np.array(f_x0) #ensure that f_x0 is np.array
-            action = sum_values(ad.get_deriv(f_x0))
-            return action
-        
-        L = LinearOperator(shape=(output_dim, len(x0)), matvec=L_fun)
-        
-        return L
-    
-    x0 = initial_guess
+    #the operator evaluates f at x0, which is updated in place, so one operator serves every iteration
+    x0 = np.array(initial_guess, dtype=float)
+    L = _jacobian_action(f, x0, output_dim)
+    gmres_iterations = [0]
+    count = lambda residual: gmres_iterations.__setitem__(0, gmres_iterations[0] + 1)
+    eta, residual_norm = 0.5, None
     for iter_num in range(max_iter):
-        L = create_action(x0)
-        b = -1 * np.array(f(x0))
-        if len(x0) == 1:
-            b = np.array([b])
-        step, _ = gmres(L, b, tol = tol, atol = 'legacy')
+        if isinstance(f, ad.CompiledFunction): #the Jacobian of a compiled function is a matrix, recomputed at every point
+            L = _jacobian_action(f, x0, output_dim)
+        b = -1 * np.array(f(x0), dtype=float).ravel()
+        M = None if preconditioner is None else _preconditioner(f, x0, preconditioner)
+        if forcing == 'eisenstat_walker':
+            #choice 2 of Eisenstat and Walker (gamma = 0.9, alpha = 2) with their safeguard against dropping too fast
+            if residual_norm is not None:
+                eta_next = 0.9 * (np.linalg.norm(b) / residual_norm) ** 2
+                if 0.9 * eta ** 2 > 0.1:
+                    eta_next = max(eta_next, 0.9 * eta ** 2)
+                eta = min(eta_next, 0.9)
+            residual_norm = np.linalg.norm(b)
+            step, _ = gmres(L, b, tol = eta, atol = 0.0, M = M, callback = count, callback_type = 'pr_norm')
+        else:
+            step, _ = gmres(L, b, tol = tol, atol = 'legacy', M = M, callback = count, callback_type = 'pr_norm')
         xnext = x0 + step 
         if np.all(np.abs(xnext - x0) < tol):
+            if stats is not None:
+                stats['gmres_iterations'] = gmres_iterations[0]
             return (xnext, iter_num + 1);
-        x0 = xnext
+        x0[:] = xnext
     
     raise RuntimeError("Failed to converge after {0} iterations, value is {1}".format(max_iter, x0) );
 
 
-def newtons_method(f, initial_guess, max_iter = 1000, method = 'exact', tol =1e-12):
+def _factorize(jacob):
+    """Returns functions solving J x = b and J^T x = b with an LU factorization of the dense or sparse Jacobian 'jacob'.
+    Sparse Jacobians are factored with splu unless more than a tenth of their entries are nonzero."""
+    if sp.issparse(jacob) and jacob.nnz * 10 < jacob.shape[0] * jacob.shape[1]:
+        lu = splu(sp.csc_matrix(jacob))
+        return lu.solve, partial(lu.solve, trans='T')
+    lu = lu_factor(jacob.toarray() if sp.issparse(jacob) else jacob)
+    return partial(lu_solve, lu), partial(lu_solve, lu, trans=1)
+
+
+def _newtons_method_broyden(f, initial_guess, max_iter, tol, good = True, memory = None):
+    """
+    Broyden's method for root-finding. The Jacobian is computed with autodiff once, at 'initial_guess', and factorized.
+    The inverse of the Jacobian is then approximated by H = J0^-1 + sum_i u_i v_i^T, updated after every step s with the
+    change y of the residual so that H y = s: v = H^T s for the good method and v = y for the bad one.
+    Each iteration costs one value-only evaluation of 'f'. With 'memory', the updates restart from J0^-1 once 'memory' of them
+    have been stored. See newtons_method for the inputs and the return value.
+    """
+    x0 = np.array(initial_guess, dtype=float)
+    fn, jacob = _residual_and_jacobian(f, x0, 'sparse')
+    solve, solve_transposed = _factorize(jacob)
+    U, V = [], []
+    apply = lambda b: solve(b) + sum(u * (v @ b) for u, v in zip(U, V))
+    apply_transposed = lambda b: solve_transposed(b) + sum(v * (u @ b) for u, v in zip(U, V))
+    for iter_num in range(max_iter):
+        step = -apply(fn)
+        xnext = x0 + step
+        if np.all(np.abs(xnext - x0) < tol):
+            return (xnext, iter_num + 1);
+        fnext = np.array(f(xnext), dtype=float).ravel()
+        y = fnext - fn
+        if memory is not None and len(U) >= memory: #restart from the initial Jacobian
+            U, V = [], []
+        Hy = apply(y)
+        v = apply_transposed(step) if good else y
+        denominator = v @ y
+        if denominator != 0: #no update if the residual did not change
+            U.append((step - Hy) / denominator)
+            V.append(v)
+        x0, fn = xnext, fnext
+
+    raise RuntimeError("Failed to converge after {0} iterations, value is {1}".format(max_iter, x0) );
+
+
+def _residual_and_jacobian(f, x0, method, mode = 'dict'):
+    """Returns the value of 'f' at 'x0' and its Jacobian, as a CSR matrix for method 'sparse'. The dense Jacobian is
+    computed on DenseScalars, or on a DualArray for mode 'array'."""
+    if isinstance(f, ad.CompiledFunction):
+        return f.evaluate(x0)
+    if method == 'sparse':
+        return ad.sparse._assemble(f(ad.create_vector('x0', x0)), 'x0', len(x0))
+    #seeding every direction at once gives the whole Jacobian in one evaluation of f
+    fn = f(ad.create_vector('x0', x0, seed_vector=np.identity(len(x0)), mode=mode))
+    if not isinstance(fn, ad.DualArray):
+        fn = np.array(fn); #need convert the list/array that is passed back from function, so downstream autodiff functions for vectors work properly
+    return ad.get_value(fn), ad.get_tangents(fn)
+
+
+def newtons_method(f, initial_guess, max_iter = 1000, method = 'exact', tol =1e-12, jacobian_reuse = 1, broyden_memory = None,
+                   forcing = None, preconditioner = None, stats = None):
     """
     Implements Newton's method for root-finding with different methods to find the step at each iteration
     
@@ -221,6 +817,7 @@ def newtons_method(f, initial_guess, max_iter = 1000, method = 'exact', tol =1e-
     ======= 
     f: Function 
     The function that we are trying to find a root of. The function must take in single list/array that has the same dimension as len(initial_guess).
+    It can also be a CompiledFunction returned by ad.compile.
     
     initial_guess: List or array of ints/floats
     The initial position to begin the search for the roots of the function 'f'.
@@ -235,9 +832,36 @@ def newtons_method(f, initial_guess, max_iter = 1000, method = 'exact', tol =1e-
         'exact' : Use np.linalg.solve(A, b)
         'gmres" : Use scipy.sparse.linalg.gmres(A, b), which finds a solution iteratively
         'gmres_action' :  Use np.linalg.gmres(L, b), where 'L' is a linear operator used to efficiently calculate A*x. Works well for functions with sparse Jacobian matrices.
+        'sparse' : Assemble A as a scipy.sparse CSR matrix from the derivative dictionaries of the Scalars and solve with a sparse LU
+                   factorization (scipy.sparse.linalg.splu). Time and memory scale with the number of nonzeros of A instead of n^2,
+                   which suits the banded Jacobians of discretized differential equations.
+        'broyden' : Good Broyden method. A is computed once, at the initial guess, and LU-factored. Every following iteration
+                    costs one value-only evaluation of 'f' and a rank-one secant update of the inverse of A.
+        'bad_broyden' : Bad Broyden method, whose rank-one update of the inverse of A does not need a transposed solve.
     
     tol: float
     The tolerance. If the abs value of the steps for one iteration are less than the tol, then the algorithm stops
+
+    jacobian_reuse: int
+    The number of iterations a factorized Jacobian is used for (chord/Shamanskii method), for the methods 'exact' and 'sparse'.
+    The Jacobian is LU-factored once (scipy.linalg.lu_factor, or splu for 'sparse') and the following iterations only
+    evaluate the residual, without derivatives. It is recomputed after 'jacobian_reuse' iterations, or as soon as an
+    iteration fails to halve the norm of the residual. Defaults to 1, i.e. Newton's method.
+
+    broyden_memory: int
+    For the Broyden methods, the number of rank-one updates kept before restarting from the initial Jacobian (limited-memory
+    Broyden). The updates are stored as pairs of vectors, so an iteration costs O(broyden_memory * n) on top of the solve
+    with the initial factorization. Defaults to None, i.e. no restart.
+
+    forcing: String
+    For 'gmres_action', 'eisenstat_walker' solves the linear systems inexactly with adaptive tolerances (inexact Newton-Krylov).
+    See _newtons_method_gmres_action.
+
+    preconditioner: String or function
+    For 'gmres_action', 'jacobi', 'ilu' or a function returning a LinearOperator. See _newtons_method_gmres_action.
+
+    stats: dict
+    For 'gmres_action', a dictionary that receives the total number of gmres iterations under 'gmres_iterations'.
     
     RETURNS
     ========
@@ -251,35 +875,712 @@ def newtons_method(f, initial_guess, max_iter = 1000, method = 'exact', tol =1e-
         - If the convergence is not reached by 'max_iter', then a RuntimeError is thrown to alert the user.
     """
 
-    if method not in ['inverse', 'exact', 'gmres', 'gmres_action']:
+    if method not in ['inverse', 'exact', 'gmres', 'gmres_action', 'sparse', 'broyden', 'bad_broyden']:
         raise Exception("Not a valid method.")
+    if jacobian_reuse > 1 and method not in ['exact', 'sparse']:
+        raise Exception("Jacobian reuse is only available for the methods 'exact' and 'sparse'.")
     if len(f(initial_guess)) != len(initial_guess):
         raise Exception('Output dimension of f should be the same as the input dimension of f.')
     if method == 'gmres_action':
-        return _newtons_method_gmres_action(f, initial_guess, max_iter, tol)
-    x0 = ad.create_vector('x0', initial_guess)
+        return _newtons_method_gmres_action(f, initial_guess, max_iter, tol, forcing, preconditioner, stats)
+    if method in ['broyden', 'bad_broyden']:
+        return _newtons_method_broyden(f, initial_guess, max_iter, tol, method == 'broyden', broyden_memory)
+    x0 = np.array(initial_guess, dtype=float)
+    factorization = None
     for iter_num in range(max_iter):
-        fn = np.array(f(x0)); #need convert the list/array that is passed back from function, so downstream autodiff functions for vectors work properly
-        jacob = ad.get_jacobian(fn, ['x0{}'.format(i) for i in range(1, len(fn) + 1)])
-        if method == 'inverse':
-            step = np.linalg.inv(-jacob).dot(ad.get_value(fn))
-        if method == 'exact':
-            step = np.linalg.solve(-jacob, ad.get_value(fn))
+        if factorization is not None and reused < jacobian_reuse:
+            #chord step: value-only residual, keeping the factorization while it still halves the residual
+            fn = np.array(f(x0), dtype=float).ravel()
+            if np.linalg.norm(fn) > 0.5 * residual_norm:
+                factorization = None
+        else:
+            factorization = None
+        if factorization is None:
+            fn, jacob = _residual_and_jacobian(f, x0, method)
+            if jacobian_reuse > 1:
+                factorization = splu(sp.csc_matrix(jacob)).solve if method == 'sparse' else partial(lu_solve, lu_factor(jacob))
+                reused = 0
+        residual_norm = np.linalg.norm(fn)
+        if factorization is not None:
+            step = factorization(-fn)
+            reused += 1
+        elif method == 'inverse':
+            step = np.linalg.inv(-jacob).dot(fn)
+        elif method == 'exact':
+            step = np.linalg.solve(-jacob, fn)
         elif method == 'gmres':
-            step, _ = gmres(jacob, -ad.get_value(fn), tol = tol, atol = 'legacy')
+            step, _ = gmres(jacob, -fn, tol = tol, atol = 'legacy')
+        elif method == 'sparse':
+            step = splu(sp.csc_matrix(jacob)).solve(-fn)
         xnext = x0 + step
         
         #check if we have converged
-        if np.all(np.abs(ad.get_value(xnext) - ad.get_value(x0)) < tol):
-            return (ad.get_value(xnext), iter_num + 1);
+        if np.all(np.abs(xnext - x0) < tol):
+            return (xnext, iter_num + 1);
         
         #update x0 because we have not converged yet
         x0 = xnext
         
-    raise RuntimeError("Failed to converge after {0} iterations, value is {1}".format(max_iter, ad.get_value(x0)) );
+    raise RuntimeError("Failed to converge after {0} iterations, value is {1}".format(max_iter, x0) );
 
-    
-    
 
+def _damped_step(jacob, residual, damping, scale, solver):
+    """
+    Returns the Levenberg-Marquardt step d minimizing ||J d + r||^2 + damping * d^T diag(scale) d. 'qr' factors the
+    augmented matrix [J; sqrt(damping * scale)], which avoids squaring the condition number of J, 'cholesky' factors the
+    normal equations J^T J + damping * diag(scale). A sparse Jacobian has its normal equations factored with splu.
+    """
+    if sp.issparse(jacob):
+        normal = (jacob.T @ jacob + sp.diags(damping * scale)).tocsc()
+        return splu(normal).solve(-(jacob.T @ residual))
+    if solver == 'qr':
+        Q, R = np.linalg.qr(np.vstack([jacob, np.diag(np.sqrt(damping * scale))]))
+        return solve_triangular(R, -(Q[:len(residual)].T @ residual))
+    normal = jacob.T @ jacob
+    normal[np.diag_indices_from(normal)] += damping * scale
+    return cho_solve(cho_factor(normal), -(jacob.T @ residual))
 
-        
+
+def least_squares(residual_fn, x0, max_iter = 100, tol = 1e-12, damping = 1e-3, solver = 'qr', jacobian = 'dense', mode = 'dict',
+                  stats = None):
+    """
+    Implements the Levenberg-Marquardt method for nonlinear least squares, minimizing ||r(x)||^2 / 2 for the residuals r
+    returned by 'residual_fn'. Each iteration computes the Jacobian J of the residuals and takes the step d minimizing
+    ||J d + r||^2 + damping * d^T D d, with D the squared norms of the columns of J. Small damping gives the Gauss-Newton
+    step, which converges quickly near a good fit, large damping a short step along the negative gradient. The damping is
+    adapted from the ratio of the actual and predicted decrease of the sum of squares (Nielsen's rule).
+    https://en.wikipedia.org/wiki/Levenberg%E2%80%93Marquardt_algorithm
+
+    INPUTS
+    =======
+    residual_fn: function
+    The function returning the residuals. It must take in a single list/array that has the same dimension as len(x0) and
+    return a list/array of any length. It can also be a CompiledFunction returned by ad.compile.
+
+    x0: List or array of ints/floats
+    The initial position to begin the search for the minimum of the sum of squares.
+
+    max_iter: int
+    The max number of iterations
+
+    tol: float
+    The tolerance. The algorithm stops when the largest entry of the gradient J^T r is less than the tolerance,
+    or when the step is smaller than the tolerance relative to x.
+
+    damping: float
+    The initial damping parameter
+
+    solver: String
+    'qr' solves for the step with a QR factorization of J augmented with the damping, 'cholesky' with a Cholesky
+    factorization of the damped normal equations, which is cheaper when there are many more residuals than variables.
+
+    jacobian: String
+    'dense' computes J with one evaluation of 'residual_fn' on a vector seeded with the identity. 'sparse' assembles it
+    as a CSR matrix from the derivative dictionaries of the Scalars (see newtons_method), and the damped normal equations
+    are then factored with scipy.sparse.linalg.splu.
+
+    mode: String
+    For the dense Jacobian, 'dict' evaluates 'residual_fn' on DenseScalars, 'array' on a DualArray. 'array' suits
+    residuals computed with whole-array operations on the data, such as t * x[1].
+
+    stats: dict
+    If a dictionary is passed in, 'jacobian_evaluations' and 'residual_evaluations' are set to the number of evaluations
+    of 'residual_fn' with and without derivatives.
+
+    RETURNS
+    ========
+    Tuple
+    A tuple with first entry which maps to the position of the minimum and second entry which maps to the number of iterations it took for the algorithm to stop
+
+    EXAMPLES
+    =========
+    >>> t = np.linspace(0, 1, 5)
+    >>> x, iterations = least_squares(lambda x: x[0] * ad.exp(t * x[1]) - 2 * np.exp(-t), [1, 0], mode = 'array')
+    >>> np.allclose(x, [2, -1])
+    True
+    """
+    if solver not in ['qr', 'cholesky']:
+        raise Exception("Not a valid solver.")
+    if jacobian not in ['dense', 'sparse']:
+        raise Exception("Not a valid Jacobian.")
+    x = np.array(x0, dtype=float)
+    jacobian_evaluations, residual_evaluations = 0, 0
+    decrease = 2
+    accepted = True
+    for i in range(max_iter):
+        if accepted:
+            residual, jacob = _residual_and_jacobian(residual_fn, x, 'sparse' if jacobian == 'sparse' else 'exact', mode)
+            residual = np.asarray(residual, dtype=float).ravel()
+            jacobian_evaluations += 1
+            gradient = jacob.T @ residual
+            if np.abs(gradient).max() < tol:
+                break
+            #scaling by the column norms makes the steps independent of the units of the variables; it is never decreased
+            column_norms = np.asarray(jacob.multiply(jacob).sum(axis=0)).ravel() if sp.issparse(jacob) else (jacob * jacob).sum(axis=0)
+            scale = column_norms if i == 0 else np.maximum(scale, column_norms)
+        step = _damped_step(jacob, residual, damping, np.maximum(scale, 1e-12 * max(scale.max(), 1)), solver)
+        if np.linalg.norm(step) <= tol * (np.linalg.norm(x) + tol):
+            break
+        trial = np.array(residual_fn(x + step), dtype=float).ravel()
+        residual_evaluations += 1
+        Jstep = jacob @ step
+        predicted = -(residual @ Jstep) - Jstep @ Jstep / 2
+        rho = (residual @ residual - trial @ trial) / 2 / predicted
+        accepted = rho > 0 #False for a nan residual outside the domain of the function
+        if accepted:
+            x = x + step
+            damping = damping * max(1 / 3, 1 - (2 * rho - 1) ** 3)
+            decrease = 2
+        else:
+            damping = damping * decrease
+            decrease = 2 * decrease
+    if stats is not None:
+        stats['jacobian_evaluations'] = jacobian_evaluations
+        stats['residual_evaluations'] = residual_evaluations
+    return (x, i + 1)
+
+
+def _batch_variables(points):
+    """Returns the DualArray of shape (n, B) whose row i holds variable x<i+1> of each of the B points (the rows of
+    'points'), so that x[i] is an array over the batch and its derivatives are those of the i-th unit vector."""
+    B, n = points.shape
+    registry = ad.VariableRegistry()
+    registry.register_vector('x', n)
+    deriv = np.zeros((n, B, n))
+    deriv[np.arange(n), :, np.arange(n)] = 1
+    return ad.DualArray(points.T, deriv, registry)
+
+
+def _batch_row(output, B, names):
+    """Returns the values (B,) and derivatives (B, n) of one output of a function evaluated on _batch_variables."""
+    if isinstance(output, np.ndarray) and output.dtype == object: #np.array has split the output into its B members
+        members = [_batch_row(member, 1, names) for member in output]
+        return np.concatenate([value for value, _ in members]), np.concatenate([deriv for _, deriv in members])
+    try:
+        return np.broadcast_to(output.getValue(), (B,)), np.broadcast_to(output.getGradient(names), (B, len(names)))
+    except AttributeError: #an output that does not depend on the variables
+        return np.full(B, float(output)), np.zeros((B, len(names)))
+
+
+def _batch_evaluate(f, points, args = ()):
+    """
+    Evaluates 'f' once on the whole batch of points (the rows of 'points') and returns the values and derivatives of
+    every member: shapes (B,) and (B, n) for a function returning a scalar, (B, m) and (B, m, n) for one returning m
+    outputs.
+    """
+    B, n = points.shape
+    names = ['x{}'.format(i) for i in range(1, n + 1)]
+    fn = f(_batch_variables(points), *args)
+    if isinstance(fn, (list, tuple, np.ndarray)) or (isinstance(fn, ad.DualArray) and fn.getValue().ndim == 2):
+        rows = [_batch_row(output, B, names) for output in fn]
+        return np.stack([value for value, _ in rows], axis=1), np.stack([deriv for _, deriv in rows], axis=1)
+    return _batch_row(fn, B, names)
+
+
+def _batch_value(f, points, args = ()):
+    """Returns the values of 'f' at the rows of 'points', evaluated on plain float arrays over the batch."""
+    with np.errstate(all = 'ignore'):
+        return np.broadcast_to(np.asarray(f(points.T, *args), dtype=float), (len(points),)).copy()
+
+
+def _batch_args(args, members):
+    """Returns the per-member data in 'args' for the batch members 'members', with the batch axis moved last."""
+    return tuple(np.moveaxis(np.asarray(arg)[members], 0, -1) for arg in args)
+
+
+def batch_quasi_newtons_method(f, initial_guesses, max_iter = 10000, tol = 1e-12, args = (), stats = None):
+    """
+    Runs the BFGS method of quasi_newtons_method on B problems at once. 'f' is evaluated once per iteration on the whole
+    batch: the variable x[i] it receives is a DualArray holding the i-th coordinate of every member, so its arithmetic
+    and the functions of autodiff differentiate all members with whole-array numpy operations. The B inverse Hessian
+    estimates are updated together as a (B, n, n) array, and each member stops on its own once it has converged;
+    converged members are no longer evaluated.
+
+    INPUTS
+    =======
+    f: function
+    The function that we are trying to find the minima of. It must take in a single list/array 'x' of length n (plus
+    the arrays in 'args') and only combine the entries of 'x' elementwise, as in x[0] ** 2 + ad.sin(x[1]), so that it
+    can be evaluated on arrays over the batch.
+
+    initial_guesses: 2-D array of ints/floats
+    The (B, n) array whose rows are the initial positions of the B problems
+
+    max_iter: int
+    The max number of iterations
+
+    tol: float
+    The tolerance. If the norm of the gradient of a member is less than the tolerance, that member stops
+
+    args: tuple
+    Data of each problem, passed to 'f' after 'x'. Each entry is an array whose first axis has length B, and is passed
+    on with the batch axis last, so that f(x, data) can use data[j] like x[i].
+
+    stats: dict
+    If a dictionary is passed in, 'evaluations' and 'value_evaluations' are set to the number of batched evaluations of
+    'f' with and without derivatives, and 'converged' to a boolean array telling which members have converged.
+
+    RETURNS
+    ========
+    Tuple
+    A tuple with first entry which maps to the (B, n) positions of the minima and second entry which maps to the array of
+    the numbers of iterations each member took to stop
+
+    EXAMPLES
+    =========
+    >>> x, iterations = batch_quasi_newtons_method(lambda x: (x[0] - 1) ** 2 + 3 * (x[1] - x[0] ** 2) ** 2, [[0, 0], [2, 3]])
+    >>> np.allclose(x, 1)
+    True
+    """
+    x = np.array(initial_guesses, dtype=float)
+    B, n = x.shape
+    H = np.tile(np.identity(n), (B, 1, 1))
+    iterations = np.full(B, max_iter)
+    converged = np.zeros(B, dtype=bool)
+    active = np.arange(B)
+    values, gradients = _batch_evaluate(f, x, _batch_args(args, active))
+    evaluations, value_evaluations = 1, 0
+    for i in range(max_iter):
+        #backtracking line search of every active member, as in line_search
+        p = -np.einsum('bij,bj->bi', H[active], gradients)
+        t = -0.1 * (p * gradients).sum(axis=1)
+        alpha = np.ones(len(active))
+        trial = _batch_value(f, x[active] + p, _batch_args(args, active))
+        value_evaluations += 1
+        pending = ~(values - trial >= alpha * t)
+        while pending.any():
+            alpha[pending] = 0.1 * alpha[pending]
+            members = np.flatnonzero(pending)
+            trial[members] = _batch_value(f, x[active[members]] + alpha[members, None] * p[members],
+                                          _batch_args(args, active[members]))
+            value_evaluations += 1
+            pending = (alpha > 0) & ~(values - trial >= alpha * t)
+        s = alpha[:, None] * p
+        stalled = ~(x[active] + s != x[active]).any(axis=1) #the line search cannot improve on x in floating point
+        x[active] = x[active] + s
+        values, gradients2 = _batch_evaluate(f, x[active], _batch_args(args, active))
+        evaluations += 1
+        done = np.sqrt(np.abs(gradients2).sum(axis=1)) < tol
+        converged[active[done]] = True
+        iterations[active[done | stalled]] = i + 1
+        #BFGS update of the members with positive curvature, H + s w^T + w s^T as in _update_inverse_hessian
+        y = gradients2 - gradients
+        curvature = (y * s).sum(axis=1)
+        update = curvature > 0
+        rho = np.where(update, 1 / np.where(update, curvature, 1), 0)
+        Hy = np.einsum('bij,bj->bi', H[active], y)
+        w = ((rho * rho * (y * Hy).sum(axis=1) + rho) / 2)[:, None] * s - rho[:, None] * Hy
+        H[active] += w[:, :, None] * s[:, None, :] + s[:, :, None] * w[:, None, :]
+        keep = ~(done | stalled)
+        active, values, gradients = active[keep], values[keep], gradients2[keep]
+        if not len(active):
+            break
+    if stats is not None:
+        stats['evaluations'] = evaluations
+        stats['value_evaluations'] = value_evaluations
+        stats['converged'] = converged
+    return (x, iterations)
+
+
+def batch_newtons_method(f, initial_guesses, max_iter = 1000, tol = 1e-12, args = (), stats = None):
+    """
+    Runs Newton's method of newtons_method on B root finding problems at once. 'f' is evaluated once per iteration on
+    the whole batch (see batch_quasi_newtons_method), giving the (B, n, n) Jacobians of all members, and the B Newton steps
+    are computed together with np.linalg.solve. Each member stops on its own once its step is smaller than 'tol';
+    converged members are no longer evaluated. Members whose Jacobian is singular take the least squares step.
+
+    INPUTS
+    =======
+    f: function
+    The function that we are trying to find the roots of. It must take in a single list/array 'x' of length n (plus
+    the arrays in 'args'), return a list/array of n outputs and only combine the entries of 'x' elementwise.
+
+    initial_guesses: 2-D array of ints/floats
+    The (B, n) array whose rows are the initial positions of the B problems
+
+    max_iter: int
+    The max number of iterations
+
+    tol: float
+    The tolerance. If the abs values of the step of a member are less than the tolerance, that member stops
+
+    args: tuple
+    Data of each problem, passed to 'f' after 'x', see batch_quasi_newtons_method.
+
+    stats: dict
+    If a dictionary is passed in, 'evaluations' is set to the number of batched evaluations of 'f' and 'converged' to a
+    boolean array telling which members have converged. Unlike newtons_method, members that do not converge within
+    'max_iter' iterations do not raise an error.
+
+    RETURNS
+    ========
+    Tuple
+    A tuple with first entry which maps to the (B, n) roots and second entry which maps to the array of the numbers of
+    iterations each member took to stop
+
+    EXAMPLES
+    =========
+    >>> x, iterations = batch_newtons_method(lambda x, c: [x[0] ** 2 - c[0]], [[1], [1], [1]], args = ([[2], [3], [4]],))
+    >>> np.allclose(x.ravel(), np.sqrt([2, 3, 4]))
+    True
+    """
+    x = np.array(initial_guesses, dtype=float)
+    B, n = x.shape
+    iterations = np.full(B, max_iter)
+    converged = np.zeros(B, dtype=bool)
+    active = np.arange(B)
+    for i in range(max_iter):
+        residuals, jacobians = _batch_evaluate(f, x[active], _batch_args(args, active))
+        try:
+            steps = np.linalg.solve(jacobians, -residuals[..., None])[..., 0]
+        except np.linalg.LinAlgError: #some Jacobian is singular
+            steps = np.array([np.linalg.lstsq(jacobian, -residual, rcond=None)[0]
+                              for jacobian, residual in zip(jacobians, residuals)])
+        x[active] = x[active] + steps
+        done = np.all(np.abs(steps) < tol, axis=1)
+        converged[active[done]] = True
+        iterations[active[done]] = i + 1
+        active = active[~done]
+        if not len(active):
+            break
+    if stats is not None:
+        stats['evaluations'] = i + 1
+        stats['converged'] = converged
+    return (x, iterations)
+
+
+def _run_start(f, start, method, options):
+    """Runs the optimizer 'method' on 'f' from 'start' and returns the result of that start for multistart."""
+    stats = {}
+    x, iterations = method(f, start, stats = stats, **options)
+    stats.update(x = x, value = _value(f, x, options.get('mode', 'dict')), iterations = iterations)
+    return stats
+
+
+def multistart(f, starts, method = quasi_newtons_method, workers = None, target = None, callback = None, **options):
+    """
+    Runs an optimizer from each of several starting points and returns the best minimum found. The starts are independent
+    and are run in parallel on a concurrent.futures.ProcessPoolExecutor, whose results are processed as they finish.
+
+    INPUTS
+    =======
+    f: function
+    The function that we are trying to find the minimum of, as taken by 'method'. With more than one worker it is sent to
+    the worker processes, so it must be picklable, e.g. a function defined at the top level of a module.
+
+    starts: 2-D array of ints/floats
+    The starting points, one per row
+
+    method: function
+    The optimizer run from each start, called as method(f, start, stats = stats, **options) and returning the position of
+    the minimum and the number of iterations, e.g. quasi_newtons_method, gradient_descent or trust_region_newton_cg
+
+    workers: int
+    The number of worker processes. The default is the number of CPUs. With 1 worker, the starts are run one after the
+    other in the calling process.
+
+    target: float
+    If given, once a start reaches a minimum whose value is at most 'target', the starts that have not begun are cancelled.
+    Starts that are already running finish in the background and are not waited for.
+
+    callback: function
+    If given, called with the index of each start and its result (see RETURNS) as soon as that start finishes.
+    If it returns True, the remaining starts are cancelled as for 'target'.
+
+    options: keyword arguments
+    Passed on to 'method', e.g. method = 'L-BFGS' or mode = 'array' for quasi_newtons_method
+
+    RETURNS
+    ========
+    Tuple
+    A tuple with first entry which maps to the position of the best minimum, second entry which maps to its value, and
+    third entry which maps to the list of the results of the starts, in the order of 'starts'. The result of a start is
+    the dictionary of the statistics reported by 'method', with 'x', 'value' and 'iterations' added; cancelled starts
+    have None.
+
+    EXAMPLES
+    =========
+    >>> x, value, results = multistart(lambda x: (x[0] ** 2 - 1) ** 2 + x[0], [[-1], [1]], workers = 1)
+    >>> x.round(4), [result['x'].round(4) for result in results]
+    (array([-1.1072]), [array([-1.1072]), array([0.8376])])
+    """
+    starts = np.array(starts, dtype=float)
+    if len(starts) == 0:
+        raise Exception("No starting points given.")
+    results = [None] * len(starts)
+
+    def finish(index, result):
+        results[index] = result
+        stop = callback is not None and callback(index, result)
+        return bool(stop) or (target is not None and result['value'] <= target)
+
+    if workers == 1:
+        for index, start in enumerate(starts):
+            if finish(index, _run_start(f, start, method, options)):
+                break
+    else:
+        executor = ProcessPoolExecutor(max_workers = workers)
+        futures = {}
+        try:
+            futures = {executor.submit(_run_start, f, start, method, options): index for index, start in enumerate(starts)}
+            for future in as_completed(futures):
+                if finish(futures[future], future.result()):
+                    break
+        finally:
+            for future in futures: #the starts that have not begun, the others cannot be cancelled
+                future.cancel()
+            executor.shutdown(wait = False)
+    best = min((result for result in results if result is not None), key = lambda result: result['value'])
+    return (best['x'], best['value'], results)
+
+
+class AskTell():
+    """
+    An optimizer that does not evaluate the function itself: ask() returns the points it needs evaluated, and tell() takes
+    their results and advances the optimizer to its next requests. The function can thus be evaluated anywhere, e.g. by a
+    simulation process or a remote service, and the points of one ask() concurrently (see run_async).
+    Created by ask_tell_line_search, ask_tell_gradient_descent and ask_tell_quasi_newtons_method.
+
+    Each request is a tuple (x, gradient): the point x, and whether its gradient is needed as well as its value. Its
+    result is the value, or the tuple (value, gradient) if the gradient was requested.
+
+    EXAMPLES
+    =========
+    >>> optimizer = ask_tell_gradient_descent([3.0], step_size = 0.5)
+    >>> while not optimizer.done:
+    ...     optimizer.tell([(x[0] ** 2, 2 * x) if gradient else x[0] ** 2 for x, gradient in optimizer.ask()])
+    >>> optimizer.result, optimizer.evaluations
+    ((array([0.]), 2), 2)
+    """
+
+    def __init__(self, steps):
+        self._steps = steps
+        self._requests = next(steps)
+        self.done = False
+        self.result = None
+        self.evaluations = 0
+        self.rounds = 0
+
+    def ask(self):
+        """Returns the list of the evaluation requests (x, gradient) the optimizer waits for, empty once it is done."""
+        return list(self._requests)
+
+    def tell(self, results):
+        """Takes the results of the requests returned by ask(), in the same order, and sets 'result' once done."""
+        results = list(results)
+        if len(results) != len(self._requests):
+            raise Exception("Results not the same length as requests!")
+        self.evaluations += len(results)
+        self.rounds += 1
+        try:
+            self._requests = self._steps.send(results)
+        except StopIteration as stop:
+            self._requests, self.done, self.result = [], True, stop.value
+
+
+def _line_search_steps(x, p, value, gradient, tau, c, alpha, trials):
+    """The steps of line_search from 'x', where 'f' has the given value and gradient, requesting up to 'trials' of the
+    successive trial steps alpha, tau * alpha, ... at once. The step returned is the first that line_search accepts."""
+    t = -c * (p * gradient).sum()
+    while alpha > 0:
+        alphas = []
+        while alpha > 0 and len(alphas) < trials:
+            alphas.append(alpha)
+            alpha = tau * alpha
+        values = yield [(x + a * p, False) for a in alphas]
+        for a, value2 in zip(alphas, values):
+            if value - value2 >= a * t:
+                return a
+    return alpha
+
+
+def _line_search_start(x, p, tau, c, alpha, trials):
+    """The steps of line_search, starting with the evaluation of the value and gradient at 'x'."""
+    x = np.asarray(x, dtype=float)
+    [(value, gradient)] = yield [(x, True)]
+    return (yield from _line_search_steps(x, p, value, np.asarray(gradient), tau, c, alpha, trials))
+
+
+def ask_tell_line_search(x, p, tau = 0.1, c = 0.1, alpha = 1, trials = 1):
+    """
+    Returns the ask/tell version of line_search (see AskTell), whose result is the step found by line_search.
+
+    INPUTS
+    =======
+    x, p, tau, c, alpha:
+    As for line_search
+
+    trials: int
+    The number of successive trial steps alpha, tau * alpha, ... requested at once. They are evaluated speculatively: the
+    step found is the same as with 1, but with more trials it is usually found in one round of concurrent evaluations.
+
+    RETURNS
+    ========
+    AskTell
+    The line search, first requesting the value and gradient at 'x'
+
+    EXAMPLES
+    =========
+    >>> search = ask_tell_line_search([2.0], np.array([-4.0]), trials = 3)
+    >>> search.ask()
+    [(array([2.]), True)]
+    >>> search.tell([(4.0, np.array([4.0]))])
+    >>> [x for x, gradient in search.ask()]
+    [array([-2.]), array([1.6]), array([1.96])]
+    >>> search.tell([4.0, 2.56, 3.8416])
+    >>> search.result
+    0.1
+    """
+    return AskTell(_line_search_start(x, p, tau, c, alpha, trials))
+
+
+def _gradient_descent_steps(x, step_size, max_iter, tol, search, trials):
+    """The steps of gradient_descent."""
+    x = np.array(x)
+    for i in range(max_iter):
+        [(value, gradient)] = yield [(x, True)]
+        gradient = np.asarray(gradient)
+        if np.sqrt(np.abs(gradient).sum()) < tol:
+            break
+        if search is None:
+            x = x - step_size * gradient
+        else:
+            p = -gradient
+            step = (yield from _line_search_steps(x, p, value, gradient, 0.1, 0.1, step_size, trials)) * p
+            if not (x + step != x).any(): #the line search cannot improve on x in floating point
+                break
+            x = x + step
+    return (x, i + 1)
+
+
+def ask_tell_gradient_descent(initial_guess, step_size = 0.01, max_iter = 10000, tol = 1e-12, search = None, trials = 1):
+    """
+    Returns the ask/tell version of gradient_descent (see AskTell), whose result is the tuple gradient_descent returns.
+
+    INPUTS
+    =======
+    initial_guess, step_size, max_iter, tol:
+    As for gradient_descent
+
+    search: String
+    None takes steps of 'step_size', 'backtracking' searches along the negative gradient as line_search does, starting
+    from 'step_size'.
+
+    trials: int
+    The number of trial steps of the line search requested at once, see ask_tell_line_search
+
+    RETURNS
+    ========
+    AskTell
+    The optimizer, first requesting the value and gradient at 'initial_guess'
+    """
+    if search not in [None, 'backtracking']:
+        raise Exception("Not a valid line search.")
+    return AskTell(_gradient_descent_steps(initial_guess, step_size, max_iter, tol, search, trials))
+
+
+def _quasi_newton_steps(x, max_iter, method, tol, history, trials):
+    """The steps of quasi_newtons_method with backtracking line search."""
+    H = np.asfortranarray(np.identity(len(x))) if method in ['BFGS', 'DFP', 'Broyden'] else None
+    pairs = deque(maxlen = history)
+    [(value, gradient)] = yield [(x, True)]
+    for i in range(max_iter):
+        gradient = np.asarray(gradient, dtype=float)
+        if method == 'L-BFGS':
+            p = -_two_loop(gradient, pairs)
+        else:
+            p = -_inverse_hessian_product(H, gradient, method)
+
+        alpha = yield from _line_search_steps(x, p, value, gradient, 0.1, 0.1, 1, trials)
+        delta_x = alpha * p
+        if not (x + delta_x != x).any(): #the line search cannot improve on x in floating point
+            break
+
+        x = x + delta_x
+        [(value, gradient2)] = yield [(x, True)]
+        gradient2 = np.asarray(gradient2, dtype=float)
+        if np.sqrt(np.abs(gradient2).sum()) < tol:
+            break
+        y = gradient2 - gradient
+        if method == 'L-BFGS':
+            curvature = y @ delta_x
+            if curvature > 0: #pairs without positive curvature would make the estimate indefinite
+                pairs.append((delta_x, y, 1 / curvature))
+        else:
+            _update_inverse_hessian(H, delta_x, y, method)
+        gradient = gradient2
+    return (x, i + 1)
+
+
+def ask_tell_quasi_newtons_method(initial_guess, max_iter = 10000, method = 'BFGS', tol = 1e-12, history = 10, trials = 1):
+    """
+    Returns the ask/tell version of quasi_newtons_method with backtracking line search (see AskTell), whose result is the
+    tuple quasi_newtons_method returns.
+
+    INPUTS
+    =======
+    initial_guess, max_iter, tol, history:
+    As for quasi_newtons_method
+
+    method: String
+    'BFGS', 'DFP', 'Broyden' or 'L-BFGS', as for quasi_newtons_method
+
+    trials: int
+    The number of trial steps of the line search requested at once, see ask_tell_line_search
+
+    RETURNS
+    ========
+    AskTell
+    The optimizer, first requesting the value and gradient at 'initial_guess'
+    """
+    if method not in ['BFGS', 'DFP', 'Broyden', 'L-BFGS']:
+        raise Exception("Not a valid method.")
+    return AskTell(_quasi_newton_steps(np.array(initial_guess, dtype=float), max_iter, method, tol, history, trials))
+
+
+def _asyncio_run(coroutine):
+    """Runs 'coroutine' to completion with asyncio.run, or with the event loop on Python 3.6, which does not have it."""
+    run = getattr(asyncio, 'run', lambda coroutine: asyncio.get_event_loop().run_until_complete(coroutine))
+    return run(coroutine)
+
+
+async def run_async(optimizer, evaluate, concurrency = None):
+    """
+    Runs an AskTell optimizer with an asynchronous evaluation function, evaluating the requests of each ask() concurrently.
+    It is a coroutine, run e.g. with asyncio.run (or loop.run_until_complete on Python 3.6).
+
+    INPUTS
+    =======
+    optimizer: AskTell
+    The optimizer to run
+
+    evaluate: coroutine function
+    Called as await evaluate(x, gradient) for each request, returning its result (see AskTell)
+
+    concurrency: int
+    The maximum number of evaluations in flight at once. Unlimited by default.
+
+    RETURNS
+    ========
+    The result of the optimizer
+
+    EXAMPLES
+    =========
+    >>> async def evaluate(x, gradient):
+    ...     await asyncio.sleep(0)
+    ...     return (x @ x, 2 * x) if gradient else x @ x
+    >>> x, iterations = _asyncio_run(run_async(ask_tell_quasi_newtons_method([1.0, -2.0], trials = 4), evaluate))
+    >>> np.allclose(x, 0), iterations
+    (True, 7)
+    """
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+    async def request(x, gradient):
+        if semaphore is None:
+            return await evaluate(x, gradient)
+        async with semaphore:
+            return await evaluate(x, gradient)
+
+    while not optimizer.done:
+        optimizer.tell(await asyncio.gather(*[request(x, gradient) for x, gradient in optimizer.ask()]))
+    return optimizer.result
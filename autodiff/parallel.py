@@ -0,0 +1,111 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait
+from autodiff.vector import create_vector, get_tangents
+
+
+def _attach(name, shape):
+    """Returns the shared memory block 'name' and the float array of the given shape it holds."""
+    from multiprocessing import shared_memory
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype=float, buffer=memory.buf)
+
+
+def _evaluate_block(f, x_name, jacobian_name, shape, start, stop, mode):
+    """Evaluates 'f' at the point in the shared memory block 'x_name' with only the variables start, ..., stop - 1 seeded,
+    and writes the resulting columns of the Jacobian into the shared memory block 'jacobian_name'."""
+    x_memory, x = _attach(x_name, shape[1:])
+    jacobian_memory, jacobian = _attach(jacobian_name, shape)
+    try:
+        seed_matrix = np.zeros((shape[1], stop - start))
+        seed_matrix[np.arange(start, stop), np.arange(stop - start)] = 1
+        tangents = get_tangents(f(create_vector('x', x.copy(), seed_vector=seed_matrix, mode=mode)))
+        jacobian[:, start:start + tangents.shape[1]] = tangents #no columns when every output is a constant
+    finally:
+        del x, jacobian
+        x_memory.close()
+        jacobian_memory.close()
+
+
+def get_parallel_jacobian(f, x, workers = None, blocks = None, mode = 'dict', executor = None):
+    """
+    Returns the Jacobian of 'f' at 'x', computed by splitting the variables into blocks of consecutive variables and
+    evaluating 'f' in worker processes with only the variables of one block seeded. Forward mode costs O(k) per operation
+    for k seeded variables, so each evaluation does a fraction of the work of seeding every variable at once. The point and
+    the Jacobian are kept in multiprocessing.shared_memory blocks, into which each worker writes its columns directly,
+    so that neither is pickled. Requires Python 3.8 or later.
+
+    INPUTS
+    =======
+    f: function
+    A function that takes in a single list/array with the same length as 'x' and returns a list/array. It is sent to the
+    worker processes, so it must be picklable, e.g. a function defined at the top level of a module.
+
+    x: List or array of ints/floats
+    The point the Jacobian is computed at
+
+    workers: int
+    The number of worker processes. The default is the number of CPUs. With 1 worker, the blocks are evaluated one after
+    the other in the calling process.
+
+    blocks: int
+    The number of blocks the variables are split into. Defaults to 'workers'; more blocks than workers balance the load
+    when evaluations take different times.
+
+    mode: String
+    'dict' evaluates 'f' on DenseScalars carrying the seeds of a block, 'array' on a DualArray.
+
+    executor: concurrent.futures.Executor
+    A process pool to run the blocks on instead of starting one, e.g. to reuse it across the iterations of a solver.
+    It is not shut down, and 'workers' only sets the default number of blocks.
+
+    RETURNS
+    ========
+    numpy array
+    The (len(f(x)), len(x)) Jacobian
+
+    EXAMPLES
+    =========
+    >>> f = lambda x: np.array([x[0] ** 2, x[0] * x[1], x[1] - x[2], 4.0])
+    >>> get_parallel_jacobian(f, [1, 2, 3], workers = 1, blocks = 2)
+    array([[ 2.,  0.,  0.],
+           [ 2.,  1.,  0.],
+           [ 0.,  1., -1.],
+           [ 0.,  0.,  0.]])
+    """
+    from multiprocessing import shared_memory #Python 3.8+, imported here so that importing autodiff does not need it
+    x = np.array(x, dtype=float)
+    with np.errstate(all='ignore'):
+        outputs = len(np.atleast_1d(np.asarray(f(x.copy()), dtype=object)))
+    if workers is None:
+        workers = os.cpu_count()
+    bounds = np.linspace(0, len(x), min(blocks or workers, len(x)) + 1).astype(int)
+    shape = (outputs, len(x))
+    x_memory = shared_memory.SharedMemory(create=True, size=max(x.nbytes, 1))
+    jacobian_memory = shared_memory.SharedMemory(create=True, size=max(8 * outputs * len(x), 1))
+    try:
+        np.ndarray(x.shape, dtype=float, buffer=x_memory.buf)[:] = x
+        jacobian = np.ndarray(shape, dtype=float, buffer=jacobian_memory.buf)
+        jacobian[:] = 0
+        tasks = [(f, x_memory.name, jacobian_memory.name, shape, start, stop, mode)
+                 for start, stop in zip(bounds[:-1], bounds[1:])]
+        if workers == 1 and executor is None:
+            for task in tasks:
+                _evaluate_block(*task)
+        else:
+            pool = executor or ProcessPoolExecutor(max_workers = workers)
+            try:
+                futures = [pool.submit(_evaluate_block, *task) for task in tasks]
+                wait(futures)
+                for future in futures:
+                    future.result() #raises the exception of a failed block
+            finally:
+                if executor is None:
+                    pool.shutdown()
+        return jacobian.copy()
+    finally:
+        jacobian = None #the views of the shared memory must be released before it is closed
+        x_memory.close()
+        x_memory.unlink()
+        jacobian_memory.close()
+        jacobian_memory.unlink()
@@ -0,0 +1,257 @@
+import numpy as np
+
+
+def _exponent_partial(power, base):
+    """
+    Returns the local derivative base ** b * ln(base) of 'power' = base ** b with respect to the exponent b.
+    A zero base gives 0, since 0 ** b stays 0 around any b > 0. A negative base (only raised to integers) gives nan
+    without a warning, since base ** b is not defined around b over the reals.
+    """
+    if base == 0:
+        return 0.0
+    with np.errstate(invalid='ignore'):
+        return power * np.log(base)
+
+
+class Tape():
+
+    """
+    Records every primitive operation performed on ReverseScalars during the forward pass.
+    Node i of the tape stores the indices of the nodes it was computed from and the local partial
+    derivatives with respect to each of them. Since nodes are appended in the order they are created,
+    a single sweep from an output back to the start of the tape accumulates its full gradient.
+    """
+
+    def __init__(self):
+        self._parents = []
+        self._partials = []
+        self._variables = {} #variable name -> list of (node index, seed derivative)
+
+    def __len__(self):
+        return len(self._parents)
+
+    def _record(self, parents, partials):
+        """Appends a node computed from the nodes in 'parents' with local derivatives 'partials' and returns its index."""
+        self._parents.append(parents)
+        self._partials.append(partials)
+        return len(self._parents) - 1
+
+    def _leaf(self, variable, seed):
+        """Appends a node for the input 'variable' and returns its index."""
+        index = self._record((), ())
+        self._variables.setdefault(variable, []).append((index, seed))
+        return index
+
+    def _backward(self, index):
+        """Returns the adjoints of all nodes up to 'index', i.e. the derivatives of node 'index' with respect to them."""
+        adjoints = [0.0] * (index + 1)
+        adjoints[index] = 1.0
+        parents, partials = self._parents, self._partials
+        for node in range(index, -1, -1):
+            adjoint = adjoints[node]
+            if adjoint == 0:
+                continue
+            for parent, partial in zip(parents[node], partials[node]):
+                adjoints[parent] = adjoints[parent] + adjoint * partial
+        return adjoints
+
+    def gradient(self, index):
+        """
+        Returns a dictionary mapping each variable recorded before node 'index' to the derivative of that node with respect to it.
+        The cost is one sweep over the tape, independent of the number of variables.
+        """
+        adjoints = self._backward(index)
+        gradient = {}
+        for variable, leaves in self._variables.items():
+            for leaf, seed in leaves:
+                if leaf <= index:
+                    gradient[variable] = gradient.get(variable, 0.0) + seed * adjoints[leaf]
+        return gradient
+
+
+class ReverseScalar():
+
+    """
+    Object that represents a scalar variable differentiated in reverse mode.
+    Operations are recorded on a Tape and derivatives are only computed when they are requested,
+    with one backward sweep that yields the derivatives with respect to every variable at once.
+    """
+
+    def __init__(self, variable, val, deriv = 1, tape = None):
+        """
+        INPUTS
+        =======
+        variable: String
+        The name of the ReverseScalar object.
+
+        val: int or float
+        The value of the ReverseScalar
+
+        deriv: int or float
+        The seed derivative with respect to 'variable'
+
+        tape: Tape
+        The tape the operations are recorded on. A new tape is created if none is passed in.
+        ReverseScalars can only be combined if they are recorded on the same tape.
+
+        EXAMPLES
+        =========
+        >>> tape = Tape()
+        >>> x = ReverseScalar('x', 2, tape=tape)
+        >>> y = ReverseScalar('y', 3, tape=tape)
+        >>> z = x * y + x
+        >>> z.getValue()
+        8.0
+        >>> z.getGradient(['x', 'y'])
+        array([4., 2.])
+        """
+        self._tape = Tape() if tape is None else tape
+        self._val = float(val)
+        self._index = self._tape._leaf(variable, float(deriv))
+        self._gradient = None
+
+    @classmethod
+    def _new(cls, tape, val, parents, partials):
+        """Records a new node on 'tape' and returns the ReverseScalar representing it."""
+        new = cls.__new__(cls)
+        new._tape = tape
+        new._val = val
+        new._index = tape._record(parents, partials)
+        new._gradient = None
+        return new
+
+    def _check_tape(self, b):
+        if b._tape is not self._tape:
+            raise Exception("Cannot combine ReverseScalars recorded on different tapes.")
+
+    def __str__(self):
+        """String representation of the ReverseScalar object. Tells both the value and the derivatives."""
+        return "Value: {0}, Derivatives: {1}".format(self._val, self.getDeriv());
+
+    def __repr__(self):
+        return "ReverseScalar({0})".format(self._val);
+
+    def __add__(self, b):
+        """Returns a ReverseScalar representing self + b, where b is a ReverseScalar or a numeric value."""
+        if isinstance(b, ReverseScalar):
+            self._check_tape(b)
+            return self._new(self._tape, self._val + b._val, (self._index, b._index), (1.0, 1.0))
+        return self._new(self._tape, self._val + b, (self._index,), (1.0,))
+
+    def __mul__(self, b):
+        """Returns a ReverseScalar representing self * b, where b is a ReverseScalar or a numeric value."""
+        if isinstance(b, ReverseScalar):
+            self._check_tape(b)
+            return self._new(self._tape, self._val * b._val, (self._index, b._index), (b._val, self._val))
+        return self._new(self._tape, self._val * b, (self._index,), (b,))
+
+    def __neg__(self):
+        """Negates the current ReverseScalar object."""
+        return self._new(self._tape, -self._val, (self._index,), (-1.0,))
+
+    def __sub__(self, b):
+        """Returns a ReverseScalar representing self - b. This is just adding the current ReverseScalar with the negation of b."""
+        return self + -b
+
+    def __rsub__(self, b):
+        """Returns a ReverseScalar representing b - self. This is just adding the negation of the current ReverseScalar with b."""
+        return b + -self
+
+    def __pow__(self, b):
+        """Returns a ReverseScalar representing self ** b, where b is a ReverseScalar or a numeric value.
+        The local derivatives are b * x ** (b - 1) with respect to x and x ** b * ln(x) with respect to b.
+
+        EXAMPLES
+        =========
+        >>> x = ReverseScalar('x', 2)
+        >>> y = x ** 3
+        >>> y.getValue()
+        8.0
+        >>> y.getGradient(['x'])
+        array([12.])
+        """
+        if isinstance(b, ReverseScalar):
+            self._check_tape(b)
+            #check that a negative number is not being raised to a decimal.
+            if self._val < 0 and b._val % 1 != 0:
+                raise ValueError("Cannot raise a negative number ({0}) to a decimal {1}".format(self._val, b._val) );
+            new_val = self._val ** b._val;
+            #derivative for all variables is just 0 if both self and b are zero
+            if self._val == 0 and b._val == 0:
+                partials = (0.0, 0.0)
+            else:
+                partials = (b._val * (self._val ** (b._val - 1)), _exponent_partial(new_val, self._val))
+            return self._new(self._tape, new_val, (self._index, b._index), partials)
+
+        #check that a negative number is not being raised to a decimal.
+        if self._val < 0 and b % 1 != 0:
+            raise ValueError("Cannot raise a negative number ({0}) to a decimal {1}".format(self._val, b) );
+        new_val = self._val ** b;
+        if self._val == 0 and b == 0:
+            return self._new(self._tape, new_val, (self._index,), (0.0,))
+        return self._new(self._tape, new_val, (self._index,), (b * (self._val ** (b - 1)),))
+
+    def __rpow__(self, b):
+        """Returns a ReverseScalar representing b ** self, where b is a numeric value."""
+        if b == 0:
+            if self._val < 1:
+                raise ZeroDivisionError;
+            return self._new(self._tape, b ** self._val, (self._index,), (0.0,))
+        new_val = b ** self._val
+        return self._new(self._tape, new_val, (self._index,), (_exponent_partial(new_val, b),))
+
+    def __truediv__(self, b):
+        """Returns a ReverseScalar representing self / b. This is just self multiplied by (b ** -1)."""
+        return self * (b ** -1);
+
+    def __rtruediv__(self, b):
+        """Returns a ReverseScalar representing b / self. This is just b multiplied by (self ** -1)."""
+        return b * (self ** -1);
+
+    def __eq__(self, b):
+        """Check if two ReverseScalar objects have the same value and derivatives"""
+        try:
+            return self._val == b._val and self.getDeriv() == b.getDeriv();
+        except AttributeError:
+            return False
+
+    def __ne__(self, b):
+        """Check if two ReverseScalar objects are not equal"""
+        return not (self == b)
+
+    def _chain(self, val, deriv):
+        """Records a node with value 'val' whose local derivative with respect to self is 'deriv' (chain rule)."""
+        return self._new(self._tape, val, (self._index,), (deriv,))
+
+    def _get_gradient(self):
+        """Runs the backward sweep the first time derivatives are requested and caches the result."""
+        if self._gradient is None:
+            self._gradient = self._tape.gradient(self._index)
+        return self._gradient
+
+    def getValue(self):
+        """Returns the value of the ReverseScalar."""
+        return self._val;
+
+    def getDeriv(self):
+        """Returns a dictionary mapping every variable recorded on the tape before self to the derivative of self with respect to it."""
+        return self._get_gradient().copy();
+
+    def getGradient(self, variables):
+        """Returns the derivatives with respect to 'variables' as a numpy array. All of them come from a single backward sweep.
+
+        INPUTS
+        =======
+        variables: list
+        A list of strings corresponding to the variable names
+
+        RETURNS
+        ========
+        derivs: numpy array
+        The numpy array of partial derivatives
+        """
+        gradient = self._get_gradient()
+        return np.array([gradient.get(variable, 0) for variable in variables]);
+
+    __radd__ = __add__
+    __rmul__ = __mul__
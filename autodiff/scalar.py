@@ -289,10 +289,10 @@ class Scalar():
                 # _derivative of x^y with respect to x (power rule)
                 elif variable not in b._deriv.keys():
                     powered._deriv[variable] = b._val * (self._val ** (b._val - 1)) * self._deriv[variable] 
-                # y = x ^ x 
+                # both depend on the variable, e.g. y = x ^ x 
                 # Credits to http://mathcentral.uregina.ca/QQ/database/QQ.09.03/cher1.html for formula
                 else:
-                    powered._deriv[variable] = (self._val ** b._val) * (np.log(self._val) + b._val / (self._val)) * self._deriv[variable] 
+                    powered._deriv[variable] = (self._val ** b._val) * (np.log(self._val) * b._deriv[variable] + b._val / (self._val) * self._deriv[variable]) 
             
         except AttributeError: #b is just a integer or float value
             new_val = self._val ** b;
@@ -461,6 +461,23 @@ class Scalar():
         """ Check if two Scalar objects are not equal"""
         return not (self == b)
 
+    def _chain(self, val, deriv):
+        """Returns a new Scalar with value 'val' whose derivatives are the derivatives of self multiplied by 'deriv' (chain rule).
+        Used by the elementary functions in autodiff.functions, where 'deriv' is the derivative of the function evaluated at self._val.
+
+        EXAMPLES
+        =========
+        >>> x = Scalar('x', 2)
+        >>> y = x._chain(4.0, 3.0)
+        >>> y._val
+        4.0
+        >>> y._deriv
+        {'x': 3.0}
+        """
+        result = Scalar(None, val);
+        result._deriv = {variable: deriv * d for variable, d in self._deriv.items()};
+        return result;
+
     def getValue(self):
         """Returns the value of the scalar so that users does not access the value directly and potentially change it."""
         return self._val;
@@ -0,0 +1,157 @@
+import numpy as np
+import scipy.sparse as sp
+from autodiff.vector import create_vector, get_tangents
+
+
+def sparsity_pattern(f, x):
+    """
+    Returns the sparsity pattern of the Jacobian of 'f' at 'x', read from the derivative keys of the Scalars 'f' returns
+    when it is evaluated on create_vector('x', x). A key is present whenever an output depends on a variable, even if the
+    derivative happens to be zero at 'x', so the pattern is structural.
+
+    INPUTS
+    =======
+    f: function
+    A function that takes in a single list/array with the same length as 'x' and returns a list/array
+
+    x: List or array of ints/floats
+    The point 'f' is evaluated at
+
+    RETURNS
+    ========
+    scipy.sparse.csr_matrix
+    A (len(f(x)), len(x)) matrix of booleans, True where an output depends on a variable
+
+    EXAMPLES
+    =========
+    >>> sparsity_pattern(lambda x: np.array([x[0] * x[1], x[1] * 0, x[2] + 1]), [1, 2, 3]).toarray()
+    array([[ True,  True, False],
+           [False,  True, False],
+           [False, False,  True]])
+    """
+    jacobian = _assemble(f(create_vector('x', x)), 'x', len(x))[1]
+    return sp.csr_matrix((np.ones(jacobian.nnz, dtype=bool), jacobian.indices, jacobian.indptr), shape=jacobian.shape)
+
+
+def _assemble(fn, vector_name, n):
+    """Returns the values of the Scalars in 'fn' and their Jacobian with respect to the variables of the vector 'vector_name'
+    of length 'n' as a csr_matrix built directly from their derivative dictionaries. Every derivative key becomes an entry,
+    including derivatives that are zero at this point."""
+    index = {'{0}{1}'.format(vector_name, i): i - 1 for i in range(1, n + 1)}
+    values, data, indices, indptr = [], [], [], [0]
+    for sclr in np.atleast_1d(np.asarray(fn, dtype=object)):
+        try:
+            entries = sorted((index[variable], deriv) for variable, deriv in sclr._deriv.items() if variable in index)
+            values.append(sclr._val)
+        except AttributeError: #a constant output
+            entries = []
+            values.append(float(sclr))
+        indices.extend(column for column, _ in entries)
+        data.extend(deriv for _, deriv in entries)
+        indptr.append(len(indices))
+    jacobian = sp.csr_matrix((np.array(data, dtype=float), np.array(indices, dtype=np.int32), indptr), shape=(len(values), n))
+    return np.array(values), jacobian
+
+
+def color_columns(pattern):
+    """
+    Returns a coloring of the columns of 'pattern' in which no two columns with a nonzero in the same row share a color
+    (greedy coloring of the column intersection graph). The columns of one color can then be seeded together: summing them
+    into one direction loses nothing, since every row sees at most one of them.
+
+    INPUTS
+    =======
+    pattern: scipy.sparse matrix or array
+    The sparsity pattern of a Jacobian
+
+    RETURNS
+    ========
+    numpy array
+    The color of each column, numbered 0, 1, ..., number of colors - 1
+
+    EXAMPLES
+    =========
+    >>> color_columns(sp.diags([1, 1, 1], [-1, 0, 1], shape=(6, 6)))
+    array([0, 1, 2, 0, 1, 2])
+    """
+    rows = sp.csr_matrix(pattern)
+    columns = rows.tocsc()
+    row_ptr, row_columns = rows.indptr.tolist(), rows.indices.tolist()
+    column_ptr, column_rows = columns.indptr.tolist(), columns.indices.tolist()
+    colors = [-1] * rows.shape[1]
+    forbidden = [-1] * (rows.shape[1] + 1) #forbidden[c] == j when color c is taken by a neighbour of column j
+    for j in range(rows.shape[1]):
+        for row in column_rows[column_ptr[j]:column_ptr[j + 1]]:
+            for neighbour in row_columns[row_ptr[row]:row_ptr[row + 1]]:
+                if colors[neighbour] >= 0:
+                    forbidden[colors[neighbour]] = j
+        color = 0
+        while forbidden[color] == j:
+            color += 1
+        colors[j] = color
+    return np.array(colors, dtype=int)
+
+
+def _sparse_evaluate(f, x, pattern, colors, mode = 'dict'):
+    """Returns the values of 'f' at 'x' and its Jacobian as a csr_matrix with the given pattern, from one evaluation of 'f'
+    on the seed matrix with one column per color."""
+    pattern = sp.csr_matrix(pattern)
+    seed_matrix = np.zeros((len(x), colors.max() + 1 if len(colors) else 0))
+    seed_matrix[np.arange(len(x)), colors] = 1
+    fn = f(create_vector('x', x, seed_vector=seed_matrix, mode=mode))
+    compressed = get_tangents(fn)
+    #the derivative of output i with respect to variable j is the entry of row i for the color of column j
+    rows = np.repeat(np.arange(pattern.shape[0]), np.diff(pattern.indptr))
+    data = compressed[rows, colors[pattern.indices]] if compressed.shape[1] else np.zeros(pattern.nnz)
+    jacobian = sp.csr_matrix((data, pattern.indices.copy(), pattern.indptr.copy()), shape=pattern.shape)
+    try:
+        values = fn.getValue()
+    except AttributeError: #a list/array of DenseScalars
+        values = np.array([sclr.getValue() for sclr in fn])
+    return values, jacobian
+
+
+def get_sparse_jacobian(f, x, pattern = None, colors = None, mode = 'dict'):
+    """
+    Returns the Jacobian of 'f' at 'x' as a scipy.sparse.csr_matrix, computed with one evaluation of 'f' on a vector carrying
+    one compressed seed direction per color of the columns. For banded or block-sparse Jacobians the number of colors is
+    close to the number of nonzeros per row, independent of len(x).
+
+    INPUTS
+    =======
+    f: function
+    A function that takes in a single list/array with the same length as 'x' and returns a list/array.
+
+    x: List or array of ints/floats
+    The point the Jacobian is computed at
+
+    pattern: scipy.sparse matrix or array
+    The sparsity pattern of the Jacobian. Detected with sparsity_pattern if not given, which costs an evaluation of 'f'
+    on Scalars, so pass it in when computing the Jacobian of the same function repeatedly.
+
+    colors: numpy array
+    The column coloring of 'pattern'. Computed with color_columns if not given.
+
+    mode: String
+    'dict' evaluates 'f' on DenseScalars carrying the compressed seeds, 'array' on a DualArray.
+
+    RETURNS
+    ========
+    scipy.sparse.csr_matrix
+    The (len(f(x)), len(x)) Jacobian
+
+    EXAMPLES
+    =========
+    >>> f = lambda x: np.array([x[0] ** 2, x[0] * x[1], x[1] - x[2], x[3] * x[2]])
+    >>> get_sparse_jacobian(f, [1, 2, 3, 4]).toarray()
+    array([[ 2.,  0.,  0.,  0.],
+           [ 2.,  1.,  0.,  0.],
+           [ 0.,  1., -1.,  0.],
+           [ 0.,  0.,  4.,  3.]])
+    """
+    x = np.asarray(x, dtype=float)
+    if pattern is None:
+        pattern = sparsity_pattern(f, x)
+    if colors is None:
+        colors = color_columns(pattern)
+    return _sparse_evaluate(f, x, pattern, colors, mode)[1]
@@ -0,0 +1,397 @@
+import numpy as np
+from autodiff.reverse import ReverseScalar, Tape
+
+
+#ufuncs emitted as infix operators in the generated kernels
+_INFIX = {'add': '+', 'subtract': '-', 'multiply': '*', 'true_divide': '/', 'divide': '/', 'power': '**'}
+
+
+class _Graph():
+
+    """
+    Flat expression graph recorded while tracing. Node i is stored as (op, args), where op is 'input', 'const'
+    or the name of a numpy ufunc and args are the indices of the nodes it is computed from (the input position
+    for 'input' nodes and the value itself for 'const' nodes). Nodes are appended in the order they are computed,
+    so the list is always in topological order.
+    """
+
+    def __init__(self):
+        self._ops = []
+        self._args = []
+
+    def _append(self, op, args, value):
+        self._ops.append(op)
+        self._args.append(args)
+        return _Node(self, len(self._ops) - 1, value)
+
+    def input(self, position, value):
+        return self._append('input', position, value)
+
+    def constant(self, value):
+        return self._append('const', value, value)
+
+    def apply(self, op, inputs):
+        """Records the ufunc named 'op' applied to 'inputs' (nodes or numbers) and returns the resulting node."""
+        nodes = [x if isinstance(x, _Node) else self.constant(x) for x in inputs]
+        with np.errstate(all='ignore'):
+            value = getattr(np, op)(*[node._value for node in nodes])
+        return self._append(op, tuple(node._index for node in nodes), value)
+
+
+class _Node():
+
+    """
+    Symbolic value recorded on a _Graph. It supports the arithmetic operators and the numpy ufuncs used in
+    autodiff.functions, recording each of them instead of computing it. Every node also carries its concrete
+    value at the trace point, which answers comparisons, so control flow in the traced function is frozen at trace time.
+    """
+
+    def __init__(self, graph, index, value):
+        self._graph = graph
+        self._index = index
+        self._value = value
+
+    def __repr__(self):
+        return "_Node({0}, {1})".format(self._index, self._value)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != '__call__' or kwargs:
+            return NotImplemented
+        return self._graph.apply(ufunc.__name__, inputs)
+
+    def __add__(self, b):
+        if not isinstance(b, _Node) and b == 0:
+            return self
+        return self._graph.apply('add', (self, b))
+
+    def __radd__(self, b):
+        if not isinstance(b, _Node) and b == 0:
+            return self
+        return self._graph.apply('add', (b, self))
+
+    def __sub__(self, b):
+        return self._graph.apply('subtract', (self, b))
+
+    def __rsub__(self, b):
+        return self._graph.apply('subtract', (b, self))
+
+    def __mul__(self, b):
+        if not isinstance(b, _Node) and b == 1:
+            return self
+        return self._graph.apply('multiply', (self, b))
+
+    def __rmul__(self, b):
+        if not isinstance(b, _Node) and b == 1:
+            return self
+        return self._graph.apply('multiply', (b, self))
+
+    def __truediv__(self, b):
+        return self._graph.apply('true_divide', (self, b))
+
+    def __rtruediv__(self, b):
+        return self._graph.apply('true_divide', (b, self))
+
+    def __pow__(self, b):
+        if not isinstance(b, _Node) and b == 1:
+            return self
+        return self._graph.apply('power', (self, b))
+
+    def __rpow__(self, b):
+        return self._graph.apply('power', (b, self))
+
+    def __mod__(self, b):
+        return self._graph.apply('remainder', (self, b))
+
+    def __neg__(self):
+        return self._graph.apply('negative', (self,))
+
+    #comparisons use the value at the trace point
+    def __lt__(self, b):
+        return self._value < b
+
+    def __le__(self, b):
+        return self._value <= b
+
+    def __gt__(self, b):
+        return self._value > b
+
+    def __ge__(self, b):
+        return self._value >= b
+
+    def __eq__(self, b):
+        return self._value == b
+
+    def __ne__(self, b):
+        return self._value != b
+
+    def __float__(self):
+        return float(self._value)
+
+    __hash__ = None
+
+
+def _backward(tape, index):
+    """Returns the adjoints of node 'index' with respect to every earlier node of 'tape' (None for nodes it does not depend on).
+    Unlike Tape._backward, no adjoint is skipped because it happens to be zero at the trace point."""
+    adjoints = [None] * (index + 1)
+    adjoints[index] = 1.0
+    for node in range(index, -1, -1):
+        adjoint = adjoints[node]
+        if adjoint is None:
+            continue
+        for parent, partial in zip(tape._parents[node], tape._partials[node]):
+            term = adjoint * partial
+            adjoints[parent] = term if adjoints[parent] is None else adjoints[parent] + term
+    return adjoints
+
+
+#ufuncs whose arguments can be swapped, so that a + b and b + a are merged
+_COMMUTATIVE = ('add', 'multiply')
+
+
+def _identity(graph, op, args):
+    """Returns the index of the argument an operation with a neutral constant (x + 0, x * 1, x ** 1, ...) reduces to, or None."""
+    constant = lambda arg, value: graph._ops[arg] == 'const' and graph._args[arg] == value
+    if op == 'add' and constant(args[0], 0):
+        return args[1]
+    if op in ('add', 'subtract') and constant(args[1], 0):
+        return args[0]
+    if op == 'multiply' and constant(args[0], 1):
+        return args[1]
+    if op in ('multiply', 'true_divide', 'divide', 'power') and constant(args[1], 1):
+        return args[0]
+    return None
+
+
+def _simplify(graph, outputs):
+    """
+    Returns a new graph computing the nodes in 'outputs' of 'graph', and the indices of those nodes in it.
+    Nodes are hashed by (op, inputs) for operations and by their value for constants, so duplicate subexpressions
+    are merged. Operations whose inputs are all constants are evaluated once (constant folding), and operations
+    with a neutral constant are replaced by their other argument.
+    """
+    simplified = _Graph()
+    table = {}
+
+    def record(op, args):
+        key = (op, repr(float(args))) if op == 'const' else (op, args)
+        if key not in table:
+            simplified._ops.append(op)
+            simplified._args.append(args)
+            table[key] = len(simplified._ops) - 1
+        return table[key]
+
+    remap = []
+    for op, args in zip(graph._ops, graph._args):
+        if op in ('input', 'const'):
+            remap.append(record(op, args))
+            continue
+        args = tuple(remap[arg] for arg in args)
+        if all(simplified._ops[arg] == 'const' for arg in args):
+            with np.errstate(all='ignore'):
+                remap.append(record('const', getattr(np, op)(*[simplified._args[arg] for arg in args])))
+            continue
+        identity = _identity(simplified, op, args)
+        if identity is not None:
+            remap.append(identity)
+            continue
+        remap.append(record(op, tuple(sorted(args)) if op in _COMMUTATIVE else args))
+    return simplified, [remap[output] for output in outputs]
+
+
+def _literal(value):
+    value = float(value)
+    if not np.isfinite(value):
+        return "np.float64('{0}')".format(value)
+    #negative literals are parenthesized, since -2.0 ** x0 would be parsed as -(2.0 ** x0)
+    return '({0!r})'.format(value) if np.signbit(value) else repr(value)
+
+
+class CompiledFunction():
+
+    """
+    A function traced once and compiled into a flat list of instructions computing its value and its derivatives.
+    Calling it replays the instructions as one generated Python/numpy kernel, without creating any Scalar objects.
+    """
+
+    def __init__(self, f, n_inputs, trace_point = None, simplify = True):
+        """
+        INPUTS
+        =======
+        f: function
+        The function to compile. It must take in a single list/array of length 'n_inputs' and return a Scalar-like
+        object or a list/array of them, using the arithmetic operators and the functions in autodiff.functions.
+
+        n_inputs: int
+        The number of inputs of 'f'
+
+        trace_point: List or array of ints/floats
+        The point 'f' is traced at. Defaults to ones. Branches of 'f' that depend on the values of its inputs
+        are frozen to the ones taken at this point.
+
+        simplify: bool
+        Whether to merge common subexpressions and fold constants before generating the kernels.
+        The number of instructions this removes is stored in 'removed_nodes'.
+
+        EXAMPLES
+        =========
+        >>> import autodiff as ad
+        >>> compiled = CompiledFunction(lambda x: x[0] * ad.sin(x[1]), 2)
+        >>> compiled([2, 0])
+        0.0
+        >>> value, gradient = compiled.evaluate([2, 0])
+        >>> gradient
+        array([0., 2.])
+        """
+        self.n_inputs = n_inputs
+        self._function = f
+        trace_point = np.ones(n_inputs) if trace_point is None else np.asarray(trace_point, dtype=float)
+        graph = _Graph()
+        tape = Tape()
+        inputs = np.array([ReverseScalar._new(tape, graph.input(i, trace_point[i]), (), ()) for i in range(n_inputs)])
+        output = f(inputs)
+
+        self.scalar_output = not isinstance(output, (list, tuple, np.ndarray))
+        outputs = [output] if self.scalar_output else list(output)
+        self.n_outputs = len(outputs)
+        values, derivatives = [], []
+        for out in outputs:
+            if isinstance(out, ReverseScalar):
+                adjoints = _backward(tape, out._index)
+                values.append(out._val)
+                derivatives.append([adjoints[leaf._index] if leaf._index <= out._index else None for leaf in inputs])
+            else:
+                values.append(out)
+                derivatives.append([None] * n_inputs)
+        #derivatives that do not depend on the inputs are constant zeros
+        derivatives = [[0.0 if d is None else d for d in row] for row in derivatives]
+
+        self._graph = graph
+        self._values = [graph.constant(v)._index if not isinstance(v, _Node) else v._index for v in values]
+        self._derivatives = [[graph.constant(d)._index if not isinstance(d, _Node) else d._index for d in row] for row in derivatives]
+        self.removed_nodes = 0
+        if simplify:
+            self._simplify()
+        self._build()
+
+    def _simplify(self):
+        """Replaces the graph by its simplified version (see _simplify) and counts the instructions removed."""
+        before = len(self._operations(self._live(self._values + [d for row in self._derivatives for d in row])))
+        graph, outputs = _simplify(self._graph, self._values + [d for row in self._derivatives for d in row])
+        self._graph = graph
+        self._values = outputs[:self.n_outputs]
+        self._derivatives = [outputs[self.n_outputs + i * self.n_inputs:self.n_outputs + (i + 1) * self.n_inputs] for i in range(self.n_outputs)]
+        self.removed_nodes = before - len(self._operations(self._live(outputs)))
+
+    @staticmethod
+    def _operations(instructions):
+        return [instruction for instruction in instructions if instruction[1] not in ('input', 'const')]
+
+    def _build(self):
+        """Generates the value kernel and the value-and-derivative kernel from the graph."""
+        self.instructions = self._live(self._values + [d for row in self._derivatives for d in row])
+        self._value_kernel = self._kernel(self._live(self._values), self._values, None)
+        self._kernel_function = self._kernel(self.instructions, self._values, self._derivatives)
+
+    def _live(self, outputs):
+        """Returns the (index, op, args) instructions the nodes in 'outputs' depend on, in topological order."""
+        ops, args = self._graph._ops, self._graph._args
+        live = set(outputs)
+        for index in range(len(ops) - 1, -1, -1):
+            if index in live and ops[index] not in ('input', 'const'):
+                live.update(args[index])
+        return [(index, ops[index], args[index]) for index in sorted(live)]
+
+    def _name(self, index):
+        op, args = self._graph._ops[index], self._graph._args[index]
+        if op == 'input':
+            return 'x{0}'.format(args)
+        if op == 'const':
+            return _literal(args)
+        return 'v{0}'.format(index)
+
+    def _kernel(self, instructions, values, derivatives):
+        """Returns the Python function computing 'values' (and 'derivatives') with straight-line code."""
+        lines = ['def kernel({0}):'.format(', '.join('x{0}'.format(i) for i in range(self.n_inputs)) or '')]
+        for index, op, args in instructions:
+            if op in ('input', 'const'):
+                continue
+            names = [self._name(arg) for arg in args]
+            if op in _INFIX:
+                expression = '{0} {1} {2}'.format(names[0], _INFIX[op], names[1])
+            elif op == 'negative':
+                expression = '-{0}'.format(names[0])
+            else:
+                expression = 'np.{0}({1})'.format(op, ', '.join(names))
+            lines.append('    v{0} = {1}'.format(index, expression))
+        if self.scalar_output:
+            value = self._name(values[0])
+        else:
+            value = 'np.array([{0}])'.format(', '.join(self._name(v) for v in values))
+        if derivatives is None:
+            lines.append('    return {0}'.format(value))
+        elif self.scalar_output:
+            lines.append('    return {0}, np.array([{1}])'.format(value, ', '.join(self._name(d) for d in derivatives[0])))
+        else:
+            rows = ', '.join('[{0}]'.format(', '.join(self._name(d) for d in row)) for row in derivatives)
+            lines.append('    return {0}, np.array([{1}])'.format(value, rows))
+        source = '\n'.join(lines)
+        namespace = {'np': np}
+        exec(source, namespace)
+        namespace['kernel'].source = source
+        return namespace['kernel']
+
+    @property
+    def source(self):
+        """The generated source of the value-and-derivative kernel."""
+        return self._kernel_function.source
+
+    def __len__(self):
+        """The number of instructions replayed by a value-and-derivative evaluation."""
+        return len(self._operations(self.instructions))
+
+    def __call__(self, x):
+        """Returns the value of the compiled function at 'x', without computing derivatives."""
+        return self._value_kernel(*np.asarray(x, dtype=float).tolist())
+
+    def evaluate(self, x):
+        """
+        Returns the value of the compiled function at 'x' and its derivatives: the gradient (shape (n_inputs,))
+        for functions with a single output, the Jacobian (shape (n_outputs, n_inputs)) otherwise.
+        """
+        return self._kernel_function(*np.asarray(x, dtype=float).tolist())
+
+
+def compile(f, n_inputs, trace_point = None, simplify = True):
+    """
+    Traces 'f' once and returns a CompiledFunction that replays it as a flat list of instructions.
+
+    INPUTS
+    =======
+    f: function
+    The function to compile. It must take in a single list/array of length 'n_inputs'.
+
+    n_inputs: int
+    The number of inputs of 'f'
+
+    trace_point: List or array of ints/floats
+    The point 'f' is traced at. Defaults to ones.
+
+    simplify: bool
+    Whether to merge common subexpressions and fold constants in the traced graph.
+
+    RETURNS
+    ========
+    CompiledFunction
+    Call it to get the value of 'f', or use its evaluate method to get the value and the gradient/Jacobian.
+    Can be passed to gradient_descent, quasi_newtons_method and newtons_method in place of 'f'.
+
+    EXAMPLES
+    =========
+    >>> rosenbrock = compile(lambda x: (1 - x[0]) ** 2 + 100 * (x[1] - x[0] ** 2) ** 2, 2)
+    >>> rosenbrock([1, 1])
+    0.0
+    >>> rosenbrock.evaluate([0, 0])
+    (1.0, array([-2.,  0.]))
+    """
+    return CompiledFunction(f, n_inputs, trace_point, simplify)
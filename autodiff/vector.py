@@ -1,8 +1,11 @@
 import numpy as np
 from autodiff.scalar import Scalar
+from autodiff.dense import DenseScalar, VariableRegistry, _dense_jacobian
+from autodiff.reverse import ReverseScalar, Tape
+from autodiff.dualarray import DualArray, create_dual_array
 
 
-def create_vector(vector_name, values, seed_vector = None):
+def create_vector(vector_name, values, seed_vector = None, mode = 'dict', registry = None):
     """
     Returns an array of Scalar containing the values
     with names derived from vector_name.
@@ -10,15 +13,37 @@ def create_vector(vector_name, values, seed_vector = None):
     INPUTS
     =======
     vector_name: string
-    The constant or Scalar object we are multiplying the current Scalar object with
+    The prefix of the variable names: the i-th entry is the variable vector_name + str(i). Ignored for a 2-D seed
+    matrix, whose directions are named 'd1', ..., 'dk' instead.
 
     values: list
     The values of the Scalar that will be in the output.
 
+    seed_vector: list or 2-D array
+    The seed derivatives of the Scalars. Defaults to 1 for every Scalar.
+    A seed matrix S of shape (len(values), k) seeds k tangent directions at once: the Scalars are then DenseScalars
+    (a DualArray in mode 'array') differentiated with respect to the directions 'd1', ..., 'dk' of a new VariableRegistry,
+    so that one evaluation of a function on the vector gives J * S, which get_tangents returns. With S the identity
+    matrix this is the whole Jacobian in a single pass.
+
+    mode: string
+    How the derivatives are stored. With a 2-D seed matrix, 'dict' and 'dense' both give DenseScalars and 'array' a
+    DualArray, since the k directions are kept as one derivative array; 'reverse' is not supported.
+    Options:
+        'dict' : Scalar objects keeping their derivatives in a dictionary keyed by variable name
+        'dense' : DenseScalar objects keeping their derivatives in a numpy array indexed through 'registry'
+        'reverse' : ReverseScalar objects recorded on a new Tape shared by the whole vector
+        'array' : a single DualArray holding every value, differentiated with whole-array numpy operations
+
+    registry: VariableRegistry
+    The registry indexing the derivatives in modes 'dense' and 'array'. Defaults to a new registry for every vector, so that the
+    length of the derivative vectors only depends on the variables of the vector. Pass the same registry to vectors
+    that are combined with each other.
+
     RETURNS
     ========
-    np.ndarray
-    Returns the vector as a numpy array object.
+    np.ndarray or DualArray
+    Returns the vector as a numpy array object, or as a DualArray for mode 'array'.
 
     NOTES
     =====
@@ -36,20 +61,112 @@ def create_vector(vector_name, values, seed_vector = None):
     2.0
     >>> w[1].getDeriv()['w2']
     1.0
+    >>> w = create_vector('w', [2, 1, 3], mode='dense')
+    >>> w[1].getGradient(['w1', 'w2'])
+    array([0., 1.])
+    >>> w = create_vector('w', [2, 1, 3], mode='reverse')
+    >>> (w[0] * w[1] * w[2]).getGradient(['w1', 'w2', 'w3'])
+    array([3., 6., 2.])
+    >>> w = create_vector('w', [2, 1, 3], mode='array')
+    >>> (w * w).getGradient(['w1', 'w2', 'w3'])
+    array([[4., 0., 0.],
+           [0., 2., 0.],
+           [0., 0., 6.]])
+    >>> w = create_vector('w', [2, 1, 3], seed_vector=[[1, 0], [0, 1], [1, 1]])
+    >>> get_tangents(np.array([w[0] * w[1], w[2] ** 2]))
+    array([[1., 2.],
+           [6., 6.]])
     """
+    if seed_vector is not None and np.ndim(seed_vector) == 2:
+        return _create_tangent_vector(values, seed_vector, mode)
+    if mode == 'array':
+        return create_dual_array(vector_name, values, seed_vector, registry)
+    if mode == 'dict':
+        constructor = Scalar
+    elif mode == 'dense':
+        registry = VariableRegistry() if registry is None else registry
+        constructor = lambda variable, value, deriv = 1: DenseScalar(variable, value, deriv, registry)
+    elif mode == 'reverse':
+        tape = Tape()
+        constructor = lambda variable, value, deriv = 1: ReverseScalar(variable, value, deriv, tape)
+    else:
+        raise Exception("Not a valid mode.")
     if seed_vector is None:
-        return np.array([Scalar("%s%i" % (vector_name, i), value)
+        return np.array([constructor("%s%i" % (vector_name, i), value)
                          for i, value in enumerate(values, 1)])
     else:
         if len(values) != len(seed_vector):
             raise Exception("Values not the same length as seed vector!")
-        return np.array([Scalar("%s%i" % (vector_name, i), value, seed_vector[i - 1])
+        return np.array([constructor("%s%i" % (vector_name, i), value, seed_vector[i - 1])
                          for i, value in enumerate(values, 1)])
 
 
+def _create_tangent_vector(values, seed_matrix, mode):
+    """Returns the vector of 'values' carrying the k tangent directions given by the columns of 'seed_matrix'.
+    Each DenseScalar keeps its row of the seed matrix as one contiguous derivative array, so every operation
+    updates all k directions with a single numpy operation."""
+    seed_matrix = np.array(seed_matrix, dtype=float) #C-contiguous copy, its rows are contiguous as well
+    if seed_matrix.shape[0] != len(values):
+        raise Exception("Values not the same length as seed vector!")
+    registry = VariableRegistry()
+    registry.register_vector('d', seed_matrix.shape[1])
+    if mode == 'array':
+        return DualArray(values, seed_matrix, registry)
+    if mode not in ['dict', 'dense']:
+        raise Exception("Not a valid mode.")
+    return np.array([DenseScalar._new(value, seed, registry) for value, seed in zip(values, seed_matrix)])
+
+
+def get_tangents(vector):
+    """
+    Returns the derivatives of a vector created from a vector seeded with a seed matrix S (see create_vector) with respect
+    to the k seeded directions, i.e. the (len(vector), k) matrix J * S. Entries that do not depend on the seeded vector
+    have zero derivatives.
+
+    INPUTS
+    =======
+    vector: list or array of DenseScalars/constants, DenseScalar or DualArray
+    The result of a function evaluated on a vector created with a seed matrix
+
+    RETURNS
+    ========
+    numpy array
+    The matrix J * S
+
+    EXAMPLES
+    =========
+    >>> x = create_vector('x', [1, 2], seed_vector=np.identity(2))
+    >>> get_tangents([x[0] * x[1], 3.0, x[1]])
+    array([[2., 1.],
+           [0., 0.],
+           [0., 1.]])
+    """
+    if isinstance(vector, DualArray):
+        return np.atleast_2d(vector.getGradient(vector._registry.names()))
+    tangents = [_tangent(sclr) for sclr in np.atleast_1d(np.asarray(vector, dtype=object))]
+    width = max([len(tangent) for tangent in tangents if tangent is not None], default=0)
+    jacobian = np.zeros((len(tangents), width))
+    for row, tangent in enumerate(tangents):
+        if tangent is not None:
+            jacobian[row, :len(tangent)] = tangent
+    return jacobian
+
+
+def _tangent(sclr):
+    """Returns the derivatives of an entry of a vector with respect to the seeded directions, or None for a constant."""
+    if isinstance(sclr, DualArray):
+        return sclr.getGradient(sclr._registry.names()).ravel()
+    if isinstance(sclr, DenseScalar):
+        return sclr._deriv
+    return None
+
+
 def get_jacobian(vector, variables):
     """
     Returns the jacobian of the vector w.r.t. the variables passed in.
+    Vectors of DenseScalars sharing a registry are handled by stacking their derivative
+    arrays and slicing the columns of the requested variables, and DualArrays by slicing
+    the columns of their derivative matrix.
 
     INPUTS
     =======
@@ -71,5 +188,10 @@ def get_jacobian(vector, variables):
     >>> np.array_equal(jacobian, np.array([[1.,0.,0.],[0.,-1.,0.],[0.,0.,0.]]))
     True
     """
-
-    return np.array([sclr.getGradient(variables) for sclr in vector])
\ No newline at end of file
+    if isinstance(vector, DualArray):
+        return np.atleast_2d(vector.getGradient(variables))
+    if len(vector) > 0 and all(isinstance(sclr, DenseScalar) for sclr in vector):
+        registry = vector[0]._registry
+        if all(sclr._registry is registry for sclr in vector):
+            return _dense_jacobian(vector, variables, registry)
+    return np.array([sclr.getGradient(variables) for sclr in vector])
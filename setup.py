@@ -12,7 +12,7 @@ setuptools.setup(name='autodiff-py',
 	packages=['autodiff'],
 	install_requires=[
 	  'numpy',
-	  'scipy',
+	  'scipy>=1.4.0',
 	],
 	classifiers=[
 		"Development Status :: 5 - Production/Stable",
@@ -0,0 +1,144 @@
+import sys
+import os
+import numpy as np
+import pytest
+
+sys.path.append('..')
+import autodiff as ad
+
+
+def test_registry():
+    registry = ad.VariableRegistry()
+    assert(registry.register('a') == 0)
+    assert(registry.register('b') == 1)
+    assert(registry.register('a') == 0)
+    assert(len(registry) == 2)
+    assert('a' in registry)
+    assert('c' not in registry)
+    assert(registry.names() == ['a', 'b'])
+    assert(np.array_equal(registry.indices(['b', 'c', 'a']), [1, -1, 0]))
+
+    x = ad.DenseScalar('x', 2, registry=registry)
+    assert(len(x._deriv) == 3)
+    y = ad.DenseScalar('y', 3)
+    with pytest.raises(Exception):
+        x + y
+
+
+def test_arithmetic():
+    x = ad.DenseScalar('x', 2)
+    y = ad.DenseScalar('y', 5)
+    z = 3 * x + y * x - 1
+    assert(z.getValue() == 15)
+    assert(np.array_equal(z.getGradient(['x', 'y']), [8, 2]))
+    assert(z.getDeriv() == {'x': 8.0, 'y': 2.0})
+
+    z = x / y
+    assert(np.isclose(z.getValue(), 0.4))
+    assert(np.allclose(z.getGradient(['x', 'y']), [0.2, -2 / 25]))
+
+    z = 1 - x
+    assert(z.getValue() == -1)
+    assert(np.array_equal(z.getGradient(['x', 'y']), [-1, 0]))
+
+    z = 10 / x
+    assert(z.getValue() == 5)
+    assert(np.array_equal(z.getGradient(['x']), [-2.5]))
+
+    z = x ** y
+    assert(z.getValue() == 32)
+    assert(np.allclose(z.getGradient(['x', 'y']), [5 * 16, 32 * np.log(2)]))
+
+    z = x ** x
+    assert(np.allclose(z.getGradient(['x']), [4 * (np.log(2) + 1)]))
+
+    z = 2 ** x
+    assert(np.allclose(z.getGradient(['x']), [4 * np.log(2)]))
+
+    z = x ** 0
+    assert(z.getValue() == 1)
+    assert(np.array_equal(z.getGradient(['x']), [0]))
+
+    zero = ad.DenseScalar('zero', 0)
+    z = zero ** (zero * 1)
+    assert(z.getValue() == 1)
+    assert(np.array_equal(z.getGradient(['zero']), [0]))
+    z = zero ** 0
+    assert(np.array_equal(z.getGradient(['zero']), [0]))
+    z = 0 ** (zero + 1)
+    assert(np.array_equal(z.getGradient(['zero']), [0]))
+    with pytest.raises(ZeroDivisionError):
+        0 ** zero
+
+    with pytest.raises(ValueError):
+        ad.DenseScalar('x', -2) ** 0.5
+    with pytest.raises(ValueError):
+        ad.DenseScalar('x', -2) ** ad.DenseScalar('y', 0.5)
+
+
+def test_inplace():
+    x = ad.DenseScalar('x', 2)
+    y = ad.DenseScalar('y', 5)
+    z = x * 1
+    z += y
+    z *= x
+    z -= 1
+    z /= 2
+    z **= 2
+    assert(np.isclose(z.getValue(), (13 / 2) ** 2))
+    assert(np.allclose(z.getGradient(['x', 'y']), [2 * 6.5 * 9 / 2, 2 * 6.5 * 1]))
+
+
+def test_equality():
+    x = ad.DenseScalar('x', 2)
+    assert(x == ad.DenseScalar('x', 2))
+    assert(x != ad.DenseScalar('x', 3))
+    assert(x != ad.DenseScalar('y', 2))
+    assert(x != 2)
+    assert(str(x) == "Value: 2.0, Derivatives: {'x': 1.0}")
+    assert(repr(x) == "DenseScalar(2.0)")
+
+
+def test_functions():
+    x = ad.DenseScalar('x', 0.25)
+    y = ad.DenseScalar('y', 2)
+    for function in [ad.sin, ad.cos, ad.tan, ad.exp, ad.sqrt, ad.arcsin, ad.arccos,
+                     ad.arctan, ad.sinh, ad.cosh, ad.tanh, ad.logistic, ad.ln]:
+        dense = function(x * y)
+        scalar = function(ad.Scalar('x', 0.25) * ad.Scalar('y', 2))
+        assert(np.isclose(dense.getValue(), scalar.getValue()))
+        assert(np.allclose(dense.getGradient(['x', 'y']), scalar.getGradient(['x', 'y'])))
+
+    z = ad.log(x, 10)
+    assert(np.isclose(z.getValue(), np.log10(0.25)))
+    z = ad.power(x, y)
+    assert(np.isclose(z.getValue(), 0.0625))
+    assert(np.allclose(z.getGradient(['x', 'y']), [2 * 0.25, 0.0625 * np.log(0.25)]))
+
+
+def test_vector():
+    v = ad.create_vector('dv', [1, 2, 3], mode='dense')
+    w = v * v + 2 * v
+    assert(np.array_equal(ad.get_value(w), [3, 8, 15]))
+    jacobian = ad.get_jacobian(w, ['dv1', 'dv2', 'dv3', 'unknown'])
+    assert(np.array_equal(jacobian, np.array([[4, 0, 0, 0], [0, 6, 0, 0], [0, 0, 8, 0]])))
+
+    v = ad.create_vector('dv', [1, 2], [3, 4], mode='dense')
+    jacobian = ad.get_jacobian(v, ['dv1', 'dv2'])
+    assert(np.array_equal(jacobian, np.array([[3, 0], [0, 4]])))
+
+    #every vector gets its own registry, so its derivative vectors do not grow with earlier variables
+    ad.create_vector('big', np.zeros(1000), mode='dense')
+    assert(all(len(sclr._deriv) <= 2 for sclr in ad.create_vector('dv', [1, 2], mode='dense')))
+    #vectors combined with each other share a registry passed in explicitly
+    registry = ad.VariableRegistry()
+    v = ad.create_vector('dv', [1, 2], [3, 4], mode='dense', registry=registry)
+    u = ad.create_vector('du', [1, 2], mode='dense', registry=registry)
+    w = np.array([u[0] * v[1], u[1] + v[0]])
+    assert(np.array_equal(ad.get_jacobian(w, ['du1', 'du2', 'dv1', 'dv2']),
+                          np.array([[2, 0, 0, 4], [0, 1, 3, 0]])))
+    with pytest.raises(Exception):
+        ad.create_vector('du', [1, 2], mode='dense') * v[0]
+
+    with pytest.raises(Exception):
+        ad.create_vector('dv', [1, 2], mode='unknown')
@@ -0,0 +1,175 @@
+import sys
+import os
+import time
+import numpy as np
+import scipy.sparse as sp
+import pytest
+
+sys.path.append('..')
+import autodiff as ad
+import autodiff.optimize as optimize
+from autodiff.dualarray import create_dual_array
+
+
+def test_arithmetic():
+    x = ad.create_vector('ax', [2, 4], mode='array')
+    names = ['ax1', 'ax2']
+    z = 3 * x + x * x - 1
+    assert(np.array_equal(z.getValue(), [9, 27]))
+    assert(np.array_equal(z.getGradient(names), [[7, 0], [0, 11]]))
+
+    z = x[0] / x[1]
+    assert(z.getValue() == 0.5)
+    assert(np.allclose(z.getGradient(names), [0.25, -2 / 16]))
+
+    z = 1 - x
+    assert(np.array_equal(z.getGradient(names), -np.identity(2)))
+    z = 8 / x
+    assert(np.array_equal(z.getValue(), [4, 2]))
+    assert(np.array_equal(z.getGradient(names), [[-2, 0], [0, -0.5]]))
+    z = x / np.array([2, 4])
+    assert(np.array_equal(z.getGradient(names), [[0.5, 0], [0, 0.25]]))
+
+    z = x ** x[::-1]
+    assert(np.array_equal(z.getValue(), [16, 16]))
+    assert(np.allclose(z.getGradient(names), [[4 * 2 ** 3, 16 * np.log(2)], [16 * np.log(4), 2 * 4]]))
+    z = 2 ** x
+    assert(np.allclose(z.getGradient(names), np.diag([4 * np.log(2), 16 * np.log(2)])))
+
+    zero = ad.create_vector('azero', [0, 1], mode='array')
+    z = zero ** (zero * 0)
+    assert(np.array_equal(z.getGradient(['azero1', 'azero2']), [[0, 0], [0, 0]]))
+    z = 0 ** (zero + 1)
+    assert(np.array_equal(z.getGradient(['azero1', 'azero2']), [[0, 0], [0, 0]]))
+    with pytest.raises(ZeroDivisionError):
+        0 ** zero
+    with pytest.raises(ZeroDivisionError):
+        zero ** -1
+    with pytest.raises(ValueError):
+        (zero - 2) ** 0.5
+
+    #numpy arrays on the left defer to the DualArray
+    z = np.array([1., 2.]) * x + np.array([1., 1.])
+    assert(isinstance(z, ad.DualArray))
+    assert(np.array_equal(z.getGradient(names), [[1, 0], [0, 2]]))
+
+    #broadcasting a value against every element
+    z = x + np.array([[1.], [2.]])
+    assert(z.shape == (2, 2))
+    assert(np.array_equal(z.getGradient(names)[1], np.identity(2)))
+
+    with pytest.raises(Exception):
+        x + create_dual_array('ax', [1, 2], registry=ad.VariableRegistry())
+    with pytest.raises(Exception):
+        ad.DualArray([1, 2], np.zeros((3, 2)))
+
+
+def test_indexing():
+    x = ad.create_vector('ax', [2, 4, 6], [1, 2, 3], mode='array')
+    assert(len(x) == 3)
+    assert(x[1].getValue() == 4)
+    assert(np.array_equal(x[1].getGradient(['ax1', 'ax2']), [0, 2]))
+    assert(np.array_equal(x[1:].getValue(), [4, 6]))
+    assert(np.array_equal([element.getValue() for element in x], [2, 4, 6]))
+    assert(x[2].getDeriv() == {'ax3': 3.0})
+    assert(str(x[0]) == "Value: 2.0, Derivatives: {'ax1': 1.0}")
+    assert(repr(x) == "DualArray([2. 4. 6.])")
+
+    total = (x * x).sum()
+    assert(total.getValue() == 56)
+    assert(np.array_equal(total.getGradient(['ax1', 'ax2', 'ax3']), [4, 16, 36]))
+    assert(np.sum(x).getValue() == 12)
+    z = (x + np.zeros((2, 1))).sum(axis=1)
+    assert(np.array_equal(z.getValue(), [12, 12]))
+
+
+def test_functions():
+    for function in [ad.sin, ad.cos, ad.tan, ad.exp, ad.sqrt, ad.arcsin, ad.arccos,
+                     ad.arctan, ad.sinh, ad.cosh, ad.tanh, ad.logistic, ad.ln]:
+        x = ad.create_vector('ax', [0.25, 0.5], mode='array')
+        array = function(x * x[::-1])
+        for i, (a, b) in enumerate([(0.25, 0.5), (0.5, 0.25)]):
+            scalar = function(ad.Scalar('ax1', a) * ad.Scalar('ax2', b) if i == 0 else ad.Scalar('ax2', a) * ad.Scalar('ax1', b))
+            assert(np.isclose(array.getValue()[i], scalar.getValue()))
+            assert(np.allclose(array.getGradient(['ax1', 'ax2'])[i], scalar.getGradient(['ax1', 'ax2'])))
+
+    x = ad.create_vector('ax', [3], mode='array')
+    z = ad.log(x, 10) + ad.power(x, 2)
+    assert(np.allclose(z.getGradient(['ax1']), [[1 / (3 * np.log(10)) + 6]]))
+
+
+def test_vector():
+    x = ad.create_vector('ax', [1, 2, 3], mode='array')
+    w = x * x + 2 * x
+    assert(np.array_equal(ad.get_value(w), [3, 8, 15]))
+    derivs = ad.get_deriv(w)
+    assert(np.array_equal(derivs['ax2'], [0, 6, 0]))
+    jacobian = ad.get_jacobian(w, ['ax1', 'ax2', 'ax3', 'unknown'])
+    assert(np.array_equal(jacobian, [[4, 0, 0, 0], [0, 6, 0, 0], [0, 0, 8, 0]]))
+    assert(np.array_equal(ad.get_jacobian(w.sum(), ['ax1', 'ax2']), [[4, 6]]))
+
+
+def test_sparse():
+    n = 100000
+    start = time.time()
+    x = ad.create_vector('big', np.linspace(0.1, 1, n), mode='array')
+    y = ad.sin(x) * x + ad.exp(x[0]) - x ** 2
+    elapsed = time.time() - start
+    assert(sp.issparse(y._deriv))
+    values = np.linspace(0.1, 1, n)
+    assert(np.allclose(y.getValue(), np.sin(values) * values + np.exp(0.1) - values ** 2))
+    expected = np.cos(values) * values + np.sin(values) - 2 * values
+    assert(len(y._columns) == n)
+    diagonal = y._deriv.diagonal()
+    assert(np.allclose(diagonal[1:], expected[1:]))
+    assert(np.isclose(diagonal[0], expected[0] + np.exp(0.1)))
+    assert(np.allclose(y._deriv[1:, 0].toarray(), np.exp(0.1)))
+    assert(np.array_equal(y[5:7].getGradient(['big6', 'big7']), np.diag(expected[5:7])))
+    assert(np.isclose(y.sum().getGradient(['big2'])[0], expected[1] + 0))
+    assert(elapsed < 5)
+
+
+def test_optimizers():
+    def rosenbrock(args, a = 2, b = 3):
+        return (a - args[0]) ** 2 + b * (args[1] - args[0] ** 2) ** 2
+
+    assert(np.isclose(optimize.gradient_descent(rosenbrock, [1, 1], mode='array')[0], [2, 4]).all())
+    for method in ['BFGS', 'DFP', 'Broyden']:
+        assert(np.isclose(optimize.quasi_newtons_method(rosenbrock, [1, 1], method=method, mode='array')[0], [2, 4]).all())
+
+
+def test_columns(monkeypatch):
+    #vectors over different variables of one registry are combined over the union of their columns
+    shared = ad.VariableRegistry()
+    x = ad.create_vector('acx', [1, 2], mode='array', registry=shared)
+    y = ad.create_vector('acy', [3, 4], mode='array', registry=shared)
+    z = x * y
+    assert(len(z._columns) == 4)
+    assert(np.array_equal(z.getGradient(['acx1', 'acy2', 'acx2']), [[3, 0, 0], [0, 2, 4]]))
+
+    registry = ad.VariableRegistry()
+    registry.register('acu2')
+    u = create_dual_array('acu', [1, 2], [2, 3], registry=registry)
+    assert(np.array_equal(u._columns, [0, 1]))
+    assert(np.array_equal(u.getGradient(['acu1', 'acu2']), [[2, 0], [0, 3]]))
+    with pytest.raises(Exception):
+        create_dual_array('acu', [1, 2], [1])
+
+    #without one, every DualArray has a private registry and leaves the dense registry alone
+    size = len(ad.dense.default_registry)
+    assert(len(ad.create_vector('acw', np.zeros(50), mode='array')._registry) == 50)
+    assert(len(ad.dense.default_registry) == size)
+    with pytest.raises(Exception):
+        ad.create_vector('acx', [1, 2], mode='array') * ad.create_vector('acy', [3, 4], mode='array')
+
+    monkeypatch.setattr(ad.dualarray, 'SPARSE_THRESHOLD', 1)
+    x = ad.create_vector('acx', [1, 2], mode='array', registry=shared)
+    y = ad.create_vector('acy', [3, 4], mode='array', registry=shared)
+    z = x * y
+    assert(sp.issparse(z._deriv))
+    assert(np.array_equal(z.getGradient(['acx1', 'acy2', 'acx2']), [[3, 0, 0], [0, 2, 4]]))
+    assert(np.array_equal(z[:, None].getGradient(['acy1']), [[[1]], [[0]]]))
+    z = z + np.ones((2, 2))
+    assert(not sp.issparse(z._deriv))
+    with pytest.raises(ValueError):
+        y.sum(axis=1)
@@ -322,4 +322,42 @@ def test_arctan():
     z = ad.arctan(x * y);
     assert( np.isclose(z.getValue(), np.arctan(0.5 * -0.2)) );
     assert( np.isclose(z.getDeriv()['x'], -0.2 * 1 / (1 + (-0.1)**2)) );
-    assert( np.isclose(z.getDeriv()['y'], 0.5 * 1 / (1 + (-0.1)**2)) );
\ No newline at end of file
+    assert( np.isclose(z.getDeriv()['y'], 0.5 * 1 / (1 + (-0.1)**2)) );
+
+def test_vectorize():
+    #arrays of Scalars are evaluated as one batch
+    x = ad.create_vector('x', [0.25, 0.5, 0.75])
+    for function in [ad.sin, ad.cos, ad.tan, ad.exp, ad.sqrt, ad.arcsin, ad.arccos,
+                     ad.arctan, ad.sinh, ad.cosh, ad.tanh, ad.logistic, ad.ln]:
+        y = function(x)
+        assert(y.shape == (3,))
+        for i, value in enumerate([0.25, 0.5, 0.75]):
+            scalar = function(ad.Scalar('x{}'.format(i + 1), value))
+            assert(np.isclose(y[i].getValue(), scalar.getValue()))
+            assert(np.isclose(y[i].getDeriv()['x{}'.format(i + 1)], scalar.getDeriv()['x{}'.format(i + 1)]))
+    y = ad.log(x.reshape(3, 1), 10)
+    assert(y.shape == (3, 1))
+    assert(np.isclose(y[2, 0].getDeriv()['x3'], 1 / (0.75 * np.log(10))))
+    assert(np.array_equal(ad.get_value(x), [0.25, 0.5, 0.75]))
+    assert(ad.get_deriv(x)[1] == {'x2': 1.0})
+
+    #float arrays go straight to numpy and arrays in other positions are evaluated elementwise
+    assert(np.allclose(ad.sin(np.array([0.5, 1])), np.sin([0.5, 1])))
+    assert(np.allclose(ad.tan(np.array([0.5, 1])), np.tan([0.5, 1])))
+    assert(np.allclose(ad.power(np.array([2, 3]), 2), [4, 9]))
+    assert(np.allclose(ad.sin(np.array([0.5, 1], dtype=object)), np.sin([0.5, 1])))
+    y = ad.power(2, x)
+    assert(np.isclose(y[0].getDeriv()['x1'], 2 ** 0.25 * np.log(2)))
+    y = ad.log(np.e, base=np.array([np.e, 1 / np.e]))
+    assert(np.allclose(y, [1, -1]))
+
+    #composite functions built from arithmetic also receive the whole batch
+    @ad.vectorize
+    def polynomial(sclr):
+        return (sclr + 1) * (1 + sclr) + (sclr - 1) * (1 - sclr) + sclr * 2 + 2 * sclr \
+            + sclr / 2 + 2 / sclr + sclr ** 2 + 2 ** sclr - sclr + -sclr
+    y = polynomial(x)
+    for i, value in enumerate([0.25, 0.5, 0.75]):
+        scalar = polynomial(ad.Scalar('x{}'.format(i + 1), value))
+        assert(np.isclose(y[i].getValue(), scalar.getValue()))
+        assert(np.isclose(y[i].getDeriv()['x{}'.format(i + 1)], scalar.getDeriv()['x{}'.format(i + 1)]))
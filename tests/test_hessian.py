@@ -0,0 +1,144 @@
+import sys
+import os
+import numpy as np
+import pytest
+
+sys.path.append('..')
+import autodiff as ad
+import autodiff.optimize as optimize
+
+
+def finite_difference_hessian(f, x, h = 1e-5):
+    """Central differences of the gradients computed with Scalars."""
+    x = np.array(x, dtype=float)
+    names = ['x{}'.format(i) for i in range(1, len(x) + 1)]
+    gradient = lambda point: f(ad.create_vector('x', point)).getGradient(names)
+    hessian = np.zeros((len(x), len(x)))
+    for i in range(len(x)):
+        step = np.zeros(len(x))
+        step[i] = h
+        hessian[:, i] = (gradient(x + step) - gradient(x - step)) / (2 * h)
+    return hessian
+
+
+def test_arithmetic():
+    x = ad.HyperDual(2, [1, 0])
+    y = ad.HyperDual(5, [0, 1])
+    z = 3 * x + y * x - 1 - x / y + 10 / x - (1 - y)
+    assert(np.isclose(z.getValue(), 6 + 10 - 1 - 0.4 + 5 + 4))
+    assert(np.allclose(z.getGradient(), [3 + 5 - 1 / 5 - 10 / 4, 2 + 2 / 25 + 1]))
+    assert(np.allclose(z.getHessian(), [[-2 * 10 / 8 * -1, 1 + 1 / 25], [1 + 1 / 25, -2 * 2 / 125]]))
+
+    z = x ** y
+    assert(np.isclose(z.getValue(), 32))
+    assert(np.allclose(z.getHessian(), finite_difference_hessian(lambda v: v[0] ** v[1], [2, 5])))
+    z = 2 ** (x * y)
+    assert(np.allclose(z.getHessian(), finite_difference_hessian(lambda v: 2 ** (v[0] * v[1]), [2, 5])))
+    z = x ** 0
+    assert(z.getValue() == 1 and not z.getHessian().any())
+    z = x ** 1
+    assert(np.array_equal(z.getGradient(), [1, 0]) and not z.getHessian().any())
+
+    with pytest.raises(ValueError):
+        (x - 3) ** 0.5
+    with pytest.raises(ValueError):
+        (x - 3) ** y
+    with pytest.raises(ZeroDivisionError):
+        0 ** (x - 2)
+    z = 0 ** (x - 1)
+    assert(z.getValue() == 0 and not z.getGradient().any())
+
+    assert(repr(x) == "HyperDual(2.0)")
+    assert(str(x) == "Value: 2.0, Gradient: [1. 0.], Hessian: [[0.0, 0.0], [0.0, 0.0]]")
+
+
+def test_functions():
+    point = [0.3, 0.7]
+    for function in [ad.sin, ad.cos, ad.tan, ad.exp, ad.sqrt, ad.arcsin, ad.arccos,
+                     ad.arctan, ad.sinh, ad.cosh, ad.tanh, ad.logistic, ad.ln]:
+        f = lambda x: function(x[0] * x[1]) / (1 + x[0]) - 2 / x[1] + x[1] ** x[0] + ad.log(x[0], 10) + ad.power(x[0], 3)
+        hessian = ad.get_hessian(f, point)
+        assert(np.allclose(hessian, finite_difference_hessian(f, point), atol=1e-6))
+        assert(np.allclose(ad.get_hessian(f, point, triangular=True), hessian))
+        hyperdual = ad.hessian._evaluate(f, point)
+        scalar = f(ad.create_vector('x', point))
+        assert(np.isclose(hyperdual.getValue(), scalar.getValue()))
+        assert(np.allclose(hyperdual.getGradient(), scalar.getGradient(['x1', 'x2'])))
+
+
+def test_dual():
+    #the univariate dual numbers a HyperDual hands to the functions propagate first derivatives
+    x = ad.hessian._Dual(2.0)
+    y = (x - 1) * 2 ** x + np.sin(x) - np.float64(3) * x
+    assert(np.isclose(y.real, 4 + np.sin(2) - 6))
+    assert(np.isclose(y.dual, 4 + 4 * np.log(2) + np.cos(2) - 3))
+    assert(repr(ad.hessian._Dual(2.0)) == "_Dual(2.0, 1.0)")
+    y = x / (x * x) + x ** 0 + x % 3
+    assert(np.isclose(y.real, 3.5) and np.isclose(y.dual, -0.25))
+    with pytest.raises(TypeError):
+        np.add.outer(x, 1)
+    with pytest.raises(TypeError):
+        np.floor(x)
+
+
+def test_triangular():
+    f = lambda x: x[0] * x[1] * x[2] + ad.exp(x[0] * x[2])
+    x = ad.hessian._evaluate(f, [1, 2, 3], triangular=True)
+    assert(x._hessian.shape == (6,))
+    assert(np.allclose(x.getHessian(), ad.get_hessian(f, [1, 2, 3])))
+
+    #arrays of HyperDuals are evaluated elementwise
+    v = np.array([ad.HyperDual(0.5, [1, 0]), ad.HyperDual(1, [0, 1])])
+    assert(np.allclose(ad.sin(v)[1].getHessian(), [[0, 0], [0, -np.sin(1)]]))
+
+
+def test_newton():
+    def ill_conditioned(x):
+        return ad.exp(x[0] + 3 * x[1] - 0.1) + ad.exp(x[0] - 3 * x[1] - 0.1) + ad.exp(-x[0] - 0.1) + 1000 * x[2] ** 2
+    #Newton is at the minimum after a handful of iterations, where BFGS is still far from it
+    minimum = [-np.log(2) / 2, 0, 0]
+    assert(np.allclose(optimize.quasi_newtons_method(ill_conditioned, [1, 1, 1], method='Newton', max_iter=8)[0], minimum))
+    assert(not np.allclose(optimize.quasi_newtons_method(ill_conditioned, [1, 1, 1], method='BFGS', max_iter=8)[0], minimum))
+
+    def rosenbrock(args, a = 2, b = 3):
+        return (a - args[0]) ** 2 + b * (args[1] - args[0] ** 2) ** 2
+    assert(np.allclose(optimize.quasi_newtons_method(rosenbrock, [1, 1], method='Newton')[0], [2, 4]))
+    assert(np.allclose(optimize.quasi_newtons_method(ad.compile(rosenbrock, 2), [1, 1], method='Newton')[0], [2, 4]))
+
+    #singular and indefinite Hessians fall back to steepest descent
+    assert(np.allclose(optimize._newton_direction(lambda x: x[0] + 0 * x[1], [1, 1])[1], [-1, 0]))
+    assert(np.allclose(optimize._newton_direction(lambda x: x[0] - x[0] ** 2 + x[1] ** 2, [0, 0.1])[1], [-1, -0.2]))
+
+
+def test_hvp():
+    point = np.array([0.3, 0.7, 1.2])
+    v = np.array([1, -2, 0.5])
+    for function in [ad.sin, ad.cos, ad.tan, ad.exp, ad.sqrt, ad.arctan, ad.sinh, ad.cosh, ad.tanh, ad.logistic, ad.ln]:
+        f = lambda x: function(x[0] * x[1]) / (1 + x[2]) - 2 / x[1] + x[1] ** x[0] + 2 ** x[2] + (x[2] - x[0]) ** 3
+        gradient, product = ad.hvp(f, point, v)
+        hyperdual = ad.hessian._evaluate(f, point)
+        assert(np.allclose(gradient, hyperdual.getGradient()))
+        assert(np.allclose(product, hyperdual.getHessian() @ v))
+
+    #inputs the function does not depend on have zero gradient and Hessian rows
+    gradient, product = ad.hvp(lambda x: x[0] ** 2, [3, 1], [1, 1])
+    assert(np.array_equal(gradient, [6, 0]) and np.array_equal(product, [2, 0]))
+    assert(np.allclose(ad.hvp(ad.compile(lambda x: x[0] ** 2 * x[1], 2), [3, 1], [1, 1])[1], [8, 6]))
+
+
+def test_hvp_operator():
+    #Newton step for a tridiagonal problem with n = 500, solved by cg without storing the Hessian
+    from scipy.sparse.linalg import cg
+    n = 500
+    f = lambda x: ad.exp(x).sum() + ((x[1:] - x[:-1]) ** 2).sum()
+    x = np.linspace(-1, 1, n)
+    H = ad.hvp_operator(f, x)
+    assert(H.shape == (n, n))
+    v = np.random.RandomState(0).rand(n)
+    dense = np.diag(np.exp(x)) + 2 * (np.diag(np.r_[1, 2 * np.ones(n - 2), 1]) - np.eye(n, k=1) - np.eye(n, k=-1))
+    assert(np.allclose(H @ v, dense @ v))
+    assert(np.allclose(H.T @ v, dense @ v))
+    gradient = ad.hvp(f, x, v)[0]
+    step, info = cg(H, -gradient, atol=1e-10)
+    assert(info == 0)
+    assert(np.linalg.norm(dense @ step + gradient) < 1e-4 * np.linalg.norm(gradient))
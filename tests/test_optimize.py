@@ -4,6 +4,7 @@ import numpy as np
 import pytest
 
 sys.path.append('..')
+import autodiff as ad
 import autodiff.optimize as optimize
 
 
@@ -118,4 +119,465 @@ def test_find_minimum():
         optimize.newtons_method(test_func6, [5,5,5], method="gkkk", max_iter= 1000)
 
     with pytest.raises(Exception):
-        optimize.quasi_newtons_method(rosenbrock, [2, 3], method='gfdgh')
\ No newline at end of file
+        optimize.quasi_newtons_method(rosenbrock, [2, 3], method='gfdgh')
+
+def test_gmres_action_block():
+    def f(x):
+        return np.array([x[0] ** 2 - x[1], x[0] * x[1] * x[2], ad.sin(x[2])])
+    x = np.array([1.0, 2.0, 0.5])
+    jacobian = ad.get_jacobian(f(ad.create_vector('x', x)), ['x1', 'x2', 'x3'])
+    #the operator evaluates f once for a whole block of directions
+    L = optimize._jacobian_action(f, x, 3)
+    S = np.random.RandomState(0).rand(3, 2)
+    assert(np.allclose(L @ S, jacobian @ S))
+    assert(np.allclose(L @ S[:, 0], jacobian @ S[:, 0]))
+
+
+def test_jacobian_reuse():
+    builds = []
+    def bratu(u):
+        if isinstance(u[0], ad.Scalar): #evaluated with derivatives
+            builds.append(1)
+        h = 1.0 / (len(u) + 1)
+        r = 2 * u - 3 * h * h * ad.exp(u)
+        r[1:] = r[1:] - u[:-1]
+        r[:-1] = r[:-1] - u[1:]
+        return r
+    newton = optimize.newtons_method(bratu, np.zeros(100), method='exact')[0]
+    newton_builds = len(builds)
+    for method in ['exact', 'sparse']:
+        del builds[:]
+        x, iterations = optimize.newtons_method(bratu, np.zeros(100), method=method, jacobian_reuse=10)
+        assert(np.allclose(x, newton))
+        assert(len(builds) < newton_builds and len(builds) < iterations)
+    #a stalled residual triggers a new Jacobian before 'jacobian_reuse' iterations
+    def cubic(x):
+        if isinstance(x[0], ad.Scalar):
+            builds.append(1)
+        return np.array([x[0] ** 3 - 8])
+    del builds[:]
+    assert(np.allclose(optimize.newtons_method(cubic, [10], jacobian_reuse=1000)[0], [2]))
+    assert(len(builds) > 1)
+    compiled = ad.compile(lambda x: [x[0] ** 2 - 2, x[0] * x[1] - 1], 2)
+    assert(np.allclose(optimize.newtons_method(compiled, [1, 1], jacobian_reuse=3)[0], [np.sqrt(2), 1 / np.sqrt(2)]))
+
+    with pytest.raises(Exception):
+        optimize.newtons_method(bratu, np.zeros(10), method='gmres', jacobian_reuse=2)
+    with pytest.raises(Exception):
+        optimize.newtons_method(bratu, np.zeros(10), method='chord')
+
+
+def test_broyden():
+    jacobians = []
+    def system(x):
+        if isinstance(x[0], ad.Scalar):
+            jacobians.append(1)
+        return np.array([x[0] ** 2 + x[1] ** 2 - 4, ad.exp(x[0]) + x[1] - 1, x[2] ** 3 - x[0]])
+    root = optimize.newtons_method(system, [1, -1.5, 1])[0]
+    for method in ['broyden', 'bad_broyden']:
+        for memory in [None, 2]:
+            del jacobians[:]
+            x, iterations = optimize.newtons_method(system, [1, -1.5, 1], method=method, broyden_memory=memory)
+            assert(np.allclose(x, root))
+            #the Jacobian is only computed at the initial guess
+            assert(len(jacobians) == 1 and iterations > 2)
+    compiled = ad.compile(system, 3)
+    assert(np.allclose(optimize.newtons_method(compiled, [1, -1.5, 1], method='broyden')[0], root))
+
+    #sparse Jacobians are factorized with splu
+    solve, solve_transposed = optimize._factorize(optimize.sp.diags([1.0, 2, 4] * 10))
+    assert(np.allclose(solve(np.ones(30)), [1, 0.5, 0.25] * 10))
+    assert(np.allclose(solve_transposed(np.ones(30)), [1, 0.5, 0.25] * 10))
+
+    with pytest.raises(RuntimeError):
+        optimize.newtons_method(lambda x: [x[0] ** 2 + 1], [1], method='broyden', max_iter=20)
+
+
+def test_inexact_newton():
+    n = 30
+    d = np.logspace(0, 3, n)
+    def f(u):
+        r = d * u + u ** 3 - 1 + 0.3 * ad.sin(u)
+        r[1:] = r[1:] - 0.4 * d[1:] * u[:-1]
+        r[:-1] = r[:-1] - 0.4 * d[:-1] * u[1:]
+        return r
+    root = optimize.newtons_method(f, np.zeros(n))[0]
+    counts = {}
+    for forcing, preconditioner in [(None, None), ('eisenstat_walker', None), ('eisenstat_walker', 'jacobi'), ('eisenstat_walker', 'ilu')]:
+        stats = {}
+        x, _ = optimize.newtons_method(f, np.zeros(n), method='gmres_action', forcing=forcing, preconditioner=preconditioner, stats=stats)
+        assert(np.allclose(x, root))
+        counts[forcing, preconditioner] = stats['gmres_iterations']
+    #loose early solves and preconditioning each cut the number of gmres iterations
+    assert(counts['eisenstat_walker', None] < counts[None, None])
+    assert(counts['eisenstat_walker', 'jacobi'] < counts['eisenstat_walker', None] / 2)
+    assert(counts['eisenstat_walker', 'ilu'] < counts['eisenstat_walker', 'jacobi'])
+
+    #any function returning a LinearOperator can precondition, and zero diagonal entries are left unscaled
+    exact = lambda f, x: optimize.LinearOperator((n, n), matvec=lambda r: np.linalg.solve(ad.get_jacobian(
+        f(ad.create_vector('x', x)), ['x{}'.format(i) for i in range(1, n + 1)]), r))
+    stats = {}
+    assert(np.allclose(optimize.newtons_method(f, np.zeros(n), method='gmres_action', preconditioner=exact, stats=stats)[0], root))
+    assert(stats['gmres_iterations'] < 20)
+    assert(np.array_equal(optimize._jacobian_diagonal(lambda x: [x[1], x[1] * 2], [1, 1]), [0, 2]))
+    #residuals that do not depend on x have zero rows
+    assert(np.array_equal(optimize._jacobian_diagonal(lambda x: [x[0] * 3, 4.0, x[2] ** 2], [1, 1, 2]), [3, 0, 4]))
+    g = lambda x: [x[1] + x[0] ** 3, x[0] - 1]
+    assert(np.allclose(optimize.newtons_method(g, [2, 2], method='gmres_action', preconditioner='jacobi')[0], [1, -1]))
+    compiled = ad.compile(lambda x: [x[0] ** 2 - 2 * x[1], x[1] ** 3 - 1], 2)
+    assert(np.allclose(optimize.newtons_method(compiled, [3, 3], method='gmres_action', forcing='eisenstat_walker',
+                                               preconditioner='jacobi')[0], [np.sqrt(2), 1]))
+
+
+def test_limited_memory_bfgs():
+    def rosenbrock(args, a = 2, b = 3):
+        return (a - args[0]) ** 2 + b * (args[1] - args[0] ** 2) ** 2
+    assert(np.allclose(optimize.quasi_newtons_method(rosenbrock, [1, 1], method='L-BFGS')[0], [2, 4]))
+    assert(np.allclose(optimize.quasi_newtons_method(ad.compile(rosenbrock, 2), [2, 3], method='L-BFGS', history=1)[0], [2, 4]))
+
+    #the chained Rosenbrock function, with the gradient computed on a DualArray
+    chain = lambda x: (100 * (x[1:] - x[:-1] ** 2) ** 2 + (1 - x[:-1]) ** 2).sum()
+    x0 = np.full(20, -1.0)
+    x0[::2] = 1.2
+    x, iterations = optimize.quasi_newtons_method(chain, x0, method='L-BFGS', mode='array', tol=1e-6)
+    assert(np.allclose(x, 1))
+    assert(np.allclose(x, optimize.quasi_newtons_method(chain, x0, method='BFGS', mode='array', tol=1e-6)[0]))
+
+    #the two-loop recursion applies the BFGS estimate built from the stored pairs with the same initial scaling
+    rng = np.random.RandomState(0)
+    pairs = []
+    for _ in range(4):
+        s = rng.rand(5)
+        y = s + 0.1 * rng.rand(5)
+        pairs.append((s, y, 1 / (y @ s)))
+    s, y, rho = pairs[-1]
+    H = np.identity(5) / (rho * (y @ y))
+    for s, y, rho in pairs:
+        V = np.identity(5) - rho * np.outer(y, s)
+        H = V.T @ H @ V + rho * np.outer(s, s)
+    g = rng.rand(5)
+    assert(np.allclose(optimize._two_loop(g, pairs), H @ g))
+    assert(np.array_equal(optimize._two_loop(g, []), g))
+
+
+def test_inverse_hessian_update():
+    rng = np.random.RandomState(1)
+    A = rng.rand(6, 6)
+    A = A @ A.T + np.identity(6)
+    s = rng.rand(6)
+    y = A @ s
+    H = rng.rand(6, 6)
+    H = H @ H.T + np.identity(6)
+    I, S, Y = np.identity(6), s.reshape(-1, 1), y.reshape(-1, 1)
+    expected = {'BFGS': (I - S @ Y.T / (Y.T @ S)) @ H @ (I - Y @ S.T / (Y.T @ S)) + S @ S.T / (Y.T @ S),
+                'DFP': H + S @ S.T / (S.T @ Y) - H @ Y @ Y.T @ H / (Y.T @ H @ Y),
+                'Broyden': H + (S - H @ Y) @ S.T @ H / (S.T @ H @ Y)}
+    for method, updated in expected.items():
+        G = np.asfortranarray(H)
+        assert(optimize._update_inverse_hessian(G, s, y, method))
+        #the symmetric estimates are kept in the upper triangle
+        G = np.triu(G) + np.triu(G, 1).T if method != 'Broyden' else G
+        assert(np.allclose(G, updated))
+        assert(np.allclose(optimize._inverse_hessian_product(np.asfortranarray(updated), s, method), updated @ s))
+
+    #steps without curvature leave the estimate unchanged instead of filling it with nan
+    for method in ['BFGS', 'DFP', 'Broyden']:
+        G = np.asfortranarray(np.identity(2))
+        assert(not optimize._update_inverse_hessian(G, np.array([1.0, 0]), np.array([0, 1.0]), method))
+        assert(np.array_equal(G, np.identity(2)))
+
+
+def test_evaluation_cache():
+    calls = []
+    def f(x):
+        calls.append(isinstance(x[0], ad.Scalar))
+        return (x[0] - 1) ** 2 + 4 * (x[1] + x[0]) ** 2
+
+    cache = optimize.EvaluationCache(f, maxsize=2)
+    value, gradient = cache.value_and_gradient([0, 0])
+    assert(value == 1 and np.array_equal(gradient, [-2, 0]))
+    assert(cache.value(np.zeros(2)) == 1 and cache.value_and_gradient(np.zeros(2))[0] == 1)
+    #a value-only entry does not answer a gradient lookup
+    cache.value([1, 1])
+    cache.value_and_gradient([1, 1])
+    assert((cache.hits, cache.misses, cache.evaluations) == (2, 3, 3) and len(calls) == 3)
+    #the least recently used point is evicted
+    cache.value([2, 2])
+    assert(len(cache) == 2)
+    cache.value([0, 0])
+    assert(cache.evaluations == 5)
+
+    #the gradient at the current point is computed once per iteration, although the line search needs it again
+    for method in ['BFGS', 'L-BFGS', 'Newton']:
+        calls.clear()
+        stats = {}
+        x, iterations = optimize.quasi_newtons_method(f, [3, 3], method=method, stats=stats)
+        assert(np.allclose(x, [1, -1]))
+        assert(stats['evaluations'] == len(calls) or method == 'Newton') #Newton also evaluates f on HyperDuals
+        assert(stats['cache_hits'] >= iterations - 1 and stats['cache_misses'] == stats['evaluations'])
+    stats = {}
+    x, iterations = optimize.gradient_descent(f, [3, 3], stats=stats)
+    assert(np.allclose(x, [1, -1]) and stats['evaluations'] + stats['cache_hits'] == iterations)
+
+    #a cache shared between calls answers the evaluations the second call repeats
+    cache = optimize.EvaluationCache(ad.compile(f, 2), maxsize=100)
+    first = optimize.quasi_newtons_method(cache, [3, 3])
+    evaluations = cache.evaluations
+    assert(np.array_equal(optimize.quasi_newtons_method(cache, [3, 3])[0], first[0]))
+    assert(cache.evaluations == evaluations)
+    assert(optimize.line_search(cache, first[0], np.zeros(2)) == 1)
+
+
+def test_value_only_evaluation():
+    inputs = []
+    def f(x):
+        inputs.append(type(x[0]))
+        return (x[0] - 1) ** 2 + ad.exp(x[1]) - x[1]
+    #trial points of the line search are evaluated on plain floats
+    assert(optimize.line_search(f, [3, 1], np.array([-2.0, -1.0])) == 1)
+    assert(inputs == [ad.Scalar, np.float64])
+    assert(np.isclose(optimize._value(f, [1, 0]), 1.0))
+    x, _ = optimize.quasi_newtons_method(f, [3, 1], mode='array')
+    assert(np.allclose(x, [1, 0]) and np.float64 in inputs)
+
+    #functions written for Scalars only are still evaluated on Scalars
+    g = lambda x: x[0] ** 2 + 0 * x[1].getValue()
+    assert(optimize._value(g, [3, 1]) == 9)
+
+    #a trial point outside the domain of 'f' has a nan value, which is not a decrease
+    h = lambda x: x[0] ** 2 - ad.ln(x[0])
+    assert(np.isclose(optimize.line_search(h, [1.0], np.array([-5.0])), 0.1))
+    with np.errstate(invalid='ignore'):
+        assert(optimize.line_search(lambda x: ad.ln(x[0]), [-1.0], np.array([1.0])) == 0)
+
+
+def test_wolfe_line_search():
+    def rosenbrock(args, a = 2, b = 3):
+        return (a - args[0]) ** 2 + b * (args[1] - args[0] ** 2) ** 2
+    names = ['x1', 'x2']
+    gradient = lambda x: rosenbrock(ad.create_vector('x', x)).getGradient(names)
+    for x in [[1, 1], [0, 3], [-1.5, 2]]:
+        p = -gradient(x)
+        for c2 in [0.9, 0.1]:
+            alpha = optimize.wolfe_line_search(rosenbrock, x, p, c2=c2)
+            assert(rosenbrock(x + alpha * p) <= rosenbrock(np.array(x, dtype=float)) + 1e-4 * alpha * gradient(x) @ p)
+            assert(abs(gradient(x + alpha * p) @ p) <= c2 * abs(gradient(x) @ p))
+
+    #the zoom steps interpolate the values and slopes at the ends of the bracket
+    assert(np.isclose(optimize._interpolate(0, 0, -3, 2, 2, 9), 1))
+    assert(np.isclose(optimize._interpolate(0, 1, -2, 2, 1, np.nan), 1))
+    assert(optimize._interpolate(0, 0, -1, 1, np.nan, np.nan) == 0.5)
+    assert(optimize._interpolate(1, 0, -1, 0, np.inf, 1) == 0.5)
+
+    #without a step satisfying the conditions, the best step found is returned
+    assert(optimize.wolfe_line_search(lambda x: -x[0], [0], np.array([1.0]), max_iter=5) == 16)
+    assert(optimize.wolfe_line_search(lambda x: x[0] ** 2, [1], np.array([1.0])) == 0)
+    assert(optimize.wolfe_line_search(lambda x: ad.cos(x[0]), [0.1], np.array([1.0]), c2=1e-12, max_iter=3) > 0)
+    with np.errstate(invalid='ignore'):
+        assert(optimize.wolfe_line_search(lambda x: x[0] ** 2 - ad.ln(x[0]), [1], np.array([-5.0]), c2=0.1) > 0)
+
+    #the Wolfe steps need fewer evaluations of f on the problems of test_find_minimum
+    problems = [(lambda a: 2 * (a[0] ** 2) + 3 * (a[1] ** 2), [[2, 100], [100, 2], [-100, 100], [0.4242, -0.54234]]),
+                (lambda a: (a[0] - 5) ** 2, [[1], [-0.534], [20]]), (rosenbrock, [[1, 1], [2, 3]])]
+    for method in ['BFGS', 'DFP', 'L-BFGS', 'Newton']:
+        evaluations = {}
+        for search in ['backtracking', 'wolfe']:
+            evaluations[search] = 0
+            for f, starts in problems:
+                for x0 in starts:
+                    stats = {}
+                    x, _ = optimize.quasi_newtons_method(f, x0, method=method, search=search, stats=stats)
+                    assert(np.isclose(f(x), f(np.array([2, 4])) if f is rosenbrock else 0))
+                    evaluations[search] += stats['evaluations']
+        assert(evaluations['wolfe'] < evaluations['backtracking'])
+
+    f = problems[0][0]
+    for search in ['backtracking', 'wolfe']:
+        x, iterations = optimize.gradient_descent(f, [2, 100], step_size=1, search=search)
+        assert(np.allclose(x, 0) and iterations < 200)
+    #the iteration stops once the steps no longer change x
+    assert(optimize.gradient_descent(problems[1][0], [1], step_size=1, search='backtracking', max_iter=10**4)[1] < 10**4)
+    with pytest.raises(Exception):
+        optimize.gradient_descent(f, [1, 1], search='exact')
+    with pytest.raises(Exception):
+        optimize.quasi_newtons_method(f, [1, 1], search='exact')
+
+
+def test_trust_region_newton_cg():
+    def rosenbrock(args, a = 2, b = 3):
+        return (a - args[0]) ** 2 + b * (args[1] - args[0] ** 2) ** 2
+    for x0 in [[1, 1], [2, 3], [-1, 2]]:
+        x, iterations = optimize.trust_region_newton_cg(rosenbrock, x0)
+        assert(np.allclose(x, [2, 4]) and iterations < 50)
+    assert(np.allclose(optimize.trust_region_newton_cg(ad.compile(rosenbrock, 2), [1, 1])[0], [2, 4]))
+
+    #a badly scaled problem takes tens of iterations, where gradient descent takes thousands
+    n = 20
+    d = np.logspace(0, 3, n)
+    f = lambda x: (d * x ** 2).sum() / 2 + ad.exp(x - 1).sum() + ((x[1:] - x[:-1]) ** 2).sum()
+    stats = {}
+    x, iterations = optimize.trust_region_newton_cg(f, np.ones(n), mode='array', tol=1e-6, stats=stats)
+    assert(iterations < 50 and stats['hessian_products'] > iterations)
+    assert(stats['evaluations'] <= 2 * iterations and stats['cache_misses'] == stats['evaluations'])
+    assert(np.allclose(x, optimize.quasi_newtons_method(f, np.ones(n), mode='array', tol=1e-6)[0], atol=1e-8))
+    assert(optimize.gradient_descent(f, np.ones(n), step_size=1e-3, mode='array', tol=1e-6, max_iter=1000)[1] == 1000)
+
+    #directions of negative curvature go to the boundary of the trust region
+    saddle = lambda x: x[0] ** 2 - x[1] ** 2 + x[1] ** 4
+    x, _ = optimize.trust_region_newton_cg(saddle, [1, 0.1])
+    assert(np.allclose(x, [0, np.sqrt(0.5)]))
+    p, Bp = optimize._steihaug(lambda v: np.array([2, -2]) * v, np.array([0.0, 1.0]), 0.5, 1e-8)
+    assert(np.allclose(p, [0, -0.5]) and np.allclose(Bp, [0, 1]))
+    #a step leaving the domain of 'f' shrinks the trust region
+    with np.errstate(invalid='ignore'):
+        assert(np.isclose(optimize.trust_region_newton_cg(lambda x: x[0] - 2 * ad.ln(x[0]), [0.1], radius=10)[0][0], 2))
+
+
+def test_least_squares():
+    #three Gaussian peaks fitted to noisy data
+    t = np.linspace(0, 10, 400)
+    model = lambda x, t: sum(x[3 * k] * ad.exp(-(t - x[3 * k + 1]) ** 2 / (2 * x[3 * k + 2] ** 2)) for k in range(3))
+    y = model(np.array([3, 2, 0.6, 2, 5, 0.8, 1.5, 7.5, 0.5]), t) + 0.02 * np.random.RandomState(0).randn(len(t))
+    residuals = lambda x: model(x, t) - y
+    x0 = [2.5, 2.3, 0.8, 2.5, 4.6, 1.0, 1, 7.8, 0.7]
+    stats = {}
+    x, iterations = optimize.least_squares(residuals, x0, mode='array', stats=stats)
+    assert(np.allclose(x, [3, 2, 0.6, 2, 5, 0.8, 1.5, 7.5, 0.5], atol=0.05))
+    assert(stats['jacobian_evaluations'] <= iterations and stats['residual_evaluations'] <= iterations)
+    assert(np.allclose(optimize.least_squares(residuals, x0, mode='array', solver='cholesky')[0], x))
+    #the fit takes several times fewer iterations than BFGS on the sum of squares
+    sum_of_squares = lambda x: (residuals(x) ** 2).sum() / 2
+    minimum, bfgs_iterations = optimize.quasi_newtons_method(sum_of_squares, x0, mode='array', tol=1e-6)
+    assert(np.allclose(minimum, x, atol=1e-6) and 2 * iterations < bfgs_iterations)
+
+    #the Rosenbrock function as two residuals, with steps rejected while the damping adapts
+    rosenbrock = lambda x: [10 * (x[1] - x[0] ** 2), 1 - x[0]]
+    for solver in ['qr', 'cholesky']:
+        assert(np.allclose(optimize.least_squares(rosenbrock, [-1.2, 1], solver=solver)[0], [1, 1]))
+    assert(np.allclose(optimize.least_squares(ad.compile(rosenbrock, 2), [-1.2, 1])[0], [1, 1]))
+    #a residual outside the domain of the function is a rejected step
+    with np.errstate(invalid='ignore'):
+        assert(np.allclose(optimize.least_squares(lambda x: [ad.sqrt(x[0]) - 0.1], [4])[0], [0.01]))
+
+    #a sparse Jacobian: an overdetermined banded problem with 300 variables
+    n = 300
+    def banded(x):
+        r = x - 1 + 0.1 * x ** 3
+        r[1:] = r[1:] + 0.2 * x[:-1] ** 2
+        return np.concatenate([r, x[1:] - x[:-1]])
+    stats = {}
+    x, _ = optimize.least_squares(banded, np.zeros(n), jacobian='sparse', stats=stats)
+    assert(np.allclose(x, optimize.least_squares(banded, np.zeros(n))[0]))
+    assert(stats['jacobian_evaluations'] < 10)
+
+    with pytest.raises(Exception):
+        optimize.least_squares(rosenbrock, [0, 0], solver='svd')
+    with pytest.raises(Exception):
+        optimize.least_squares(rosenbrock, [0, 0], jacobian='banded')
+
+
+def test_batch():
+    def rosenbrock(x, a):
+        return (a[0] - x[0]) ** 2 + 3 * (x[1] - x[0] ** 2) ** 2
+    starts = np.random.RandomState(0).uniform(-2, 2, (20, 2))
+    data = np.linspace(0.5, 2, 20)[:, None]
+    stats = {}
+    x, iterations = optimize.batch_quasi_newtons_method(rosenbrock, starts, args=(data,), stats=stats)
+    assert(stats['evaluations'] == iterations.max() + 1)
+    #every member follows the same path as when solved on its own
+    for b in range(20):
+        single = optimize.quasi_newtons_method(lambda x: rosenbrock(x, data[b]), starts[b])
+        assert(np.allclose(x[b], single[0]) and iterations[b] == single[1])
+    assert(np.allclose(x[stats['converged']], np.c_[data, data ** 2][stats['converged']]))
+
+    def system(x):
+        return np.array([x[0] ** 2 + x[1] - 3, x[0] - x[1] ** 3 + 7])
+    x, iterations = optimize.batch_newtons_method(system, [[1, 2], [1.5, 2], [0, 0]], stats=stats)
+    assert(np.allclose(x[0], optimize.newtons_method(system, [1, 2])[0]) and iterations[1] <= iterations[2])
+    assert(stats['converged'].all())
+    #singular Jacobians take least squares steps, and members without a root run out of iterations
+    x, iterations = optimize.batch_newtons_method(lambda x: [x[0] ** 2 + 1, 1.0], [[1, 0], [2, 0]], max_iter=1,
+                                                  stats=stats)
+    assert(np.allclose(x, [[0, 0], [0.75, 0]]) and not stats['converged'].any() and (iterations == 1).all())
+
+
+def double_well(x):
+    return (x[0] ** 2 - 1) ** 2 + (x[1] ** 2 - 1) ** 2 + 0.3 * x[0] + 0.1 * x[1]
+
+
+def test_multistart():
+    starts = np.random.RandomState(0).uniform(-2, 2, (8, 2))
+    x, value, results = optimize.multistart(double_well, starts, workers=2, method=optimize.quasi_newtons_method,
+                                            search='wolfe')
+    for start, result in zip(starts, results):
+        single = optimize.quasi_newtons_method(double_well, start, search='wolfe')
+        assert(np.allclose(result['x'], single[0]) and result['iterations'] == single[1] and result['evaluations'] > 0)
+    assert(value == min(result['value'] for result in results) and np.all(x < 0))
+
+    #the starts stop once the target is reached or the callback asks to
+    finished = []
+    x, value, results = optimize.multistart(double_well, starts, workers=1, target=value + 1e-9,
+                                            callback=lambda index, result: finished.append(index))
+    assert(finished == list(range(len(finished))) and len(finished) < len(starts) and results[-1] is None)
+    x, value, results = optimize.multistart(double_well, starts, workers=2, callback=lambda index, result: True,
+                                            method=optimize.gradient_descent, step_size=0.1)
+    assert(sum(result is not None for result in results) == 1)
+    with pytest.raises(Exception):
+        optimize.multistart(double_well, [])
+
+
+def test_ask_tell():
+    import asyncio
+    rosenbrock = lambda x: (1 - x[0]) ** 2 + 10 * (x[1] - x[0] ** 2) ** 2
+    def evaluate(x, gradient):
+        if gradient:
+            value = rosenbrock(ad.create_vector('x', x))
+            return value.getValue(), value.getGradient(['x1', 'x2'])
+        return rosenbrock(x)
+
+    #the ask/tell optimizers take the same steps as the ones evaluating 'f' themselves, whatever the number of trials
+    for method in ['BFGS', 'DFP', 'Broyden', 'L-BFGS']:
+        expected = optimize.quasi_newtons_method(rosenbrock, [-1, 2], method=method)
+        for trials in [1, 3]:
+            optimizer = optimize.ask_tell_quasi_newtons_method([-1, 2], method=method, trials=trials)
+            while not optimizer.done:
+                optimizer.tell([evaluate(x, gradient) for x, gradient in optimizer.ask()])
+            assert(np.array_equal(optimizer.result[0], expected[0]) and optimizer.result[1] == expected[1])
+        assert(optimizer.ask() == [] and optimizer.rounds < optimizer.evaluations)
+    for search in [None, 'backtracking']:
+        expected = optimize.gradient_descent(rosenbrock, [0, 0], step_size=0.02, max_iter=500, search=search)
+        optimizer = optimize.ask_tell_gradient_descent([0, 0], step_size=0.02, max_iter=500, search=search, trials=2)
+        while not optimizer.done:
+            optimizer.tell([evaluate(x, gradient) for x, gradient in optimizer.ask()])
+        assert(np.array_equal(optimizer.result[0], expected[0]) and optimizer.result[1] == expected[1])
+    #both stop once the line search cannot improve on x
+    for optimizer in [optimize.ask_tell_gradient_descent([-1, 2], step_size=1, tol=0, search='backtracking'),
+                      optimize.ask_tell_quasi_newtons_method([-1, 2], tol=0)]:
+        while not optimizer.done:
+            optimizer.tell([evaluate(x, gradient) for x, gradient in optimizer.ask()])
+        assert(optimizer.result[1] < 10000)
+    search = optimize.ask_tell_line_search([0, 0], np.array([1.0, 0]), alpha=0, trials=2)
+    search.tell([evaluate(x, gradient) for x, gradient in search.ask()])
+    assert(search.done and search.result == 0)
+
+    #evaluations in flight at once are bounded by the concurrency
+    in_flight, most = [0], [0]
+    async def evaluate_async(x, gradient):
+        in_flight[0] += 1
+        most[0] = max(most[0], in_flight[0])
+        await asyncio.sleep(0)
+        in_flight[0] -= 1
+        return evaluate(x, gradient)
+    for concurrency in [None, 2]:
+        most[0] = 0
+        optimizer = optimize.ask_tell_quasi_newtons_method([-1, 2], trials=4)
+        x, iterations = optimize._asyncio_run(optimize.run_async(optimizer, evaluate_async, concurrency))
+        assert(np.array_equal(x, optimize.quasi_newtons_method(rosenbrock, [-1, 2])[0]))
+        assert(most[0] == (concurrency or 4))
+
+    with pytest.raises(Exception):
+        optimize.ask_tell_quasi_newtons_method([0, 0], method='Newton')
+    with pytest.raises(Exception):
+        optimize.ask_tell_gradient_descent([0, 0], search='wolfe')
+    with pytest.raises(Exception):
+        optimize.ask_tell_gradient_descent([0, 0]).tell([])
@@ -0,0 +1,31 @@
+import sys
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+
+sys.path.append('..')
+import autodiff as ad
+
+
+def coupled(x):
+    return np.array([x[i] * x[(i + 1) % len(x)] + ad.sin(x[i]) * x.sum() for i in range(len(x))] + [5.0])
+
+
+def test_parallel_jacobian():
+    pytest.importorskip('multiprocessing.shared_memory')
+    x = np.linspace(0.1, 1, 12)
+    names = ['x{}'.format(i) for i in range(1, len(x) + 1)]
+    #the constant last output has a zero row
+    dense = np.vstack([ad.get_jacobian(coupled(ad.create_vector('x', x))[:-1], names), np.zeros(len(x))])
+    assert(np.allclose(ad.get_parallel_jacobian(coupled, x, workers=2), dense))
+    assert(np.allclose(ad.get_parallel_jacobian(coupled, x, workers=1, blocks=5), dense))
+    #more blocks than variables, and whole-array evaluation on DualArrays
+    assert(np.allclose(ad.get_parallel_jacobian(lambda x: x * ad.exp(x), x[:3], workers=1, blocks=8, mode='array'),
+                       np.diag((1 + x[:3]) * np.exp(x[:3]))))
+
+    #a pool reused across calls, and errors of the workers reach the caller
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assert(np.allclose(ad.get_parallel_jacobian(coupled, x, blocks=3, executor=executor), dense))
+        with pytest.raises(Exception):
+            ad.get_parallel_jacobian(coupled, x, blocks=3, mode='reverse', executor=executor)
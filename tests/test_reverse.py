@@ -0,0 +1,128 @@
+import sys
+import os
+import numpy as np
+import pytest
+
+sys.path.append('..')
+import autodiff as ad
+import autodiff.optimize as optimize
+
+
+def test_arithmetic():
+    tape = ad.Tape()
+    x = ad.ReverseScalar('x', 2, tape=tape)
+    y = ad.ReverseScalar('y', 5, tape=tape)
+    z = 3 * x + y * x - 1
+    assert(z.getValue() == 15)
+    assert(np.array_equal(z.getGradient(['x', 'y', 'unknown']), [8, 2, 0]))
+    assert(z.getDeriv() == {'x': 8.0, 'y': 2.0})
+
+    z = x / y
+    assert(np.isclose(z.getValue(), 0.4))
+    assert(np.allclose(z.getGradient(['x', 'y']), [0.2, -2 / 25]))
+
+    z = 1 - x - y
+    assert(z.getValue() == -6)
+    assert(np.array_equal(z.getGradient(['x', 'y']), [-1, -1]))
+
+    z = 10 / x
+    assert(z.getValue() == 5)
+    assert(np.array_equal(z.getGradient(['x']), [-2.5]))
+
+    z = x ** y
+    assert(z.getValue() == 32)
+    assert(np.allclose(z.getGradient(['x', 'y']), [5 * 16, 32 * np.log(2)]))
+
+    z = x ** x
+    assert(np.allclose(z.getGradient(['x']), [4 * (np.log(2) + 1)]))
+
+    z = 2 ** x
+    assert(np.allclose(z.getGradient(['x']), [4 * np.log(2)]))
+
+    z = x ** 0
+    assert(z.getValue() == 1)
+    assert(np.array_equal(z.getGradient(['x']), [0]))
+
+    zero = ad.ReverseScalar('zero', 0, tape=tape)
+    assert(np.array_equal((zero ** (zero * 1)).getGradient(['zero']), [0]))
+    assert(np.array_equal((zero ** 0).getGradient(['zero']), [0]))
+    assert(np.array_equal((0 ** (zero + 1)).getGradient(['zero']), [0]))
+    #the partial with respect to the exponent is 0 for a zero base and nan for a negative one, without warnings
+    with np.errstate(divide='raise', invalid='raise'):
+        two = ad.ReverseScalar('two', 2, tape=tape)
+        assert(np.array_equal((zero ** two).getGradient(['zero', 'two']), [0, 0]))
+        z = (zero - 2) ** two
+        assert(z.getValue() == 4 and z.getGradient(['zero'])[0] == -4 and np.isnan(z.getGradient(['two'])[0]))
+        assert(np.isnan(((-2) ** two).getGradient(['two'])[0]))
+    with pytest.raises(ZeroDivisionError):
+        0 ** zero
+
+    with pytest.raises(ValueError):
+        ad.ReverseScalar('x', -2) ** 0.5
+    with pytest.raises(ValueError):
+        (x - 4) ** (y * 0.1)
+
+    with pytest.raises(Exception):
+        x + ad.ReverseScalar('w', 1)
+
+    x = ad.ReverseScalar('x', 2, 3)
+    z = x * x
+    assert(np.array_equal(z.getGradient(['x']), [12]))
+    x += 1
+    assert(x.getValue() == 3)
+    assert(x == ad.ReverseScalar('x', 3, 3) * 1)
+    assert(x != 3)
+    assert(str(x) == "Value: 3.0, Derivatives: {'x': 3.0}")
+    assert(repr(x) == "ReverseScalar(3.0)")
+
+
+def test_repeated_variable():
+    tape = ad.Tape()
+    x1 = ad.ReverseScalar('x', 2, tape=tape)
+    x2 = ad.ReverseScalar('x', 2, tape=tape)
+    z = x1 * x2
+    assert(np.array_equal(z.getGradient(['x']), [4]))
+    #variables recorded after the output do not contribute to it
+    y = ad.ReverseScalar('y', 1, tape=tape)
+    assert(z.getDeriv() == {'x': 4.0})
+    assert(len(tape) == 4)
+
+
+def test_functions():
+    for function in [ad.sin, ad.cos, ad.tan, ad.exp, ad.sqrt, ad.arcsin, ad.arccos,
+                     ad.arctan, ad.sinh, ad.cosh, ad.tanh, ad.logistic, ad.ln]:
+        tape = ad.Tape()
+        reverse = function(ad.ReverseScalar('x', 0.25, tape=tape) * ad.ReverseScalar('y', 2, tape=tape))
+        forward = function(ad.Scalar('x', 0.25) * ad.Scalar('y', 2))
+        assert(np.isclose(reverse.getValue(), forward.getValue()))
+        assert(np.allclose(reverse.getGradient(['x', 'y']), forward.getGradient(['x', 'y'])))
+
+    x = ad.ReverseScalar('x', 3)
+    z = ad.log(x, 10) + ad.power(x, 2)
+    assert(np.allclose(z.getGradient(['x']), [1 / (3 * np.log(10)) + 6]))
+
+
+def test_vector():
+    v = ad.create_vector('v', [1, 2, 3], mode='reverse')
+    w = np.array([v[0] * v[1], ad.sin(v[2]), v[0] + v[2]])
+    assert(np.allclose(ad.get_value(w), [2, np.sin(3), 4]))
+    jacobian = ad.get_jacobian(w, ['v1', 'v2', 'v3'])
+    assert(np.allclose(jacobian, [[2, 1, 0], [0, 0, np.cos(3)], [1, 0, 1]]))
+
+    v = ad.create_vector('v', [1, 2], [3, 4], mode='reverse')
+    assert(np.array_equal((v[0] * v[1]).getGradient(['v1', 'v2']), [6, 4]))
+
+    x = np.arange(1, 501)
+    v = ad.create_vector('v', x, mode='reverse')
+    total = (v * v).sum()
+    assert(np.array_equal(total.getGradient(['v{}'.format(i) for i in x]), 2 * x))
+
+
+def test_optimizers():
+    def rosenbrock(args, a = 2, b = 3):
+        return (a - args[0]) ** 2 + b * (args[1] - args[0] ** 2) ** 2
+
+    assert(np.isclose(optimize.gradient_descent(rosenbrock, [1, 1], mode='reverse')[0], [2, 4]).all())
+    for method in ['BFGS', 'DFP', 'Broyden']:
+        assert(np.isclose(optimize.quasi_newtons_method(rosenbrock, [1, 1], method=method, mode='reverse')[0], [2, 4]).all())
+        assert(np.isclose(optimize.quasi_newtons_method(rosenbrock, [1, 1], method=method, mode='dense')[0], [2, 4]).all())
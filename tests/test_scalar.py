@@ -168,6 +168,15 @@ def test_pow():
     assert(np.isclose(val.getValue(), 4**2.3) );
     assert(np.isclose(val.getDeriv()['x'], 2.3*(4**1.3)) );
     assert(np.isclose(val.getDeriv()['z'], np.log(4)*4**2.3));
+
+    #base and exponent depending on the same variable through different expressions
+    val = x**(x*3);
+    assert(np.isclose(val.getDeriv()['x'], 4**12 * (3*np.log(4) + 3)) );
+    y = ad.Scalar('y', 1.5);
+    val = (y*2)**y;
+    assert(np.isclose(val.getDeriv()['y'], 3**1.5 * (np.log(3) + 1)) );
+    val = x**x;
+    assert(np.isclose(val.getDeriv()['x'], 4**4 * (np.log(4) + 1)) );
     
 
     x=ad.Scalar('x', 0)
@@ -0,0 +1,91 @@
+import sys
+import os
+import numpy as np
+import scipy.sparse as sp
+import pytest
+
+sys.path.append('..')
+import autodiff as ad
+
+
+def banded(x):
+    r = 3 * x - x ** 2 + ad.sin(x)
+    r[1:] = r[1:] - x[:-1] * x[1:]
+    r[:-1] = r[:-1] - 2 * ad.exp(x[1:])
+    return r
+
+
+def test_pattern():
+    x = np.linspace(0, 1, 6)
+    pattern = ad.sparsity_pattern(banded, x)
+    assert(sp.isspmatrix_csr(pattern))
+    assert(np.array_equal(pattern.toarray(), sp.diags([1, 1, 1], [-1, 0, 1], shape=(6, 6)).toarray() > 0))
+    #outputs that do not depend on the variables have empty rows
+    pattern = ad.sparsity_pattern(lambda x: np.array([x[1] * x[2], 4.0]), [1, 2, 3])
+    assert(np.array_equal(pattern.toarray(), [[False, True, True], [False, False, False]]))
+
+
+def test_coloring():
+    pattern = sp.random(60, 60, density=0.05, random_state=0, format='csr') + sp.identity(60)
+    colors = ad.color_columns(pattern)
+    #no row has two nonzeros in columns of the same color
+    for row in range(60):
+        columns = pattern[row].indices
+        assert(len(set(colors[columns])) == len(columns))
+    assert(colors.max() + 1 < 60)
+    assert(np.array_equal(ad.color_columns(np.identity(4)), [0, 0, 0, 0]))
+
+
+def test_sparse_jacobian():
+    x = np.linspace(0.1, 1, 40)
+    names = ['x{}'.format(i) for i in range(1, len(x) + 1)]
+    dense = ad.get_jacobian(banded(ad.create_vector('x', x)), names)
+    jacobian = ad.get_sparse_jacobian(banded, x)
+    assert(sp.isspmatrix_csr(jacobian))
+    assert(jacobian.nnz == 3 * 40 - 2)
+    assert(np.allclose(jacobian.toarray(), dense))
+
+    #block-sparse Jacobian with 2x2 blocks
+    def blocks(x):
+        return np.array([x[i] * x[i ^ 1] + ad.cos(x[i]) for i in range(len(x))])
+    colors = ad.color_columns(ad.sparsity_pattern(blocks, x))
+    assert(colors.max() + 1 == 2)
+    dense = ad.get_jacobian(blocks(ad.create_vector('x', x)), names)
+    assert(np.allclose(ad.get_sparse_jacobian(blocks, x, colors=colors).toarray(), dense))
+
+    #whole-array evaluation on a DualArray carrying the compressed seeds
+    pattern = sp.identity(len(x), format='csr')
+    jacobian = ad.get_sparse_jacobian(lambda x: x * ad.exp(x), x, pattern, mode='array')
+    assert(np.allclose(jacobian.diagonal(), (1 + x) * np.exp(x)))
+
+
+def test_large():
+    #a tridiagonal Jacobian is computed with three seed directions whatever n is
+    x = np.random.RandomState(0).rand(10 ** 4)
+    pattern = ad.sparsity_pattern(banded, x)
+    colors = ad.color_columns(pattern)
+    assert(colors.max() + 1 == 3)
+    values, jacobian = ad.sparse._sparse_evaluate(banded, x, pattern, colors)
+    assert(np.allclose(values, ad.get_value(banded(ad.create_vector('x', x)))))
+    assert(np.allclose(jacobian.diagonal(), 3 - 2 * x + np.cos(x) - np.r_[0, x[:-1]]))
+    assert(np.allclose(jacobian.diagonal(1), -2 * np.exp(x[1:])))
+    assert(np.allclose(jacobian.diagonal(-1), -x[1:]))
+
+
+def test_newton():
+    import autodiff.optimize as optimize
+    def bratu(u):
+        h = 1.0 / (len(u) + 1)
+        r = 2 * u - h * h * ad.exp(u)
+        r[1:] = r[1:] - u[:-1]
+        r[:-1] = r[:-1] - u[1:]
+        return r
+    x, iterations = optimize.newtons_method(bratu, np.zeros(300), method='sparse')
+    assert(np.allclose(x, optimize.newtons_method(bratu, np.zeros(300), method='exact')[0]))
+    assert(np.abs(ad.get_value(bratu(ad.create_vector('x', x)))).max() < 1e-12)
+    assert(iterations < 10)
+
+    #the sparse factorization also takes the dense Jacobian of a compiled function
+    compiled = ad.compile(bratu, 5)
+    assert(np.allclose(optimize.newtons_method(compiled, np.zeros(5), method='sparse')[0],
+                       optimize.newtons_method(bratu, np.zeros(5), method='sparse')[0]))
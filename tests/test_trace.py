@@ -0,0 +1,158 @@
+import sys
+import os
+import timeit
+import numpy as np
+import pytest
+
+sys.path.append('..')
+import autodiff as ad
+import autodiff.optimize as optimize
+
+
+def rosenbrock(args, a = 2, b = 3):
+    return (a - args[0]) ** 2 + b * (args[1] - args[0] ** 2) ** 2
+
+
+def test_functions():
+    point = [0.3, 0.7]
+    for function in [ad.sin, ad.cos, ad.tan, ad.exp, ad.sqrt, ad.arcsin, ad.arccos,
+                     ad.arctan, ad.sinh, ad.cosh, ad.tanh, ad.logistic, ad.ln]:
+        f = lambda x: function(x[0] * x[1]) / (1 + x[0]) - 2 / x[1] + x[1] ** x[0] + 2 ** x[1] - ad.log(x[0], 10)
+        compiled = ad.compile(f, 2)
+        value, gradient = compiled.evaluate(point)
+        scalar = f(ad.create_vector('x', point))
+        assert(np.isclose(value, scalar.getValue()))
+        assert(np.isclose(compiled(point), scalar.getValue()))
+        assert(np.allclose(gradient, scalar.getGradient(['x1', 'x2'])))
+
+    #functions applied to whole arrays are recorded instead of being evaluated at the trace point
+    compiled = ad.compile(lambda x: ad.exp(x).sum(), 2)
+    assert(np.isclose(compiled([0, 1]), 1 + np.e))
+
+
+def test_outputs():
+    compiled = ad.compile(lambda x: [x[0] * x[1], ad.sin(x[0]), 3], 2)
+    assert(not compiled.scalar_output and compiled.n_outputs == 3)
+    value, jacobian = compiled.evaluate([1, 2])
+    assert(np.allclose(value, [2, np.sin(1), 3]))
+    assert(np.allclose(jacobian, [[2, 1], [np.cos(1), 0], [0, 0]]))
+
+    #inputs that the output does not depend on have zero derivatives
+    compiled = ad.compile(lambda x: x[1] * 2, 3)
+    assert(np.array_equal(compiled.evaluate([1, 2, 3])[1], [0, 2, 0]))
+    assert(compiled([1, 2, 3]) == 4)
+
+    compiled = ad.compile(lambda x: 5, 1)
+    assert(compiled.evaluate([1]) == (5, np.array([0.0])))
+
+    compiled = ad.compile(lambda x: -x[0] * np.inf, 1)
+    assert('inf' in compiled.source)
+
+    #the exponent's domain check records a remainder on the trace
+    compiled = ad.compile(lambda x: (x[0] - 5) ** x[1], 2, trace_point=[1, 2])
+    assert(np.allclose(compiled.evaluate([7, 0.5])[1], [0.5 / np.sqrt(2), np.sqrt(2) * np.log(2)]))
+
+
+
+def test_negative_constants():
+    #negative constants are parenthesized in the kernel, (-2.0) ** x0 is not -(2.0 ** x0)
+    compiled = ad.compile(lambda x: (-2.0) ** x[0] + x[1], 2, trace_point=[2, 1])
+    assert(compiled([2, 1]) == 5.0 and compiled([3, 1]) == -7.0)
+    functions = [lambda x: x[0] ** -2.0 - (-3.0) / x[1],
+                 lambda x: x[0] - -3.0 * x[1] ** 2,
+                 lambda x: -5.0 / x[0] + x[1] / -4.0 - -x[0],
+                 lambda x: (-0.5 - x[0]) ** 2 / (-1.5 + x[1])]
+    for f in functions:
+        compiled = ad.compile(f, 2, trace_point=[1.5, 2.5])
+        expected = f(ad.create_vector('x', [1.5, 2.5]))
+        value, gradient = compiled.evaluate([1.5, 2.5])
+        assert(np.isclose(value, expected.getValue()))
+        assert(np.allclose(gradient, expected.getGradient(['x1', 'x2'])))
+
+def test_instructions():
+    compiled = ad.compile(rosenbrock, 2)
+    assert(len(compiled) == len([op for _, op, _ in compiled.instructions if op not in ('input', 'const')]))
+    assert('Scalar' not in compiled.source)
+    #the value kernel only replays the instructions the value depends on
+    assert(compiled._value_kernel.source.count('\n') < compiled.source.count('\n'))
+
+    #identities do not record nodes
+    graph = ad.trace._Graph()
+    x = graph.input(0, 2.0)
+    assert(x + 0 is x and 0 + x is x and x * 1 is x and 1 * x is x and x ** 1 is x)
+    assert(len(graph._ops) == 1)
+    y = 1 + x
+    assert(graph._ops[-1] == 'add' and y._value == 3)
+    assert(repr(y) == "_Node(2, 3.0)")
+
+
+def test_control_flow():
+    def f(x):
+        value = ad.get_value(x[0])
+        if value > 0 and value >= 0 and not value < 0 and not value <= 0 and value != 0 and not value == 0:
+            return x[0] * x[0]
+        return -x[0]
+    #branches are frozen at the trace point
+    compiled = ad.compile(f, 1)
+    assert(compiled.evaluate([-3]) == (9, np.array([-6.0])))
+    compiled = ad.compile(f, 1, trace_point=[-1])
+    assert(compiled.evaluate([3]) == (-3, np.array([-1.0])))
+    #values converted to floats are constants of the trace
+    assert(ad.compile(lambda x: x[0] + float(ad.get_value(x[0])), 1)([2]) == 3)
+
+    #ufuncs called with extra arguments are not recorded
+    with pytest.raises(TypeError):
+        ad.compile(lambda x: np.add.outer(ad.get_value(x[0]), 1) * x[0], 1)
+
+
+def test_optimizers():
+    compiled = ad.compile(rosenbrock, 2)
+    assert(np.allclose(optimize.gradient_descent(compiled, [1, 1])[0], [2, 4]))
+    for method in ['BFGS', 'DFP', 'Broyden']:
+        assert(np.allclose(optimize.quasi_newtons_method(compiled, [1, 1], method=method)[0], [2, 4]))
+
+    def system(x):
+        return [x[0] ** 2 + x[1] ** 2 - 4, ad.exp(x[0]) + x[1] - 1]
+    compiled = ad.compile(system, 2)
+    for method in ['inverse', 'exact', 'gmres', 'gmres_action']:
+        root, _ = optimize.newtons_method(compiled, [1, -1.7], method=method)
+        assert(np.allclose(compiled(root), 0))
+        assert(np.allclose(root, optimize.newtons_method(system, [1, -1.7], method=method)[0]))
+
+
+def test_speed():
+    compiled = ad.compile(rosenbrock, 2)
+    point = np.array([1.5, 2.5])
+    compiled_time = min(timeit.repeat(lambda: compiled.evaluate(point), number=200, repeat=5))
+    scalar_time = min(timeit.repeat(lambda: rosenbrock(ad.create_vector('x', point)).getGradient(['x1', 'x2']), number=200, repeat=5))
+    assert(compiled_time * 5 < scalar_time)
+
+
+def test_simplify():
+    def f(x):
+        return ad.tan(x[0]) + ad.tanh(x[0]) + ad.sin(x[0]) * ad.cos(x[0]) + x[0] ** 2 + (x[0] ** 2) * x[1] + ad.exp(x[1]) * ad.exp(x[1])
+    plain = ad.compile(f, 2, simplify=False)
+    simplified = ad.compile(f, 2)
+    assert(plain.removed_nodes == 0)
+    assert(simplified.removed_nodes == len(plain) - len(simplified) > 0)
+    for point in [[0.3, 0.4], [-1, 2]]:
+        assert(np.allclose(simplified.evaluate(point)[0], plain.evaluate(point)[0]))
+        assert(np.allclose(simplified.evaluate(point)[1], plain.evaluate(point)[1]))
+        assert(np.isclose(simplified(point), plain(point)))
+    assert(np.allclose(optimize.quasi_newtons_method(ad.compile(rosenbrock, 2), [1, 1])[0], [2, 4]))
+
+    #constant-only subtrees are folded and neutral constants dropped
+    graph = ad.trace._Graph()
+    x = graph.input(0, 2.0)
+    two = graph.constant(2.0)
+    folded = np.sin(two) * x + np.cos(two) * x + np.sin(two) * x
+    zero, one = graph.constant(0.0), graph.constant(1.0)
+    neutral = (((zero + x) - zero) * one) / one
+    neutral = one * neutral ** one
+    simplified, outputs = ad.trace._simplify(graph, [folded._index, neutral._index])
+    assert(simplified._ops.count('sin') == 0 and simplified._ops.count('cos') == 0)
+    assert(simplified._ops.count('multiply') == 2)
+    assert(outputs[1] == 0)
+    #-0.0 is not merged with 0.0
+    minus_zero, _ = ad.trace._simplify(graph, [graph.constant(-0.0)._index, zero._index])
+    assert(repr(-0.0) in [repr(float(arg)) for op, arg in zip(minus_zero._ops, minus_zero._args) if op == 'const'])
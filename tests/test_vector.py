@@ -401,3 +401,26 @@ def test_tan():
 
 
 
+
+
+def test_seed_matrix():
+    def f(x):
+        return np.array([x[0] * x[1] + ad.sin(x[2]), x[2] ** 2 / x[0], ad.exp(x[1] - x[2])])
+    values = [1, 2, 3]
+    jacobian = ad.get_jacobian(f(ad.create_vector('x', values)), ['x1', 'x2', 'x3'])
+    S = np.array([[1, 0], [2, -1], [0.5, 3]])
+    for mode in ['dict', 'dense', 'array']:
+        x = ad.create_vector('x', values, seed_vector=S, mode=mode)
+        assert(np.allclose(ad.get_tangents(f(x)), jacobian @ S))
+    #with the identity seed matrix one evaluation gives the whole Jacobian
+    x = ad.create_vector('x', values, seed_vector=np.identity(3))
+    assert(np.allclose(ad.get_tangents(f(x)), jacobian))
+    assert(np.allclose(ad.get_tangents(x[0] * x[2]), [[3, 0, 1]]))
+    assert(np.allclose(ad.get_jacobian(f(x), ['d1', 'd2', 'd3']), jacobian))
+    x = ad.create_vector('x', values, seed_vector=S, mode='array')
+    assert(np.allclose(ad.get_tangents((x * x).sum()), [[2 + 8 + 3, -4 + 18]]))
+
+    with pytest.raises(Exception):
+        ad.create_vector('x', values, seed_vector=S[:2])
+    with pytest.raises(Exception):
+        ad.create_vector('x', values, seed_vector=S, mode='reverse')